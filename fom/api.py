@@ -10,6 +10,8 @@
     :license: MIT, see LICENSE for more information.
 """
 
+from fom.stream import DEFAULT_CHUNK_SIZE
+
 
 class ApiBase(object):
     """Base class for an api component.
@@ -36,7 +38,9 @@ class ApiBase(object):
         """Make a request against the fluiddb.
 
         The path is relative to this API's root path, but otherwise parameters
-        are as :meth:`fom.db.FluidDB.__call__`
+        are as :meth:`fom.db.FluidDB.__call__`, including `timeout`. The
+        methods of the api components don't take a timeout, so bound them
+        with :func:`fom.deadline.deadline` instead.
         """
         return self.db(method,
                        self.path + list(path),
@@ -100,6 +104,27 @@ class AboutObjectTagApi(ApiBase):
         """
         return self('GET', is_value=True)
 
+    def stream(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Call GET on an individual object's tag, reading the value in
+        chunks. Not supported over :class:`fom.tx.TxFluidDB`, which raises
+        :class:`fom.tx.UnsupportedError`; use :meth:`download` instead.
+
+        :returns: A :class:`fom.stream.FluidStreamResponse`
+
+        .. seealso:: :meth:`fom.db.FluidDB.stream`
+        """
+        return self.db.stream('GET', self.path, chunk_size=chunk_size)
+
+    def download(self, fileobj, chunk_size=DEFAULT_CHUNK_SIZE, hash_name=None,
+                 digest=None):
+        """Call GET on an individual object's tag, writing the value to a
+        file-like object in chunks.
+
+        .. seealso:: :meth:`fom.db.FluidDB.download`
+        """
+        return self.db.download(self.path, fileobj, chunk_size=chunk_size,
+                                hash_name=hash_name, digest=digest)
+
     def head(self):
         """Call HEAD on an indivudial object's tag.
 
@@ -117,6 +142,11 @@ class AboutObjectTagApi(ApiBase):
     def put(self, value, value_type=None):
         """Call PUT on an individual object's tag.
 
+        An opaque value can be given as a file-like object (such as an open
+        file or an mmap) or an iterable of strings along with its
+        `value_type`, in which case it is streamed rather than read into
+        memory.
+
         .. seealso:: `<http://api.fluidinfo.com/html/api.html#about_PUT>`_
         """
         return self('PUT', payload=value, content_type=value_type)
@@ -192,6 +222,27 @@ class ObjectTagApi(ApiBase):
         """
         return self('GET', is_value=True)
 
+    def stream(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Call GET on an individual object's tag, reading the value in
+        chunks. Not supported over :class:`fom.tx.TxFluidDB`, which raises
+        :class:`fom.tx.UnsupportedError`; use :meth:`download` instead.
+
+        :returns: A :class:`fom.stream.FluidStreamResponse`
+
+        .. seealso:: :meth:`fom.db.FluidDB.stream`
+        """
+        return self.db.stream('GET', self.path, chunk_size=chunk_size)
+
+    def download(self, fileobj, chunk_size=DEFAULT_CHUNK_SIZE, hash_name=None,
+                 digest=None):
+        """Call GET on an individual object's tag, writing the value to a
+        file-like object in chunks.
+
+        .. seealso:: :meth:`fom.db.FluidDB.download`
+        """
+        return self.db.download(self.path, fileobj, chunk_size=chunk_size,
+                                hash_name=hash_name, digest=digest)
+
     def head(self):
         """Call HEAD on an individial object's tag.
 
@@ -209,6 +260,11 @@ class ObjectTagApi(ApiBase):
     def put(self, value, value_type=None):
         """Call PUT on an individual object's tag.
 
+        An opaque value can be given as a file-like object (such as an open
+        file or an mmap) or an iterable of strings along with its
+        `value_type`, in which case it is streamed rather than read into
+        memory.
+
         .. seealso:: `<http://api.fluidinfo.com/fluidDB/api/*/objects/PUT>`_
         """
         return self('PUT', payload=value, content_type=value_type)
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+"""
+    fom.breaker
+    ~~~~~~~~~~~
+
+    Failing fast when FluidDB is degraded.
+
+    A circuit breaker counts consecutive failed requests for each kind of
+    path (objects, values, namespaces, ...). Once too many have failed, the
+    circuit for that kind of path opens, and requests to it immediately
+    raise :class:`fom.errors.FluidCircuitOpenError` instead of waiting on
+    the server. After a while a trial request is let through, and the
+    circuit closes again if it succeeds.
+
+    :copyright: 2009-2010 Fom Authors.
+    :license: MIT, see LICENSE for more information.
+
+    .. attribute:: CLOSED
+
+        The state of a circuit letting requests through
+
+    .. attribute:: OPEN
+
+        The state of a circuit failing requests without sending them
+
+    .. attribute:: HALF_OPEN
+
+        The state of a circuit letting a trial request through
+"""
+
+import threading
+import time
+import urlparse
+
+from fom.errors import (FluidError, FluidServerError, FluidConnectionError,
+    FluidTimeoutError, FluidCircuitOpenError)
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+def path_class(url):
+    """Return the kind of path requested, which is the first component of
+    the path of a url.
+
+    >>> path_class('http://fluiddb.fluidinfo.com/objects/1234/test/tag')
+    'objects'
+    """
+    return urlparse.urlsplit(url).path.lstrip('/').split('/', 1)[0]
+
+
+class _Circuit(object):
+
+    __slots__ = ('state', 'failures', 'opened', 'trials')
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened = None
+        self.trials = 0
+
+
+class CircuitBreaker(object):
+    """A thread-safe circuit breaker with a circuit per kind of path.
+
+    >>> db = FluidDB(breaker=CircuitBreaker(failure_threshold=10))
+
+    Only server errors, connection failures and timeouts count as failures.
+    Client errors, such as a 404, show the server is working.
+
+    :param failure_threshold: The number of consecutive failures which opens
+        a circuit.
+    :param reset_timeout: The number of seconds a circuit stays open before
+        a trial request is let through.
+    :param half_open_calls: The number of trial requests let through at once
+        while half open.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0,
+                 half_open_calls=1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        circuit = self._circuits.get(key)
+        if circuit is None:
+            circuit = self._circuits[key] = _Circuit()
+        return circuit
+
+    def state(self, key):
+        """The state of the circuit for a kind of path.
+        """
+        with self._lock:
+            circuit = self._circuits.get(key)
+            if circuit is None:
+                return CLOSED
+            return circuit.state
+
+    def before(self, key):
+        """Check that a request may be sent, raising
+        :class:`fom.errors.FluidCircuitOpenError` if not. Every call which
+        doesn't raise must be followed by a call to :meth:`record`.
+        """
+        with self._lock:
+            circuit = self._get(key)
+            if circuit.state == OPEN:
+                waited = self.clock() - circuit.opened
+                if waited < self.reset_timeout:
+                    raise FluidCircuitOpenError(key,
+                                                self.reset_timeout - waited)
+                circuit.state = HALF_OPEN
+                circuit.trials = 0
+            if circuit.state == HALF_OPEN:
+                if circuit.trials >= self.half_open_calls:
+                    raise FluidCircuitOpenError(key, 0.0)
+                circuit.trials += 1
+
+    def record(self, key, error=None):
+        """Record the outcome of a request let through by :meth:`before`.
+
+        :param key: The kind of path requested
+        :param error: The exception raised by the request, if any.
+        """
+        failed = error is not None and self.is_failure(error)
+        with self._lock:
+            circuit = self._get(key)
+            if circuit.state == HALF_OPEN:
+                circuit.trials -= 1
+            if not failed:
+                circuit.state = CLOSED
+                circuit.failures = 0
+                return
+            circuit.failures += 1
+            if (circuit.state == HALF_OPEN or
+                circuit.failures >= self.failure_threshold):
+                circuit.state = OPEN
+                circuit.opened = self.clock()
+
+    def call(self, key, func, *args):
+        """Call a function making a request, unless the circuit for the key
+        is open.
+        """
+        self.before(key)
+        try:
+            result = func(*args)
+        except Exception, e:
+            self.record(key, e)
+            raise
+        self.record(key)
+        return result
+
+    def is_failure(self, error):
+        """Whether an exception shows the server to be failing. Running out
+        of time before a request was sent doesn't.
+        """
+        if isinstance(error, FluidTimeoutError):
+            return error.sent
+        return not isinstance(error, FluidError) or isinstance(error,
+            (FluidServerError, FluidConnectionError))
+
+    def clock(self):
+        """The current time in seconds.
+        """
+        return time.time()
+
+    def __repr__(self):
+        return '<%s (%s open)>' % (self.__class__.__name__,
+            sum(1 for c in self._circuits.values() if c.state != CLOSED))
@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+
+"""
+    fom.cache
+    ~~~~~~~~~
+
+    Caching of responses from FluidDB.
+
+    Responses to GET and HEAD requests are cached keyed on the method, the
+    url and the credentials they were requested with, so a user is never
+    served another's responses. When the server sent an `ETag` or
+    `Last-Modified` header with the response, a cached entry is revalidated
+    with a conditional request, and served from the cache when the server
+    answers `304 Not Modified`.
+
+    :copyright: 2009-2010 Fom Authors.
+    :license: MIT, see LICENSE for more information.
+
+    .. attribute:: CACHEABLE_METHODS
+
+        The HTTP methods whose responses are cached
+
+    .. attribute:: DEFAULT_MAX_BYTES
+
+        The default size limit of a :class:`MemoryCache`
+
+    .. attribute:: DEFAULT_DISK_MAX_BYTES
+
+        The default size limit of a :class:`SqliteCache`
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import urlparse
+from collections import OrderedDict
+
+
+CACHEABLE_METHODS = frozenset(('GET', 'HEAD'))
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+DEFAULT_DISK_MAX_BYTES = 1024 * 1024 * 1024
+
+# Request headers carrying credentials, which responses are cached apart by
+_CREDENTIAL_HEADERS = ('authorization', 'x-fluiddb-access-token')
+
+
+def _url_path(url):
+    return urlparse.urlsplit(url).path
+
+
+def credentials_key(headers):
+    """Return a hash of the credentials in a dict of request headers, or
+    `''` if there are none. The credentials themselves are never stored.
+    """
+    credentials = sorted((k.lower(), v) for (k, v) in headers.iteritems()
+                         if k.lower() in _CREDENTIAL_HEADERS)
+    if not credentials:
+        return ''
+    return hashlib.sha1(repr(credentials)).hexdigest()
+
+
+class CacheEntry(object):
+    """A cached response.
+
+    This has the same interface as the responses returned by a
+    :class:`fom.transport.Transport`, so can be used in their place.
+
+    :param status_code: The HTTP status of the response
+    :param headers: A dict of the response headers
+    :param content: The body of the response
+    :param stored: The time the response was stored or last revalidated
+    """
+
+    def __init__(self, status_code, headers, content, stored=None):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        if stored is None:
+            stored = time.time()
+        self.stored = stored
+
+    @classmethod
+    def from_response(cls, response):
+        """Create an entry from a transport's response.
+        """
+        headers = dict((k.lower(), v) for (k, v) in response.headers.items())
+        return cls(response.status_code, headers, response.content)
+
+    @property
+    def size(self):
+        """The approximate number of bytes used by this entry.
+        """
+        size = len(self.content or '')
+        for k, v in self.headers.iteritems():
+            size += len(k) + len(v)
+        return size
+
+    @property
+    def validators(self):
+        """The conditional request headers to revalidate this entry with.
+        """
+        validators = {}
+        if 'etag' in self.headers:
+            validators['If-None-Match'] = self.headers['etag']
+        if 'last-modified' in self.headers:
+            validators['If-Modified-Since'] = self.headers['last-modified']
+        return validators
+
+    def age(self, now=None):
+        """The number of seconds since this entry was stored or revalidated.
+        """
+        if now is None:
+            now = time.time()
+        return now - self.stored
+
+    def revalidated(self, response):
+        """Return a copy of this entry updated from a `304 Not Modified`
+        response. Entries may be being read by other threads, so are never
+        changed once cached.
+        """
+        headers = dict(self.headers)
+        for k, v in response.headers.items():
+            k = k.lower()
+            if k in ('etag', 'last-modified', 'date', 'cache-control'):
+                headers[k] = v
+        return CacheEntry(self.status_code, headers, self.content)
+
+    def __repr__(self):
+        return '<CacheEntry (%s, %s bytes)>' % (self.status_code, self.size)
+
+
+class ResponseCache(object):
+    """The interface of a response cache used by :class:`fom.db.FluidDB`.
+
+    Keys are `(method, url, credentials)` tuples, where `credentials` is
+    the :func:`credentials_key` of the request headers, and values are
+    :class:`CacheEntry` instances.
+
+    :param max_age: The number of seconds during which an entry is served
+        without asking the server. Entries without validators are only
+        cached when this is set.
+    """
+
+    def __init__(self, max_age=0):
+        self.max_age = max_age
+
+    def get(self, key):
+        """Return the entry for the key, or None.
+        """
+        raise NotImplementedError
+
+    def set(self, key, entry):
+        """Store an entry for the key.
+        """
+        raise NotImplementedError
+
+    def invalidate(self, url):
+        """Drop all entries for the path of the url, whatever their method,
+        url arguments and credentials.
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        """Drop all entries.
+        """
+        raise NotImplementedError
+
+    def is_fresh(self, entry):
+        """Whether an entry can be served without revalidating it.
+        """
+        return entry.age() < self.max_age
+
+    def is_storable(self, entry):
+        """Whether an entry is worth caching.
+        """
+        return (entry.status_code == 200 and
+                (self.max_age > 0 or bool(entry.validators)))
+
+
+class MemoryCache(ResponseCache):
+    """A bounded, thread-safe, in-memory LRU response cache.
+
+    >>> db = FluidDB(cache=MemoryCache(max_bytes=64 * 1024 * 1024))
+
+    :param max_bytes: The maximum approximate size of all the cached entries.
+        The least recently used entries are dropped to stay under it.
+    :param max_age: As for :class:`ResponseCache`
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, max_age=0):
+        ResponseCache.__init__(self, max_age)
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.pop(key, None)
+            if item is None:
+                return None
+            # Move it to the most recently used end
+            self._entries[key] = item
+            return item[0]
+
+    def set(self, key, entry):
+        size = entry.size
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            # Keep the size, so it isn't worked out again on removal
+            self._entries[key] = (entry, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, url):
+        path = _url_path(url)
+        with self._lock:
+            for key in self._entries.keys():
+                if _url_path(key[1]) == path:
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self.size -= item[1]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return '<%s (%s entries, %s bytes)>' % (self.__class__.__name__,
+                                                len(self), self.size)
+
+
+class SqliteCache(ResponseCache):
+    """A persistent response cache stored in an sqlite database.
+
+    The database can be shared by many threads and processes at once, so
+    repeated runs of a batch job start with a warm cache.
+
+    >>> cache = SqliteCache('/var/cache/fom.db', max_age=3600)
+    >>> db = FluidDB(cache=cache)
+
+    :param filename: The path of the database file, which is created if it
+        does not exist.
+    :param max_bytes: The maximum approximate size of all the cached
+        entries. The least recently used entries are dropped to stay under
+        it.
+    :param max_age: The number of seconds each entry is served for without
+        asking the server, counted from when it was stored or last
+        revalidated. Expired entries without validators are dropped.
+    :param timeout: The number of seconds to wait for another process
+        holding a lock on the database.
+    """
+
+    def __init__(self, filename, max_bytes=DEFAULT_DISK_MAX_BYTES,
+                 max_age=3600, timeout=30):
+        ResponseCache.__init__(self, max_age)
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._local = threading.local()
+        with self._connection as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS responses ('
+                         'method TEXT, url TEXT, credentials TEXT, '
+                         'path TEXT, status INTEGER, headers TEXT, '
+                         'body BLOB, is_text INTEGER, size INTEGER, '
+                         'stored REAL, accessed REAL, '
+                         'PRIMARY KEY (method, url, credentials))')
+            conn.execute('CREATE INDEX IF NOT EXISTS responses_path '
+                         'ON responses (path)')
+            conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed '
+                         'ON responses (accessed)')
+            # The total size of the entries, kept up to date by triggers so
+            # it needn't be summed on every write.
+            conn.execute('CREATE TABLE IF NOT EXISTS total (size INTEGER)')
+            conn.execute('INSERT INTO total SELECT COALESCE(SUM(size), 0) '
+                         'FROM responses WHERE NOT EXISTS '
+                         '(SELECT * FROM total)')
+            conn.execute('CREATE TRIGGER IF NOT EXISTS responses_added '
+                         'AFTER INSERT ON responses BEGIN '
+                         'UPDATE total SET size = size + NEW.size; END')
+            conn.execute('CREATE TRIGGER IF NOT EXISTS responses_removed '
+                         'AFTER DELETE ON responses BEGIN '
+                         'UPDATE total SET size = size - OLD.size; END')
+
+    @property
+    def _connection(self):
+        # sqlite connections can't be shared between threads.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.filename, timeout=self.timeout)
+            # Readers don't block the writer, or each other.
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        with self._connection as conn:
+            row = conn.execute('SELECT status, headers, body, is_text, stored '
+                               'FROM responses WHERE method = ? AND url = ? '
+                               'AND credentials = ?', key).fetchone()
+            if row is None:
+                return None
+            status, headers, body, is_text, stored = row
+            body = str(body)
+            if is_text:
+                body = body.decode('utf-8')
+            entry = CacheEntry(status, json.loads(headers), body, stored)
+            if not self.is_fresh(entry) and not entry.validators:
+                conn.execute('DELETE FROM responses WHERE method = ? '
+                             'AND url = ? AND credentials = ?', key)
+                return None
+            conn.execute('UPDATE responses SET accessed = ? WHERE method = ? '
+                         'AND url = ? AND credentials = ?', (now,) + key)
+            return entry
+
+    def set(self, key, entry):
+        method, url, credentials = key
+        size = entry.size
+        if size > self.max_bytes:
+            return
+        body = entry.content or ''
+        is_text = isinstance(body, unicode)
+        if is_text:
+            body = body.encode('utf-8')
+        with self._connection as conn:
+            # Not INSERT OR REPLACE, which doesn't run the delete trigger
+            conn.execute('DELETE FROM responses WHERE method = ? AND url = ? '
+                         'AND credentials = ?', key)
+            conn.execute('INSERT INTO responses VALUES '
+                         '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                         (method, url, credentials, _url_path(url),
+                          entry.status_code,
+                          json.dumps(entry.headers), sqlite3.Binary(body),
+                          is_text, size, entry.stored, time.time()))
+            self._evict(conn)
+
+    def invalidate(self, url):
+        with self._connection as conn:
+            conn.execute('DELETE FROM responses WHERE path = ?',
+                         (_url_path(url),))
+
+    def clear(self):
+        with self._connection as conn:
+            conn.execute('DELETE FROM responses')
+
+    def _evict(self, conn):
+        total = self._size(conn)
+        if total <= self.max_bytes:
+            return
+        rows = conn.execute('SELECT method, url, credentials, size '
+                            'FROM responses ORDER BY accessed')
+        doomed = []
+        for method, url, credentials, size in rows:
+            doomed.append((method, url, credentials))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        conn.executemany('DELETE FROM responses WHERE method = ? AND url = ? '
+                         'AND credentials = ?', doomed)
+
+    def _size(self, conn):
+        return conn.execute('SELECT size FROM total').fetchone()[0]
+
+    @property
+    def size(self):
+        """The approximate number of bytes used by all entries.
+        """
+        return self._size(self._connection)
+
+    def __len__(self):
+        return self._connection.execute(
+            'SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def __repr__(self):
+        return '<%s %r>' % (self.__class__.__name__, self.filename)
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+
+"""
+    fom.cassette
+    ~~~~~~~~~~~~
+
+    Recording sessions with FluidDB and replaying them without a network.
+
+    A :class:`RecordingTransport` passes requests on to another transport
+    and keeps every request and response. Saving it writes a cassette file.
+    A :class:`ReplayTransport` serves the responses in a cassette back, so
+    code can be run and benchmarked against realistic traffic offline.
+
+    >>> recorder = RecordingTransport()
+    >>> run_job(Fluid(transport=recorder))
+    >>> recorder.save('job.cassette.gz')
+    >>> replay = ReplayTransport('job.cassette.gz', latency='recorded')
+    >>> run_job(Fluid(transport=replay))
+
+    A cassette holds one JSON object per line, and is gzipped when its name
+    ends with `.gz`. Credentials sent in request headers are never recorded.
+
+    :copyright: 2009-2010 Fom Authors.
+    :license: MIT, see LICENSE for more information.
+"""
+
+import base64
+import gzip
+import json
+import threading
+import time
+from collections import deque
+
+from fom.errors import FluidConnectionError
+from fom.transport import Transport, PooledTransport
+
+
+# Request headers carrying credentials, which are left out of cassettes
+_SECRET_HEADERS = ('authorization', 'x-fluiddb-access-token')
+
+
+class CassetteError(Exception):
+    """A replayed request has no recorded interaction to answer it.
+    """
+
+
+class CassetteResponse(object):
+    """A response replayed from a cassette, with the interface of the
+    responses returned by a :class:`fom.transport.Transport`.
+    """
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def iter_content(self, chunk_size):
+        for i in xrange(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def close(self):
+        pass
+
+    def __repr__(self):
+        return '<%s (%s)>' % (self.__class__.__name__, self.status_code)
+
+
+def _encode_body(body):
+    # JSON can only hold text, so other bytes are base64 encoded.
+    if body is None:
+        return None, False
+    if isinstance(body, unicode):
+        return body, False
+    try:
+        return body.decode('utf-8'), False
+    except UnicodeDecodeError:
+        return base64.b64encode(body), True
+
+
+def _decode_body(body, encoded):
+    if body is None:
+        return None
+    if encoded:
+        return base64.b64decode(body)
+    return body.encode('utf-8')
+
+
+def _open(filename, mode):
+    if filename.endswith('.gz'):
+        return gzip.open(filename, mode)
+    return open(filename, mode)
+
+
+def load_cassette(filename):
+    """Return the interactions recorded in a cassette file, as dicts.
+    """
+    f = _open(filename, 'rb')
+    try:
+        return [json.loads(line) for line in f if line.strip()]
+    finally:
+        f.close()
+
+
+class RecordingTransport(Transport):
+    """A transport recording the requests sent through another one.
+
+    Streamed request bodies are not recorded, and streamed responses are
+    read in full to record them.
+
+    :param transport: The transport to send requests with. Defaults to a
+        :class:`fom.transport.PooledTransport`.
+    :param filename: The cassette file to write on :meth:`close`, if any.
+    """
+
+    def __init__(self, transport=None, filename=None):
+        if transport is None:
+            transport = PooledTransport()
+        self.transport = transport
+        self.filename = filename
+        self.interactions = []
+        self._lock = threading.Lock()
+
+    def request(self, method, url, data=None, headers=None, stream=False,
+                timeout=None):
+        interaction = {'method': method, 'url': url}
+        if isinstance(data, basestring):
+            interaction['body'], interaction['body_base64'] = _encode_body(
+                data)
+        interaction['request_headers'] = dict(
+            (k, v) for (k, v) in (headers or {}).items()
+            if k.lower() not in _SECRET_HEADERS)
+        start = time.time()
+        try:
+            response = self.transport.request(method, url, data=data,
+                headers=headers, stream=stream, timeout=timeout)
+            if stream:
+                try:
+                    content = response.content
+                finally:
+                    response.close()
+                response = CassetteResponse(response.status_code,
+                                            response.headers, content)
+        except FluidConnectionError, e:
+            interaction['error'] = str(e.exception)
+            interaction['elapsed'] = time.time() - start
+            self._add(interaction)
+            raise
+        interaction['elapsed'] = time.time() - start
+        interaction['status'] = response.status_code
+        interaction['headers'] = dict((k.lower(), v)
+                                      for (k, v) in response.headers.items())
+        interaction['content'], interaction['content_base64'] = (
+            _encode_body(response.content))
+        self._add(interaction)
+        return response
+
+    def _add(self, interaction):
+        with self._lock:
+            self.interactions.append(interaction)
+
+    def save(self, filename=None):
+        """Write the interactions recorded so far to a cassette file.
+
+        :param filename: The file to write, which defaults to the one given
+            when the transport was made.
+        """
+        filename = filename or self.filename
+        with self._lock:
+            interactions = list(self.interactions)
+        f = _open(filename, 'wb')
+        try:
+            for interaction in interactions:
+                f.write(json.dumps(interaction, sort_keys=True,
+                                   separators=(',', ':')))
+                f.write('\n')
+        finally:
+            f.close()
+
+    def close(self):
+        if self.filename is not None:
+            self.save()
+        self.transport.close()
+
+
+class ReplayTransport(Transport):
+    """A transport answering requests from a cassette, with no network.
+
+    :param cassette: The name of a cassette file, or a list of interactions
+        as returned by :func:`load_cassette`.
+    :param match: `'order'` to answer requests with the interactions in the
+        order they were recorded, whatever they are for, or `'request'` to
+        answer each with the next interaction recorded for the same method,
+        url and body.
+    :param latency: None to answer straight away, a number of seconds to
+        wait before each response, or `'recorded'` to wait as long as the
+        recorded request took.
+    """
+
+    def __init__(self, cassette, match='order', latency=None):
+        if isinstance(cassette, basestring):
+            cassette = load_cassette(cassette)
+        if match not in ('order', 'request'):
+            raise ValueError('Unknown match %r' % (match,))
+        self.match = match
+        self.latency = latency
+        self.interactions = cassette
+        self._lock = threading.Lock()
+        self.rewind()
+
+    def rewind(self):
+        """Start replaying the cassette from the beginning again.
+        """
+        with self._lock:
+            self._ordered = deque(self.interactions)
+            self._keyed = {}
+            for interaction in self.interactions:
+                self._keyed.setdefault(self._key(interaction['method'],
+                    interaction['url'], interaction.get('body')),
+                    deque()).append(interaction)
+
+    def _key(self, method, url, body):
+        return (method, url, body)
+
+    def _next(self, method, url, data):
+        with self._lock:
+            if self.match == 'order':
+                queue = self._ordered
+            else:
+                if isinstance(data, basestring):
+                    data = _encode_body(data)[0]
+                else:
+                    data = None
+                queue = self._keyed.get(self._key(method, url, data))
+            if not queue:
+                raise CassetteError('No recorded response for %s %s' %
+                                    (method, url))
+            return queue.popleft()
+
+    def request(self, method, url, data=None, headers=None, stream=False,
+                timeout=None):
+        interaction = self._next(method, url, data)
+        if self.latency == 'recorded':
+            delay = interaction.get('elapsed', 0)
+        else:
+            delay = self.latency
+        if delay:
+            self.sleep(delay)
+        if 'error' in interaction:
+            raise FluidConnectionError(IOError(interaction['error']))
+        return CassetteResponse(interaction['status'],
+                                dict(interaction['headers']),
+                                _decode_body(interaction['content'],
+                                             interaction['content_base64']))
+
+    def sleep(self, delay):
+        """Simulate the time taken by a request.
+        """
+        time.sleep(delay)
+
+    def __len__(self):
+        """The number of interactions not yet replayed, when matching in
+        order.
+        """
+        return len(self._ordered)
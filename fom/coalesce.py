@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+"""
+    fom.coalesce
+    ~~~~~~~~~~~~
+
+    Coalescing of identical concurrent requests.
+
+    :copyright: 2009-2010 Fom Authors.
+    :license: MIT, see LICENSE for more information.
+
+    .. attribute:: COALESCABLE_METHODS
+
+        The HTTP methods whose identical concurrent requests are sent once
+"""
+
+import sys
+import threading
+
+from fom.errors import FluidTimeoutError
+
+
+COALESCABLE_METHODS = frozenset(('GET', 'HEAD'))
+
+
+class _Call(object):
+    """A call in flight, which other callers can wait for.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exc_info = None
+        # The number of callers waiting for the leader
+        self.followers = 0
+
+
+class RequestCoalescer(object):
+    """Make sure that only one of many identical concurrent calls is made.
+
+    The first caller for a key makes the call, and any callers arriving
+    with the same key while it is in flight wait for it and share its result,
+    or its exception.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, *args, **kw):
+        """Call `func(*args)`, unless a call for `key` is already in flight,
+        in which case wait for that and return its result.
+
+        :param key: A hashable identifying identical calls
+        :param func: The callable to make the call with
+        :param timeout: The most seconds to wait for a call in flight, after
+            which :class:`fom.errors.FluidTimeoutError` is raised. Waits
+            forever if None.
+        """
+        timeout = kw.pop('timeout', None)
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.followers += 1
+        if not leader:
+            if not call.done.wait(timeout):
+                raise FluidTimeoutError(timeout)
+            if call.exc_info is not None:
+                raise call.exc_info[0], call.exc_info[1], call.exc_info[2]
+            return call.result
+        try:
+            call.result = func(*args)
+        except:
+            call.exc_info = sys.exc_info()
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def __len__(self):
+        """The number of calls in flight.
+        """
+        return len(self._calls)
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+"""
+    fom.codec
+    ~~~~~~~~~
+
+    JSON codecs for serializing request bodies and deserializing responses.
+
+    The available JSON libraries are registered at import time, and the
+    fastest one is used by default. A different codec can be given to each
+    :class:`fom.db.FluidDB`.
+
+    :copyright: 2009-2010 Fom Authors.
+    :license: MIT, see LICENSE for more information.
+
+    .. attribute:: default_codec
+
+        The codec used when none is specified
+"""
+
+
+class JsonCodec(object):
+    """A named JSON encoder and decoder.
+
+    :param name: The name to register the codec under
+    :param dumps: A function to encode a value as a JSON string
+    :param loads: A function to decode a JSON string, raising ValueError
+        for invalid JSON
+    :param accelerated: Whether the codec is implemented in C
+    """
+
+    def __init__(self, name, dumps, loads, accelerated=False):
+        self.name = name
+        self.dumps = dumps
+        self.loads = loads
+        self.accelerated = accelerated
+
+    def __repr__(self):
+        return '<%s %r>' % (self.__class__.__name__, self.name)
+
+
+codecs = {}
+# Names of the registered codecs, fastest first
+_preference = []
+
+
+def register_codec(codec, preferred=False):
+    """Register a codec so it can be looked up by name.
+
+    :param codec: The :class:`JsonCodec` to register
+    :param preferred: Whether the codec should become the default.
+    """
+    global default_codec
+    codecs[codec.name] = codec
+    if codec.name in _preference:
+        _preference.remove(codec.name)
+    if preferred:
+        _preference.insert(0, codec.name)
+        default_codec = codec
+    else:
+        _preference.append(codec.name)
+
+
+def get_codec(codec=None):
+    """Return a codec.
+
+    :param codec: The name of a registered codec, or a :class:`JsonCodec`.
+        If None, the default codec is returned.
+    """
+    if codec is None:
+        return default_codec
+    if isinstance(codec, JsonCodec):
+        return codec
+    try:
+        return codecs[codec]
+    except KeyError:
+        raise ValueError('Unknown JSON codec %r' % (codec,))
+
+
+def _has_c_encoder(module):
+    encoder = getattr(module, 'encoder', None)
+    return getattr(encoder, 'c_make_encoder', None) is not None
+
+
+def _register_available():
+    try:
+        import ujson
+    except ImportError:
+        pass
+    else:
+        # Older versions of ujson lose precision on floats, so only use it
+        # when it round trips them exactly.
+        f = 0.1 + 0.2
+        if ujson.loads(ujson.dumps(f)) == f:
+            register_codec(JsonCodec('ujson', ujson.dumps, ujson.loads, True))
+    try:
+        import simplejson
+    except ImportError:
+        pass
+    else:
+        accelerated = _has_c_encoder(simplejson)
+        register_codec(JsonCodec('simplejson', simplejson.dumps,
+                                 simplejson.loads, accelerated))
+    try:
+        import json
+    except ImportError:
+        try:
+            # For Google AppEngine
+            from django.utils import simplejson as json
+        except ImportError:
+            json = None
+    if json is not None:
+        accelerated = _has_c_encoder(json)
+        register_codec(JsonCodec('json', json.dumps, json.loads, accelerated))
+    # Prefer C implementations, then the order above.
+    _preference.sort(key=lambda name: not codecs[name].accelerated)
+
+
+_register_available()
+default_codec = codecs[_preference[0]]
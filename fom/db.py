@@ -27,80 +27,140 @@
     .. attribute:: DESERIALIZABLE_CONTENT_TYPES
 
         Content types which can be deserialized
-"""
 
-import types
-import urllib
+    .. attribute:: COMPRESS_THRESHOLD
 
-import requests
+        The default size in bytes below which request bodies are not
+        compressed
 
-try:
-    import json
-except ImportError:
-    try:
-        import simplejson as json
-    except ImportError:
-        # For Google AppEngine
-        from django.utils import simplejson as json
+    .. attribute:: URL_CACHE_SIZE
 
-from errors import raise_error
-from utils import fom_request_sent, fom_response_received
+        The number of quoted path segments, and of encoded url arguments,
+        which are memoized when generating urls
+"""
+
+import threading
+import time
+import types
+import urllib
+import zlib
+
+from breaker import path_class
+from cache import CACHEABLE_METHODS, CacheEntry, credentials_key
+from codec import get_codec
+from coalesce import COALESCABLE_METHODS, RequestCoalescer
+from deadline import current_deadline, deadline
+from errors import (raise_error, FluidError, FluidConnectionError,
+    FluidTimeoutError)
+from executor import Executor
+from stream import (DEFAULT_CHUNK_SIZE, FluidStreamResponse, body_length,
+                    is_streamed)
+from transport import PooledTransport
+from utils import (fom_request_sent, fom_response_received,
+    fom_request_finished, RequestEvent)
 from version import version
 
 
 BASE_URL = 'https://fluiddb.fluidinfo.com'
 NO_CONTENT = object()
+_NOT_PARSED = object()
 PRIMITIVE_CONTENT_TYPE = 'application/vnd.fluiddb.value+json'
 DESERIALIZABLE_CONTENT_TYPES = set(
     (PRIMITIVE_CONTENT_TYPE, 'application/json'))
 ITERABLE_TYPES = set((list, tuple))
 SERIALIZABLE_TYPES = set((types.NoneType, bool, int, float, str, unicode,
                           list, tuple))
+COMPRESS_THRESHOLD = 1024
+URL_CACHE_SIZE = 4096
+
+# Memoized url components, see _generate_endpoint_url
+_quoted_segments = {}
+_encoded_urlargs = {}
+
+
+def _memoize(cache, key, value):
+    # Bound the cache by starting again when it fills up, rather than paying
+    # for LRU bookkeeping on every hit.
+    if len(cache) >= URL_CACHE_SIZE:
+        cache.clear()
+    cache[key] = value
+    return value
+
+
+def _quote_segment(part):
+    if isinstance(part, unicode):
+        part = part.encode('utf-8')
+    try:
+        return _quoted_segments[part]
+    except KeyError:
+        return _memoize(_quoted_segments, part, urllib.quote(part, safe=''))
+
+
+def _encode_urlargs(urlargs):
+    if isinstance(urlargs, dict):
+        # convert the dict to tuple pairs
+        urlargs = urlargs.items()
+    # The type is part of the key, as True == 1 and u'\xe9' != '\xe9' but
+    # they are encoded differently.
+    key = tuple((tag, value.__class__, value) for (tag, value) in urlargs)
+    try:
+        return _encoded_urlargs[key]
+    except KeyError:
+        pass
+    except TypeError:
+        # unhashable values can't be memoized
+        key = None
+    # make sure we handle unicode characters as possible values
+    # NOTE: only use UTF-8 unicode for urlargs values. Anything else will
+    # break.
+    clean_urlargs = []
+    for (tag, value) in urlargs:
+        if isinstance(value, unicode):
+            clean_urlargs.append((tag, value.encode('utf-8')))
+        else:
+            clean_urlargs.append((tag, value))
+    encoded = urllib.urlencode(clean_urlargs)
+    if key is not None:
+        _memoize(_encoded_urlargs, key, encoded)
+    return encoded
 
 
 def _generate_endpoint_url(base, path, urlargs):
     path_parts = [base]
-    for part in path:
-        if isinstance(part, unicode):
-            part = part.encode('utf-8')
-        path_parts.append(urllib.quote(part, safe=''))
+    path_parts.extend([_quote_segment(part) for part in path])
     url = '/'.join(path_parts)
     if urlargs:
-        if isinstance(urlargs, dict):
-            # convert the dict to tuple pairs
-            urlargs = tuple(urlargs.items())
-        # make sure we handle unicode characters as possible values
-        # NOTE: only use UTF-8 unicode for urlargs values. Anything else will
-        # break.
-        clean_urlargs = []
-        for (tag, value) in urlargs:
-            if isinstance(value, unicode):
-                clean_urlargs.append((tag, value.encode('utf-8')))
-            else:
-                clean_urlargs.append((tag, value))
-        urlargs = tuple(clean_urlargs)
-        url = '?'.join([url, urllib.urlencode(urlargs)])
+        url = '?'.join([url, _encode_urlargs(urlargs)])
     return url
 
 
-def _get_body_and_type(payload, content_type):
+def _get_body_and_type(payload, content_type, codec=None):
+    codec = get_codec(codec)
     if content_type:
         if content_type == 'application/json':
-            return json.dumps(payload), content_type
+            return codec.dumps(payload), content_type
         return payload, content_type
     if payload is NO_CONTENT:
         return None, None
     if isinstance(payload, dict):
-        return json.dumps(payload), 'application/json'
+        return codec.dumps(payload), 'application/json'
     pt = type(payload)
     if pt in SERIALIZABLE_TYPES:
         if pt in ITERABLE_TYPES:
             if not all(isinstance(x, basestring) for x in payload):
                 raise ValueError('Non-string in list payload %r.' % (payload,))
-        return json.dumps(payload), PRIMITIVE_CONTENT_TYPE
+        return codec.dumps(payload), PRIMITIVE_CONTENT_TYPE
     raise ValueError("Can't handle payload %r of type %s" % (payload, pt))
 
 
+def _gzip(body):
+    if isinstance(body, unicode):
+        body = body.encode('utf-8')
+    # wbits of 16 + MAX_WBITS gives a gzip header and trailer.
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(body) + compressor.flush()
+
+
 class FluidResponse(object):
     """A response to a FluidDB request.
 
@@ -109,12 +169,15 @@ class FluidResponse(object):
 
     :param response: A response instance, which is a dict with an
         additional status attribute.
-    :param content: The body of the HTTP response.
+    :param content: The body of the HTTP response, as bytes. It is kept as
+        is, not decoded or copied.
     :param is_value: A boolean flag to indicate whether the response is from a
         *value* request. Value requests are not deserialized unless they are
         of the primitive content type: `application/vnd.fluiddb.value+json`
         even if they are of a deserializable content type such as
         `application/json`
+    :param codec: The :class:`fom.codec.JsonCodec` to deserialize the body
+        with. Defaults to the fastest available.
 
     .. attribute:: content_type
 
@@ -123,11 +186,12 @@ class FluidResponse(object):
     .. attribute:: value
 
         The deserialized value of the response body, if it is appropriate for
-        deserialization.
+        deserialization. The body is only deserialized the first time this is
+        accessed.
 
     .. attribute:: content
 
-        The raw content of the response body.
+        The raw content of the response body, as bytes.
 
     .. attribute:: request_id
 
@@ -138,24 +202,42 @@ class FluidResponse(object):
         The error from the response. This is only available during errors.
     """
 
-    def __init__(self, response, content, is_value):
+    __slots__ = ('content_type', 'is_value', 'codec', 'status', 'response',
+                 'content', '_value', 'request_id', 'error')
+
+    def __init__(self, response, content, is_value, codec=None):
         self.content_type = response.headers['content-type']
-        if ((is_value and self.content_type == PRIMITIVE_CONTENT_TYPE) or
-            (self.content_type in DESERIALIZABLE_CONTENT_TYPES)):
-            try:
-                self.value = json.loads(content)
-            except ValueError:
-                self.value = content
-        else:
-            self.value = content
+        self.is_value = is_value
+        self.codec = get_codec(codec)
         self.status = response.status_code
         self.response = response
         self.content = content
+        self._value = _NOT_PARSED
         self.request_id = self.response.headers.get('x-fluiddb-request-id')
         self.error = self.response.headers.get('x-fluiddb-error-class')
         if self.status >= 400:
             raise_error(self)
 
+    def _get_value(self):
+        if self._value is _NOT_PARSED:
+            self._value = self._parse()
+        return self._value
+
+    def _set_value(self, value):
+        self._value = value
+
+    value = property(_get_value, _set_value)
+
+    def _parse(self):
+        content = self.content
+        if ((self.is_value and self.content_type == PRIMITIVE_CONTENT_TYPE) or
+            (self.content_type in DESERIALIZABLE_CONTENT_TYPES)):
+            try:
+                return self.codec.loads(content)
+            except ValueError:
+                return content
+        return content
+
     def __repr__(self):
         return '<FluidResponse (%s, %r, %r, %r)>' % (self.status,
             self.content_type, self.error, self.value)
@@ -177,9 +259,41 @@ class FluidDB(object):
 
     :param base_url: The base FluidDB url to use. Currently, this can only be
         either the main FluidDB instance, or the sandbox instance.
+    :param transport: The :class:`fom.transport.Transport` used to send
+        requests. Defaults to a :class:`fom.transport.PooledTransport` with
+        the default pool settings.
+    :param retry: A :class:`fom.retry.RetryPolicy` deciding whether failed
+        requests are sent again. By default nothing is retried.
+    :param compress: Whether to gzip request bodies. Responses are always
+        requested gzipped, and decompressed transparently.
+    :param compress_threshold: The size in bytes below which request bodies
+        are sent uncompressed even when `compress` is set.
+    :param cache: A :class:`fom.cache.ResponseCache` to cache GET and HEAD
+        responses in. By default nothing is cached.
+    :param coalesce: Whether identical concurrent GET and HEAD requests from
+        different threads should share a single request, and its response.
+    :param codec: The :class:`fom.codec.JsonCodec`, or the name of one, used
+        to serialize payloads and deserialize responses. Defaults to the
+        fastest available.
+    :param rate_limit: A :class:`fom.ratelimit.RateLimiter` holding back
+        requests which would exceed its rate. Responses served from the
+        cache are not counted.
+    :param breaker: A :class:`fom.breaker.CircuitBreaker` failing requests
+        fast while FluidDB is failing. Fresh responses in the cache are still
+        served.
+    :param metrics: A :class:`fom.metrics.MetricsCollector` to record the
+        latency, size and status of each request sent.
+    :param tracer: A :class:`fom.trace.Tracer` to record a span for each
+        request sent.
+    :param executor: The :class:`fom.executor.Executor` running the requests
+        made with :meth:`submit` and :meth:`map`. One with the default
+        number of threads is made when first needed.
     """
 
-    def __init__(self, base_url=BASE_URL):
+    def __init__(self, base_url=BASE_URL, transport=None, retry=None,
+                 compress=False, compress_threshold=COMPRESS_THRESHOLD,
+                 cache=None, coalesce=False, codec=None, rate_limit=None,
+                 breaker=None, metrics=None, tracer=None, executor=None):
         if base_url.endswith('/'):
             raise ValueError('The domain for FluidDB must *not* end with'\
                              ' "/". Correct example:'\
@@ -187,13 +301,31 @@ class FluidDB(object):
         self.base_url = base_url
         self.headers = {
             'User-agent': 'fom/%s' % version,
+            'Accept-Encoding': 'gzip',
         }
-        self.session = requests.session(headers=self.headers)
+        if transport is None:
+            transport = PooledTransport()
+        self.transport = transport
+        self.retry = retry
+        self.compress = compress
+        self.compress_threshold = compress_threshold
+        self.cache = cache
+        self.codec = get_codec(codec)
+        self.rate_limit = rate_limit
+        self.breaker = breaker
+        self.metrics = metrics
+        self.tracer = tracer
+        self._executor = executor
+        self._executor_lock = threading.Lock()
+        if coalesce:
+            self.coalescer = RequestCoalescer()
+        else:
+            self.coalescer = None
         # XXX Backwards compat
         self.client = self
 
     def __call__(self, method, path, payload=NO_CONTENT, urlargs=None,
-                       content_type=None, is_value=False):
+                       content_type=None, is_value=False, timeout=None):
         """Make a request and return a response.
 
         >>> db = FluidDB()
@@ -211,17 +343,290 @@ class FluidDB(object):
             they are of the primitive content type:
             `application/vnd.fluiddb.value+json` even if they are of a
             deserializable content type such as `application/json`
+        :param timeout: The number of seconds the request, including any
+            retries, may take before :class:`fom.errors.FluidTimeoutError`
+            is raised. A shorter deadline already active in this thread (see
+            :mod:`fom.deadline`) takes precedence.
         """
-        payload, content_type = _get_body_and_type(payload, content_type)
+        payload, content_type = _get_body_and_type(payload, content_type,
+                                                   self.codec)
         urlargs = urlargs or {}
         headers = self._get_headers(content_type)
+        payload = self._compress(payload, headers)
         url = self._get_url(path, urlargs)
-        fom_request_sent.send(self, request=(url, method, payload, headers))
-        response = self.session.request(method, url, data=payload,
-            headers=headers)
-        fom_response_received.send(self, response=(response.status_code,
-                                   response.text, None))
-        return FluidResponse(response, response.text, is_value)
+        if timeout is not None:
+            with deadline(timeout):
+                return self._dispatch(method, url, payload, headers, is_value)
+        return self._dispatch(method, url, payload, headers, is_value)
+
+    def _dispatch(self, method, url, payload, headers, is_value):
+        if self.coalescer is not None and method in COALESCABLE_METHODS:
+            key = (method, url, tuple(sorted(headers.items())), is_value)
+            # Callers with a deadline wait for a request in flight only as
+            # long as they have left.
+            active = current_deadline()
+            if active is None:
+                return self.coalescer.do(key, self._request, method, url,
+                                         payload, headers, is_value)
+            return self.coalescer.do(key, self._request, method, url,
+                                     payload, headers, is_value,
+                                     timeout=active.remaining())
+        return self._request(method, url, payload, headers, is_value)
+
+    def _request(self, method, url, payload, headers, is_value):
+        """Send a request, retrying it as the retry policy allows.
+        """
+        attempt = 0
+        while True:
+            try:
+                return self._send(method, url, payload, headers, is_value)
+            except FluidError, e:
+                # A streamed body can't be sent again once read.
+                if (self.retry is None or is_streamed(payload) or
+                    not self.retry.should_retry(method, attempt, e)):
+                    raise
+                delay = self.retry.get_delay(attempt, e)
+                active = current_deadline()
+                if active is not None and delay >= active.remaining():
+                    # No time for another attempt
+                    raise
+                if self.metrics is not None:
+                    self.metrics.record_retry(method, url)
+                self.retry.sleep(delay)
+                attempt += 1
+
+    def _send(self, method, url, payload, headers, is_value):
+        """Send a single request, and return the response.
+        """
+        cache = self.cache
+        key = entry = None
+        if cache is not None and method in CACHEABLE_METHODS:
+            key = (method, url, credentials_key(headers))
+            entry = cache.get(key)
+            if entry is not None:
+                if cache.is_fresh(entry):
+                    return FluidResponse(entry, entry.content, is_value,
+                                         self.codec)
+                headers = dict(headers, **entry.validators)
+        if self.breaker is not None:
+            return self.breaker.call(path_class(url), self._exchange, method,
+                                     url, payload, headers, is_value, key,
+                                     entry)
+        return self._exchange(method, url, payload, headers, is_value, key,
+                              entry)
+
+    def _exchange(self, method, url, payload, headers, is_value, key, entry):
+        """Send a request over the transport, keeping the cache up to date.
+
+        :param key: The key of the response in the cache, or None if it
+            isn't cached.
+        :param entry: The cached entry being revalidated, or None.
+        """
+        cache = self.cache
+        active = current_deadline()
+        if self.rate_limit is not None:
+            self._throttle(method, active)
+        if fom_request_sent.receivers:
+            fom_request_sent.send(self, request=(url, method, payload,
+                                                 headers))
+        # Measured now, as sending reads a streamed body to its end.
+        length = body_length(payload) or 0
+        start = time.time()
+        try:
+            response = self._transmit(active, method, url, data=payload,
+                                      headers=headers)
+        except FluidError, e:
+            self._finished(method, url, payload, headers, start, error=e,
+                           request_bytes=length)
+            raise
+        finally:
+            if cache is not None and method not in CACHEABLE_METHODS:
+                self._invalidate(url)
+        self._finished(method, url, payload, headers, start, response,
+                       request_bytes=length)
+        if fom_response_received.receivers:
+            fom_response_received.send(self, response=(response.status_code,
+                                       response.content, None))
+        if cache is not None and method in CACHEABLE_METHODS:
+            if entry is not None and response.status_code == 304:
+                entry = entry.revalidated(response)
+                response = entry
+                cache.set(key, entry)
+            else:
+                entry = CacheEntry.from_response(response)
+                if cache.is_storable(entry):
+                    cache.set(key, entry)
+        return FluidResponse(response, response.content, is_value,
+                             self.codec)
+
+    def _finished(self, method, url, payload, headers, start, response=None,
+                  error=None, streamed=False, request_bytes=None):
+        """Record a request in the metrics and tracer, and tell any
+        receivers of :data:`fom.utils.fom_request_finished` about it.
+
+        :param request_bytes: The size of the request body, measured before
+            it was sent.
+        """
+        metrics = self.metrics
+        tracer = self.tracer
+        listening = fom_request_finished.receivers
+        if metrics is None and tracer is None and not listening:
+            return
+        event = RequestEvent(method, url, payload, headers, start,
+                             time.time(), response, error, streamed,
+                             request_bytes)
+        if metrics is not None:
+            metrics.record(method, url, event.status, event.elapsed,
+                           event.request_bytes, event.response_bytes)
+        if tracer is not None:
+            tracer.record_request(event)
+        if listening:
+            fom_request_finished.send(self, event=event)
+
+    def _throttle(self, method, active):
+        """Wait until the rate limit lets a request be sent, failing straight
+        away if that would be after the active deadline.
+        """
+        if active is None:
+            self.rate_limit.acquire(method)
+        elif self.rate_limit.acquire(method, active.remaining()) is None:
+            raise FluidTimeoutError(active.timeout, sent=False)
+
+    def _transmit(self, active, method, url, **kw):
+        """Send a request over the transport within the active deadline.
+        """
+        if active is None:
+            return self.transport.request(method, url, **kw)
+        if active.expired:
+            raise FluidTimeoutError(active.timeout, sent=False)
+        try:
+            return self.transport.request(method, url,
+                                          timeout=active.remaining(), **kw)
+        except FluidConnectionError:
+            if active.expired:
+                raise FluidTimeoutError(active.timeout)
+            raise
+
+    @property
+    def executor(self):
+        """The :class:`fom.executor.Executor` used to make requests
+        concurrently.
+        """
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = Executor()
+        return self._executor
+
+    def submit(self, method, path, payload=NO_CONTENT, urlargs=None,
+               content_type=None, is_value=False, timeout=None):
+        """Make a request in the background, and return a
+        :class:`fom.executor.Future` for its response.
+
+        The arguments are as for calling the db.
+        """
+        return self.executor.submit(self, method, path, payload, urlargs,
+                                    content_type, is_value, timeout)
+
+    def map(self, requests, return_errors=False):
+        """Make many requests concurrently, and return an iterator of their
+        responses in the same order.
+
+        >>> responses = db.map([('GET', ['objects', uid, 'test', 'tag'])
+        ...                     for uid in uids], return_errors=True)
+
+        :param requests: The requests, each a tuple of the arguments for
+            calling the db.
+        :param return_errors: Whether the exception raised by a request is
+            returned in place of its response, rather than raised.
+        """
+        return self.executor.map(self._call, requests,
+                                 return_errors=return_errors)
+
+    def _call(self, args):
+        return self(*args)
+
+    def stream(self, method, path, urlargs=None,
+               chunk_size=DEFAULT_CHUNK_SIZE):
+        """Make a request and return a response whose body is read in
+        chunks, so large bodies are never held in memory all at once.
+
+        Streamed requests are neither cached nor retried, as a partly read
+        body can't be replayed.
+
+        >>> db = FluidDB()
+        >>> with db.stream('GET', ['about', 'book', 'test', 'pdf']) as r:
+        ...     for chunk in r:
+        ...         out.write(chunk)
+
+        :param method: The HTTP method
+        :param path: The path to make the request to
+        :param urlargs: URL arguments to be applied to the request
+        :param chunk_size: The number of bytes to read at a time
+        :returns: A :class:`fom.stream.FluidStreamResponse`
+        """
+        headers = self._get_headers(None)
+        url = self._get_url(path, urlargs or {})
+        if self.breaker is not None:
+            return self.breaker.call(path_class(url), self._open_stream,
+                                     method, url, headers, chunk_size)
+        return self._open_stream(method, url, headers, chunk_size)
+
+    def _open_stream(self, method, url, headers, chunk_size):
+        active = current_deadline()
+        if self.rate_limit is not None:
+            self._throttle(method, active)
+        if fom_request_sent.receivers:
+            fom_request_sent.send(self, request=(url, method, None, headers))
+        start = time.time()
+        try:
+            response = self._transmit(active, method, url,
+                                      headers=headers, stream=True)
+        except FluidError, e:
+            self._finished(method, url, None, headers, start, error=e)
+            raise
+        # Only the time until the body starts to arrive is known.
+        self._finished(method, url, None, headers, start, response,
+                       streamed=True)
+        if response.status_code >= 400:
+            # Error bodies are small, so read them in full to raise.
+            try:
+                content = response.content
+            finally:
+                response.close()
+            if fom_response_received.receivers:
+                fom_response_received.send(self,
+                    response=(response.status_code, content, None))
+            FluidResponse(response, content, False, self.codec)
+        if fom_response_received.receivers:
+            fom_response_received.send(self, response=(response.status_code,
+                                       None, None))
+        return FluidStreamResponse(response, chunk_size)
+
+    def download(self, path, fileobj, urlargs=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE, hash_name=None, digest=None):
+        """GET a path and write its body to a file-like object in chunks.
+
+        :param path: The path to make the request to
+        :param fileobj: Anything with a `write` method.
+        :param urlargs: URL arguments to be applied to the request
+        :param chunk_size: The number of bytes to read at a time
+        :param hash_name: The name of a :mod:`hashlib` algorithm to hash the
+            body with, such as `'sha1'`.
+        :param digest: The expected hex digest of the body. If it doesn't
+            match, :class:`fom.stream.DigestMismatchError` is raised.
+        :returns: The :class:`fom.stream.FluidStreamResponse`, with the
+            `size` and `digest` of the body.
+        """
+        response = self.stream('GET', path, urlargs, chunk_size)
+        return response.save(fileobj, hash_name, digest)
+
+    def _invalidate(self, url):
+        if url[len(self.base_url):].startswith('/values'):
+            # Writes to /values can change the tags of any object
+            self.cache.clear()
+        else:
+            self.cache.invalidate(url)
 
     def _get_headers(self, content_type):
         headers = self.headers.copy()
@@ -229,6 +634,14 @@ class FluidDB(object):
             headers['content-type'] = content_type
         return headers
 
+    def _compress(self, payload, headers):
+        # Streamed bodies are sent as they are.
+        if (self.compress and isinstance(payload, basestring) and
+            len(payload) >= self.compress_threshold):
+            headers['content-encoding'] = 'gzip'
+            return _gzip(payload)
+        return payload
+
     def _get_url(self, path, urlargs=None):
         return _generate_endpoint_url(self.base_url, path, urlargs)
 
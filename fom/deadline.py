@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+"""
+    fom.deadline
+    ~~~~~~~~~~~~
+
+    Time budgets for operations made of several requests.
+
+    A deadline applies to every request made by the current thread while it
+    is active, including retries and the requests made by nested operations,
+    so an operation gives up as a whole once its time runs out.
+
+    >>> with deadline(5):
+    ...     obj.save()
+    ...     objects = Object.filter('has test/tag')
+
+    Nested deadlines can only shorten the time left, never extend it.
+
+    :copyright: 2009-2010 Fom Authors.
+    :license: MIT, see LICENSE for more information.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from fom.errors import FluidTimeoutError
+
+
+_local = threading.local()
+
+
+class Deadline(object):
+    """The time by which an operation must be done.
+
+    :param timeout: The number of seconds from now the deadline is at.
+    """
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.expires = time.time() + timeout
+
+    def remaining(self):
+        """The number of seconds left, which is never negative.
+        """
+        return max(0.0, self.expires - time.time())
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def check(self):
+        """Raise :class:`fom.errors.FluidTimeoutError` if the deadline has
+        passed.
+        """
+        if self.expired:
+            raise FluidTimeoutError(self.timeout)
+
+    def __repr__(self):
+        return '<%s (%.3fs left)>' % (self.__class__.__name__,
+                                      self.remaining())
+
+
+def current_deadline():
+    """Return the :class:`Deadline` active in the current thread, or None.
+    """
+    return getattr(_local, 'deadline', None)
+
+
+@contextmanager
+def deadline(timeout):
+    """Make a deadline active in the current thread for the duration of a
+    with block.
+
+    :param timeout: The number of seconds the block has. If None, whatever
+        deadline is already active is kept.
+    """
+    parent = current_deadline()
+    if timeout is None:
+        yield parent
+        return
+    active = Deadline(timeout)
+    if parent is not None and parent.expires < active.expires:
+        active = parent
+    _local.deadline = active
+    try:
+        yield active
+    finally:
+        _local.deadline = parent
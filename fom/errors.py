@@ -12,8 +12,15 @@
 
 
 class FluidError(Exception):
+    """The base class of all errors raised for failed requests.
+
+    .. attribute:: retryable
+
+        Whether the failed request may succeed if it is sent again.
+    """
 
     http_error = None
+    retryable = False
 
     def __init__(self, response):
         Exception.__init__(self, response)
@@ -28,50 +35,185 @@ class FluidError(Exception):
                                  self.http_error)
 
 
-class Fluid400Error(FluidError):
+class FluidClientError(FluidError):
+    """A 4xx error, the request was bad and shouldn't be sent again as is.
+    """
+
+    http_error = 'Client Error'
+
+
+class FluidServerError(FluidError):
+    """A 5xx error, the server failed and the request can be retried.
+    """
+
+    http_error = 'Server Error'
+    retryable = True
+
+
+class FluidConnectionError(FluidError):
+    """The request failed before any response was received.
+
+    :param exception: The exception raised by the transport.
+    """
+
+    http_error = 'Connection Error'
+    retryable = True
+
+    def __init__(self, exception):
+        Exception.__init__(self, exception)
+        self.status = None
+        self.fluid_error = None
+        self.request_id = None
+        self.response = None
+        self.exception = exception
+
+    def __str__(self):
+        return '<%s (%s)>' % (self.http_error, self.exception)
+
+
+class FluidTimeoutError(FluidError):
+    """The time allowed for a request, or for an operation made of several
+    requests, ran out. See :mod:`fom.deadline`.
+
+    :param timeout: The number of seconds which were allowed.
+    :param sent: Whether the request had been sent when time ran out. If it
+        hadn't, the timeout says nothing about the server.
+    """
+
+    http_error = 'Timeout'
+
+    def __init__(self, timeout, sent=True):
+        Exception.__init__(self, timeout)
+        self.status = None
+        self.fluid_error = None
+        self.request_id = None
+        self.response = None
+        self.timeout = timeout
+        self.sent = sent
+
+    def __str__(self):
+        return '<%s (%ss)>' % (self.http_error, self.timeout)
+
+
+class FluidCircuitOpenError(FluidError):
+    """The request wasn't sent, as too many recent requests to the same kind
+    of path have failed. See :class:`fom.breaker.CircuitBreaker`.
+
+    :param path_class: The kind of path, such as `'objects'`.
+    :param retry_in: The number of seconds until a request will be let
+        through again.
+    """
+
+    http_error = 'Circuit Open'
+
+    def __init__(self, path_class, retry_in):
+        Exception.__init__(self, path_class, retry_in)
+        self.status = None
+        self.fluid_error = None
+        self.request_id = None
+        self.response = None
+        self.path_class = path_class
+        self.retry_in = retry_in
+
+    def __str__(self):
+        return '<%s (%s, retry in %.1fs)>' % (self.http_error,
+                                              self.path_class, self.retry_in)
+
+
+class Fluid400Error(FluidClientError):
 
     http_error = 'Bad Request'
 
 
-class Fluid401Error(FluidError):
+class Fluid401Error(FluidClientError):
 
     http_error = 'Unauthorized'
 
 
-class Fluid404Error(FluidError):
+class Fluid403Error(FluidClientError):
+
+    http_error = 'Forbidden'
+
+
+class Fluid404Error(FluidClientError):
 
     http_error = 'Not Found'
 
 
-class Fluid406Error(FluidError):
+class Fluid405Error(FluidClientError):
+
+    http_error = 'Method Not Allowed'
+
+
+class Fluid406Error(FluidClientError):
 
     http_error = 'Not Acceptable'
 
 
-class Fluid412Error(FluidError):
+class Fluid409Error(FluidClientError):
+
+    http_error = 'Conflict'
+
+
+class Fluid412Error(FluidClientError):
 
     http_error = 'Precondition Failed'
 
 
-class Fluid413Error(FluidError):
+class Fluid413Error(FluidClientError):
 
     http_error = 'Request Entity Too Large'
 
 
-class Fluid500Error(FluidError):
+class Fluid429Error(FluidClientError):
+
+    http_error = 'Too Many Requests'
+    retryable = True
+
+
+class Fluid500Error(FluidServerError):
 
     http_error = 'Internal Server Error'
 
 
+class Fluid502Error(FluidServerError):
+
+    http_error = 'Bad Gateway'
+
+
+class Fluid503Error(FluidServerError):
+
+    http_error = 'Service Unavailable'
+
+
+class Fluid504Error(FluidServerError):
+
+    http_error = 'Gateway Timeout'
+
+
 errors = {
     400: Fluid400Error,
     401: Fluid401Error,
+    403: Fluid403Error,
     404: Fluid404Error,
+    405: Fluid405Error,
     406: Fluid406Error,
+    409: Fluid409Error,
     412: Fluid412Error,
     413: Fluid413Error,
+    429: Fluid429Error,
     500: Fluid500Error,
+    502: Fluid502Error,
+    503: Fluid503Error,
+    504: Fluid504Error,
 }
 
 def raise_error(response):
-    raise errors[response.status](response)
+    error_class = errors.get(response.status)
+    if error_class is None:
+        # Fall back on the class of error for statuses we don't know about.
+        if response.status >= 500:
+            error_class = FluidServerError
+        else:
+            error_class = FluidClientError
+    raise error_class(response)
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+
+"""
+    fom.executor
+    ~~~~~~~~~~~~
+
+    Making many requests to FluidDB concurrently, from a pool of threads.
+
+    >>> futures = [db.submit('GET', ['objects', uid, 'test', 'tag'])
+    ...            for uid in uids]
+    >>> values = [f.result().value for f in futures]
+
+    or, keeping the results in order and any errors in place of them,
+
+    >>> responses = db.map([('GET', ['objects', uid, 'test', 'tag'])
+    ...                     for uid in uids], return_errors=True)
+
+    Any callable can be run in the pool, so the methods of the api objects
+    in :mod:`fom.api` can be used as they are:
+
+    >>> future = db.executor.submit(api.objects[uid].get, 'test/tag')
+
+    A deadline active in the thread submitting a call (see
+    :mod:`fom.deadline`) also applies to the call.
+
+    :copyright: 2009-2010 Fom Authors.
+    :license: MIT, see LICENSE for more information.
+
+    .. attribute:: DEFAULT_WORKERS
+
+        The default number of threads of an :class:`Executor`
+"""
+
+import logging
+import sys
+import threading
+from Queue import Queue
+
+from fom.deadline import current_deadline, deadline
+from fom.errors import FluidTimeoutError
+
+
+DEFAULT_WORKERS = 8
+
+# Tells a worker thread to stop
+_STOP = object()
+
+log = logging.getLogger(__name__)
+
+
+class Future(object):
+    """The result of a call running in an :class:`Executor`, which will be
+    available once it is done.
+    """
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._result = None
+        self._exc_info = None
+        self._callbacks = []
+
+    def done(self):
+        """Whether the call has finished.
+        """
+        return self._done.is_set()
+
+    def _wait(self, timeout):
+        if not self._done.wait(timeout):
+            raise FluidTimeoutError(timeout)
+
+    def result(self, timeout=None):
+        """Return the result of the call, waiting for it if needed. If the
+        call raised an exception, it is raised again.
+
+        :param timeout: The number of seconds to wait before raising
+            :class:`fom.errors.FluidTimeoutError`. Waits forever if None.
+        """
+        self._wait(timeout)
+        if self._exc_info is not None:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+    def exception(self, timeout=None):
+        """Return the exception raised by the call, or None if it succeeded,
+        waiting for it if needed.
+
+        :param timeout: As for :meth:`result`.
+        """
+        self._wait(timeout)
+        if self._exc_info is not None:
+            return self._exc_info[1]
+        return None
+
+    def add_done_callback(self, func):
+        """Call `func(future)` once the call is done, straight away if it
+        already is. Exceptions raised by `func` are logged and ignored.
+        """
+        with self._lock:
+            if not self.done():
+                self._callbacks.append(func)
+                return
+        self._call_back(func)
+
+    def _call_back(self, func):
+        try:
+            func(self)
+        except Exception:
+            log.exception('Exception in callback %r of %r', func, self)
+
+    def _finish(self, result, exc_info):
+        with self._lock:
+            self._result = result
+            self._exc_info = exc_info
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for func in callbacks:
+            self._call_back(func)
+
+    def __repr__(self):
+        if not self.done():
+            state = 'pending'
+        elif self._exc_info is not None:
+            state = 'raised %s' % self._exc_info[0].__name__
+        else:
+            state = 'done'
+        return '<%s (%s)>' % (self.__class__.__name__, state)
+
+
+class Executor(object):
+    """A pool of threads running calls, at most `max_workers` at a time.
+
+    Threads are started as calls are submitted, up to `max_workers`, and run
+    until the executor is shut down. They are daemon threads, so they don't
+    keep a process alive.
+
+    :param max_workers: The number of calls which may run at once.
+    :param max_pending: The number of calls which may wait to be run, after
+        which :meth:`submit` blocks until one starts. Unbounded if None.
+    """
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, max_pending=None):
+        if max_workers < 1:
+            raise ValueError('max_workers must be at least 1')
+        self.max_workers = max_workers
+        self._queue = Queue(max_pending or 0)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+    def submit(self, func, *args, **kwargs):
+        """Schedule `func(*args, **kwargs)` to be called, and return a
+        :class:`Future` for its result.
+        """
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError('Cannot submit to an executor which has '
+                                   'been shut down')
+            if len(self._threads) < self.max_workers:
+                thread = threading.Thread(target=self._work)
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+        self._queue.put((future, current_deadline(), func, args, kwargs))
+        return future
+
+    def map(self, func, *iterables, **kwargs):
+        """Call `func` with the items of each iterable, like the builtin
+        `map`, and return an iterator of the results in order. Every call is
+        submitted straight away.
+
+        :param return_errors: Whether the exception raised by a call is
+            returned in place of its result, rather than raised. The calls
+            after one which raised keep running either way.
+        """
+        return_errors = kwargs.pop('return_errors', False)
+        if kwargs:
+            raise TypeError('Unexpected arguments %s' % ', '.join(kwargs))
+        futures = [self.submit(func, *args) for args in zip(*iterables)]
+        return self._results(futures, return_errors)
+
+    def _results(self, futures, return_errors):
+        for future in futures:
+            if return_errors:
+                error = future.exception()
+                if error is not None:
+                    yield error
+                    continue
+            yield future.result()
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            future, active, func, args, kwargs = item
+            result = exc_info = None
+            try:
+                if active is None:
+                    result = func(*args, **kwargs)
+                else:
+                    with deadline(active.remaining()):
+                        active.check()
+                        result = func(*args, **kwargs)
+            except:
+                exc_info = sys.exc_info()
+            future._finish(result, exc_info)
+            # Don't keep the traceback of the last call alive
+            del item, future, exc_info
+
+    def shutdown(self, wait=True):
+        """Stop the threads once the calls already submitted are done.
+
+        :param wait: Whether to wait for them to be done before returning.
+        """
+        with self._lock:
+            if self._shutdown:
+                threads = []
+            else:
+                threads = list(self._threads)
+                self._shutdown = True
+        for thread in threads:
+            self._queue.put(_STOP)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def __repr__(self):
+        return '<%s (%s workers)>' % (self.__class__.__name__,
+                                      self.max_workers)
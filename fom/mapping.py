@@ -13,7 +13,9 @@
 import uuid
 
 from fom.db import ITERABLE_TYPES, SERIALIZABLE_TYPES, PRIMITIVE_CONTENT_TYPE
+from fom.deadline import deadline
 from fom.session import Fluid
+from fom.trace import traced
 from fom.errors import Fluid404Error
 
 
@@ -293,7 +295,7 @@ class readonly_tag_value(object):
         else:
             value = UNKNOWN_VALUE()
         if isinstance(value, UNKNOWN_VALUE):
-            value = instance.get(self.tagpath)[0]
+            value = instance.get_uncached(self.tagpath)
         return value
 
 
@@ -395,6 +397,19 @@ class Object(SessionBound):
         """
         return self._cache.get(tagpath, UNKNOWN_VALUE())
 
+    def get_uncached(self, tagpath):
+        """Get the value of a tag for a field which has no cached value.
+        """
+        return self.get(tagpath)[0]
+
+    def get_collection(self, collection):
+        """Get the manager of the objects in a :class:`tag_collection`
+        field.
+        """
+        return collection.manager_type(self, collection.tagpath,
+                                       collection.map_type,
+                                       collection.foreign_tagpath)
+
     def refresh(self, *tagpaths):
         """
         Clears the local cache
@@ -407,6 +422,9 @@ class Object(SessionBound):
 
     def set(self, tagpath, value, valueType=None):
         """Set the value of a tag.
+
+        :returns: The response of the PUT, or None if the value is saved
+            lazily.
         """
         self._cache[tagpath] = value
         # check if updating a tag handled by one of the tag_value attributes
@@ -416,12 +434,13 @@ class Object(SessionBound):
             if tv.lazy_save:
                 # update on save()
                 self.set_lazy_tag_value(tv, value)
+                return None
             else:
                 # update right now
-                self.api[tagpath].put(value, valueType)
+                return self.api[tagpath].put(value, valueType)
         else:
             # the tag isn't associated with a tag_value on this object
-            self.api[tagpath].put(value, valueType)
+            return self.api[tagpath].put(value, valueType)
 
     def set_lazy_tag_value(self, tag_value, value):
         """Sets the value of the given tag_value instance to be pushed to
@@ -445,33 +464,49 @@ class Object(SessionBound):
     def delete(self, tagpath):
         """Removes a tag from the object
         """
-        self.api[tagpath].delete()
+        return self.api[tagpath].delete()
 
-    def save(self):
+    def save(self, timeout=None):
         """Saves those fields that have been updated
+
+        :param timeout: The number of seconds saving may take, after which
+            :class:`fom.errors.FluidTimeoutError` is raised.
         """
-        if not self.about:
-            raise ValueError(
-                "Cannot save for an object without an about value")
+        with deadline(timeout):
+            # Getting the about value may make a request.
+            about = self.about
+            if not about:
+                raise ValueError(
+                    "Cannot save for an object without an about value")
+            with traced(self.fluid.db, 'Object.save', about=about):
+                self._save()
+
+    def _save(self):
         if self._dirty_fields:
-            # values is the dict that will become the PUT payload to /values
-            values = {}
-            for item in self._dirty_fields:
-                tagpath = item.tagpath
-                # This check is done so the tag_relational capabilities work
-                # properly (i.e. the __get__ will return an instance of an
-                # object whose UUID should be referenced)
-                val = item.__get__(self, self.__class__)
-                if isinstance(item, tag_relation):
-                    val = val.uid
-                values[tagpath] = {'value': val}
-            # use the unique about value to identify this object in FluidDB
-            query = 'fluiddb/about = "%s"' % self.about
             # update the values using the /values api
-            self.fluid.values.put(query, values)
+            self.fluid.values.put(*self._dirty_values())
             # none of the fields are now dirty
             self._dirty_fields.clear()
 
+    def _dirty_values(self):
+        """Return the query and the values to PUT to /values to save the
+        fields which have been updated.
+        """
+        # values is the dict that will become the PUT payload to /values
+        values = {}
+        for item in self._dirty_fields:
+            tagpath = item.tagpath
+            # This check is done so the tag_relational capabilities work
+            # properly (i.e. the __get__ will return an instance of an
+            # object whose UUID should be referenced)
+            val = item.__get__(self, self.__class__)
+            if isinstance(item, tag_relation):
+                val = val.uid
+            values[tagpath] = {'value': val}
+        # use the unique about value to identify this object in FluidDB
+        query = 'fluiddb/about = "%s"' % self.about
+        return query, values
+
     @property
     def api(self):
         """The api ObjectApi for this instance.
@@ -499,7 +534,7 @@ class Object(SessionBound):
         return [Tag(path) for path in self.tag_paths]
 
     @classmethod
-    def filter(cls, query, result_type=None):
+    def filter(cls, query, result_type=None, timeout=None):
         """
         Returns a collection of objects that match the supplied query written
         in the query language described here:
@@ -508,20 +543,43 @@ class Object(SessionBound):
 
         If result_type is passed the results will be instantiated as a list of
         result_type otherwise they'll be instantiations of cls.
+
+        If timeout is passed, the whole query may take at most that many
+        seconds before :class:`fom.errors.FluidTimeoutError` is raised.
         """
+        with deadline(timeout):
+            with traced(Fluid.bound.db, 'Object.filter', query=query):
+                return cls._filter(query, result_type)
+
+    @classmethod
+    def _filter(cls, query, result_type):
         class_type = result_type and result_type or cls
         if class_type == Object:
             objects = Fluid.bound.objects.get(query)
             return [class_type(uid) for uid in objects.value['ids']]
         else:
-            tag_list = ['fluiddb/about', ]
-            tag_list.extend([attribute.tagpath for attribute in
-                class_type.__dict__.values()
-                if isinstance(attribute, readonly_tag_value)])
-            objects = Fluid.bound.values.get(query, tag_list)
-            return [class_type(uid, initial=values, dirty=False) for
-                uid, values in
-                objects.value['results']['id'].iteritems()]
+            objects = Fluid.bound.values.get(query,
+                                             class_type._value_tag_paths())
+            return class_type._from_values(objects)
+
+    @classmethod
+    def _value_tag_paths(cls):
+        """Return the paths of the tags to get from /values to fill in the
+        fields of objects of this class.
+        """
+        tag_list = ['fluiddb/about', ]
+        tag_list.extend([attribute.tagpath for attribute in
+            cls.__dict__.values()
+            if isinstance(attribute, readonly_tag_value)])
+        return tag_list
+
+    @classmethod
+    def _from_values(cls, response, fluid=None):
+        """Return objects of this class made from a /values response.
+        """
+        return [cls(uid, fluid=fluid, initial=values, dirty=False) for
+            uid, values in
+            response.value['results']['id'].iteritems()]
 
     def __repr__(self):
         return '<%s %s>' % (self.__class__.__name__, self.uid)
@@ -651,8 +709,7 @@ class tag_collection(tag_value):
     def __get__(self, instance, owner):
         if instance.uid is None:
             raise ValueError(u'This object has not been created.')
-        return self.manager_type(instance, self.tagpath, self.map_type,
-                                 self.foreign_tagpath)
+        return instance.get_collection(self)
 
 
 def path_child(path, child):
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+
+"""
+    fom.metrics
+    ~~~~~~~~~~~
+
+    Latency and throughput metrics for requests to FluidDB.
+
+    A :class:`MetricsCollector` given to a :class:`fom.db.FluidDB` records,
+    for each method and path template (such as `/objects/{id}/{tag}`), a
+    latency histogram, the bytes sent and received, the counts of each
+    response status and the number of retries. Recording a request costs a
+    lock and a bisect, so the collector can be left on in production.
+
+    >>> metrics = MetricsCollector()
+    >>> db = FluidDB(metrics=metrics)
+    >>> print metrics.to_prometheus()
+
+    :copyright: 2009-2010 Fom Authors.
+    :license: MIT, see LICENSE for more information.
+
+    .. attribute:: DEFAULT_BUCKETS
+
+        The default upper bounds in seconds of the latency histogram buckets
+"""
+
+import bisect
+import json
+import threading
+import time
+
+from fom.trace import path_template
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0, 60.0)
+
+
+class Histogram(object):
+    """A histogram with fixed buckets, which estimates percentiles by
+    interpolating within them. It is not thread-safe on its own.
+
+    :param buckets: The increasing upper bounds of the buckets. Anything
+        larger goes in a final unbounded bucket.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, p):
+        """Estimate a percentile of the values added, or return None if there
+        are none.
+
+        :param p: The percentile, from 0 to 100.
+        """
+        if not self.count:
+            return None
+        rank = self.count * p / 100.0
+        seen = 0
+        lower = 0.0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                if i < len(self.buckets):
+                    upper = min(self.buckets[i], self.max)
+                else:
+                    upper = self.max
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            if i < len(self.buckets):
+                lower = self.buckets[i]
+        return self.max
+
+
+class EndpointMetrics(object):
+    """The metrics for one method on one path template.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.latency = Histogram(buckets)
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.statuses = {}
+        self.retries = 0
+
+    def snapshot(self):
+        latency = self.latency
+        return {
+            'requests': latency.count,
+            'retries': self.retries,
+            'request_bytes': self.request_bytes,
+            'response_bytes': self.response_bytes,
+            'statuses': dict(self.statuses),
+            'latency': {
+                'sum': latency.sum,
+                'max': latency.max,
+                'p50': latency.percentile(50),
+                'p90': latency.percentile(90),
+                'p99': latency.percentile(99),
+            },
+        }
+
+
+class MetricsCollector(object):
+    """A thread-safe collector of request metrics, which can be shared by
+    several dbs.
+
+    Requests which fail without a response are counted under the status
+    `'error'`.
+
+    :param buckets: The upper bounds in seconds of the latency histogram
+        buckets.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.started = time.time()
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def _get(self, method, url):
+        key = (method, path_template(url))
+        endpoint = self._endpoints.get(key)
+        if endpoint is None:
+            endpoint = self._endpoints[key] = EndpointMetrics(self.buckets)
+        return endpoint
+
+    def record(self, method, url, status, seconds, request_bytes=0,
+               response_bytes=0):
+        """Record a request which was sent.
+
+        :param method: The HTTP method
+        :param url: The url of the request
+        :param status: The response status, or `'error'` if none was received
+        :param seconds: How long the request took
+        :param request_bytes: The size of the request body
+        :param response_bytes: The size of the response body
+        """
+        with self._lock:
+            endpoint = self._get(method, url)
+            endpoint.latency.add(seconds)
+            endpoint.request_bytes += request_bytes
+            endpoint.response_bytes += response_bytes
+            endpoint.statuses[status] = endpoint.statuses.get(status, 0) + 1
+
+    def record_retry(self, method, url):
+        """Record that a request is being retried.
+        """
+        with self._lock:
+            self._get(method, url).retries += 1
+
+    def reset(self):
+        """Forget everything recorded.
+        """
+        with self._lock:
+            self._endpoints.clear()
+            self.started = time.time()
+
+    def snapshot(self):
+        """Return the metrics as a dict, keyed by `'<METHOD> <path template>'`,
+        such as `'GET /objects/{id}/{tag}'`.
+        """
+        with self._lock:
+            endpoints = dict(('%s %s' % key, endpoint.snapshot())
+                             for key, endpoint in self._endpoints.items())
+            return {'started': self.started, 'endpoints': endpoints}
+
+    def to_json(self):
+        """Return a snapshot of the metrics as JSON.
+        """
+        return json.dumps(self.snapshot(), sort_keys=True)
+
+    def to_prometheus(self, prefix='fom'):
+        """Return the metrics in the Prometheus text exposition format.
+
+        :param prefix: The prefix of the metric names.
+        """
+        duration, requests, retries, sent, received = [], [], [], [], []
+        with self._lock:
+            for (method, path), endpoint in sorted(self._endpoints.items()):
+                labels = 'method="%s",path="%s"' % (method, path)
+                latency = endpoint.latency
+                cumulative = 0
+                bounds = [repr(b) for b in latency.buckets] + ['+Inf']
+                for bound, count in zip(bounds, latency.counts):
+                    cumulative += count
+                    duration.append('_bucket{%s,le="%s"} %d' % (labels, bound,
+                                                                cumulative))
+                duration.append('_sum{%s} %r' % (labels, latency.sum))
+                duration.append('_count{%s} %d' % (labels, latency.count))
+                for status, count in sorted(endpoint.statuses.items()):
+                    requests.append('{%s,status="%s"} %d' % (labels, status,
+                                                             count))
+                retries.append('{%s} %d' % (labels, endpoint.retries))
+                sent.append('{%s} %d' % (labels, endpoint.request_bytes))
+                received.append('{%s} %d' % (labels, endpoint.response_bytes))
+        lines = []
+        for name, kind, samples in (
+                ('request_duration_seconds', 'histogram', duration),
+                ('requests_total', 'counter', requests),
+                ('retries_total', 'counter', retries),
+                ('request_bytes_total', 'counter', sent),
+                ('response_bytes_total', 'counter', received)):
+            name = '%s_%s' % (prefix, name)
+            lines.append('# TYPE %s %s' % (name, kind))
+            lines.extend(name + sample for sample in samples)
+        return '\n'.join(lines) + '\n'
+
+    def __repr__(self):
+        return '<%s (%s endpoints)>' % (self.__class__.__name__,
+                                        len(self._endpoints))
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+"""
+    fom.ratelimit
+    ~~~~~~~~~~~~~
+
+    Client side rate limiting of requests to FluidDB.
+
+    Requests are held back locally once the configured rate is exceeded,
+    rather than being sent and throttled by the server.
+
+    :copyright: 2009-2010 Fom Authors.
+    :license: MIT, see LICENSE for more information.
+"""
+
+import threading
+import time
+
+
+class TokenBucket(object):
+    """A thread-safe token bucket.
+
+    Tokens are added at `rate` per second, up to `burst` tokens. Each
+    request takes one, and waits for it when the bucket is empty. Waiting
+    callers are served in the order they arrived.
+
+    :param rate: The number of tokens added per second.
+    :param burst: The maximum number of tokens held, which is the number of
+        requests which can be sent at once after a quiet period. Defaults to
+        `rate`, or 1 if that is smaller.
+    """
+
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise ValueError('The rate must be positive, not %r.' % (rate,))
+        if burst is None:
+            burst = max(1, rate)
+        self.rate = float(rate)
+        self.burst = burst
+        self.tokens = float(burst)
+        self._updated = self.clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=1, timeout=None):
+        """Take tokens from the bucket, and return the number of seconds to
+        wait before they are available. The tokens are taken straight away,
+        so later callers queue behind this one.
+
+        :param timeout: The most seconds the caller can wait. If the tokens
+            won't be available by then, none are taken and None is returned.
+        """
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.burst,
+                              self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            left = self.tokens - tokens
+            if left >= 0:
+                delay = 0.0
+            else:
+                delay = -left / self.rate
+            if timeout is not None and delay > timeout:
+                return None
+            self.tokens = left
+            return delay
+
+    def acquire(self, tokens=1, timeout=None):
+        """Take tokens from the bucket, waiting for them if needed. Returns
+        the number of seconds waited.
+
+        :param timeout: As for :meth:`reserve`, in which case None is
+            returned without waiting.
+        """
+        delay = self.reserve(tokens, timeout)
+        if delay:
+            self.sleep(delay)
+        return delay
+
+    def clock(self):
+        """The current time in seconds.
+        """
+        return time.time()
+
+    def sleep(self, delay):
+        """Wait for tokens to become available.
+        """
+        time.sleep(delay)
+
+    def __repr__(self):
+        return '<%s (%s/s, burst %s)>' % (self.__class__.__name__, self.rate,
+                                          self.burst)
+
+
+class RateLimiter(object):
+    """Limits the rate of requests made by a :class:`fom.db.FluidDB`.
+
+    All the API objects bound to a db share its limiter, as can several dbs
+    and threads.
+
+    >>> limiter = RateLimiter(10, burst=20, methods={'PUT': (2, 5)})
+    >>> db = FluidDB(rate_limit=limiter)
+
+    :param rate: The number of requests per second, or None for no limit on
+        the methods not given in `methods`.
+    :param burst: The number of requests which can be sent at once. Defaults
+        to `rate`.
+    :param methods: A dict mapping HTTP methods to a `(rate, burst)` tuple,
+        or a :class:`TokenBucket`, limiting those methods separately. They
+        are then not counted against the overall rate.
+    """
+
+    def __init__(self, rate=None, burst=None, methods=None):
+        if rate is None:
+            self.bucket = None
+        else:
+            self.bucket = TokenBucket(rate, burst)
+        self.methods = {}
+        for method, bucket in (methods or {}).items():
+            if not isinstance(bucket, TokenBucket):
+                bucket = TokenBucket(*bucket)
+            self.methods[method.upper()] = bucket
+
+    def get_bucket(self, method):
+        """Return the bucket limiting a method, or None.
+        """
+        return self.methods.get(method.upper(), self.bucket)
+
+    def reserve(self, method, timeout=None):
+        """Count a request, and return the number of seconds to wait before
+        sending it.
+
+        :param timeout: The most seconds the request can wait. If it would
+            have to wait longer, it isn't counted and None is returned.
+        """
+        bucket = self.get_bucket(method)
+        if bucket is None:
+            return 0.0
+        return bucket.reserve(timeout=timeout)
+
+    def acquire(self, method, timeout=None):
+        """Count a request, waiting until it may be sent. Returns the number
+        of seconds waited.
+
+        :param timeout: As for :meth:`reserve`, in which case None is
+            returned without waiting.
+        """
+        bucket = self.get_bucket(method)
+        if bucket is None:
+            return 0.0
+        return bucket.acquire(timeout=timeout)
+
+    def __repr__(self):
+        return '<%s %r %r>' % (self.__class__.__name__, self.bucket,
+                               self.methods)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+"""
+    fom.retry
+    ~~~~~~~~~
+
+    Retrying failed requests.
+
+    :copyright: 2009-2010 Fom Authors.
+    :license: MIT, see LICENSE for more information.
+
+    .. attribute:: IDEMPOTENT_METHODS
+
+        The HTTP methods which are safe to send more than once
+"""
+
+import random
+import time
+from email.utils import parsedate_tz, mktime_tz
+
+
+IDEMPOTENT_METHODS = frozenset(('GET', 'HEAD', 'PUT', 'DELETE'))
+
+
+def get_retry_after(error):
+    """Return the number of seconds the server asked us to wait before
+    retrying, or None.
+
+    :param error: The :class:`fom.errors.FluidError` for the failed request.
+    """
+    response = getattr(error, 'response', None)
+    if response is None or response.response is None:
+        return None
+    value = response.response.headers.get('retry-after')
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    # Otherwise it is an HTTP date
+    parsed = parsedate_tz(value)
+    if parsed is None:
+        return None
+    return max(0.0, mktime_tz(parsed) - time.time())
+
+
+class RetryPolicy(object):
+    """Decides whether and when a failed request is sent again.
+
+    Only errors which are marked as :attr:`~fom.errors.FluidError.retryable`
+    are retried, and only for idempotent methods. The delay between attempts
+    grows exponentially up to `max_backoff`, with full jitter, unless the
+    server sends a `Retry-After` header, which is honoured instead.
+
+    >>> db = FluidDB(retry=RetryPolicy(max_retries=5))
+
+    :param max_retries: The maximum number of times a request is retried.
+    :param backoff: The base delay in seconds, doubled on each attempt.
+    :param max_backoff: The maximum delay in seconds between attempts.
+    :param jitter: Whether to randomize the delay to spread out retries
+        from many clients.
+    :param methods: The HTTP methods which may be retried.
+    """
+
+    def __init__(self, max_retries=3, backoff=0.5, max_backoff=30.0,
+                 jitter=True, methods=IDEMPOTENT_METHODS):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.methods = frozenset(methods)
+
+    def should_retry(self, method, attempt, error):
+        """Whether a failed request should be sent again.
+
+        :param method: The HTTP method of the request
+        :param attempt: The number of retries already made
+        :param error: The :class:`fom.errors.FluidError` raised
+        """
+        return (attempt < self.max_retries and
+                method.upper() in self.methods and
+                error.retryable)
+
+    def get_delay(self, attempt, error):
+        """The number of seconds to wait before the next attempt.
+
+        :param attempt: The number of retries already made
+        :param error: The :class:`fom.errors.FluidError` raised
+        """
+        retry_after = get_retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    def sleep(self, delay):
+        """Wait between attempts.
+        """
+        time.sleep(delay)
+
+    def __repr__(self):
+        return '<%s (%s retries)>' % (self.__class__.__name__,
+                                      self.max_retries)
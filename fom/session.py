@@ -19,10 +19,12 @@ class Fluid(FluidApi):
 
     :param base_url: The base FluidDB url to use. Currently, this can only be
         either the main FluidDB instance, or the sandbox instance.
+    :param transport: The :class:`fom.transport.Transport` used by the
+        underlying :class:`fom.db.FluidDB`.
     """
 
-    def __init__(self, base_url=BASE_URL):
-        FluidApi.__init__(self, FluidDB(base_url))
+    def __init__(self, base_url=BASE_URL, transport=None):
+        FluidApi.__init__(self, FluidDB(base_url, transport))
 
     def bind(self):
         """Bind this instance of the session to the global object mapper
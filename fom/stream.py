@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+
+"""
+    fom.stream
+    ~~~~~~~~~~
+
+    Streaming of large tag values.
+
+    :copyright: 2009-2010 Fom Authors.
+    :license: MIT, see LICENSE for more information.
+
+    .. attribute:: DEFAULT_CHUNK_SIZE
+
+        The default number of bytes read at a time from a streamed body
+"""
+
+import hashlib
+import os
+
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+def is_streamed(body):
+    """Whether a request body is to be streamed, rather than sent as a
+    string.
+
+    :param body: A request body, which can be a string, a file-like object
+        (including an mmap) or an iterable of strings.
+    """
+    return body is not None and not isinstance(body, basestring)
+
+
+def body_length(body):
+    """Return the number of bytes left to read in a request body, or None if
+    it can't be known without reading it.
+
+    :param body: A request body, which can be a string, a file-like object
+        (including an mmap) or an iterable of strings.
+    """
+    if hasattr(body, 'read'):
+        try:
+            position = body.tell()
+        except (AttributeError, IOError):
+            return None
+        if hasattr(body, '__len__'):
+            # mmap
+            return len(body) - position
+        try:
+            return os.fstat(body.fileno()).st_size - position
+        except (AttributeError, IOError, OSError):
+            return None
+    if isinstance(body, basestring):
+        return len(body)
+    return None
+
+
+def iter_file(fileobj, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the contents of a file-like object in chunks.
+    """
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+class IterReader(object):
+    """A file-like object reading from an iterable of strings.
+
+    Only as much of the iterable as is asked for is consumed.
+
+    :param iterable: An iterable of strings
+    """
+
+    def __init__(self, iterable):
+        self._chunks = iter(iterable)
+        self._pending = ''
+
+    def read(self, size=-1):
+        if size < 0:
+            data = self._pending + ''.join(self._chunks)
+            self._pending = ''
+            return data
+        while not self._pending:
+            try:
+                self._pending = next(self._chunks)
+            except StopIteration:
+                return ''
+        data = self._pending[:size]
+        self._pending = self._pending[size:]
+        return data
+
+    def close(self):
+        close = getattr(self._chunks, 'close', None)
+        if close is not None:
+            # Let a generator clean up after itself
+            close()
+
+
+class DigestMismatchError(ValueError):
+    """The digest of a downloaded body isn't the one expected.
+    """
+
+    def __init__(self, expected, actual):
+        ValueError.__init__(self, expected, actual)
+        self.expected = expected
+        self.actual = actual
+
+    def __str__(self):
+        return '<Digest mismatch (expected %s, got %s)>' % (self.expected,
+                                                           self.actual)
+
+
+class ChunkWriter(object):
+    """Writes chunks of a body to a file-like object, counting and optionally
+    hashing them as they go.
+
+    :param fileobj: Anything with a `write` method.
+    :param hash_name: The name of a :mod:`hashlib` algorithm to hash the body
+        with, such as `'sha1'`.
+    :param digest: The expected hex digest of the body.
+    """
+
+    def __init__(self, fileobj, hash_name=None, digest=None):
+        if digest is not None and hash_name is None:
+            raise ValueError('A hash_name is needed to check a digest.')
+        self.fileobj = fileobj
+        self.expected_digest = digest
+        self.size = 0
+        self.digest = None
+        if hash_name is None:
+            self._hash = None
+        else:
+            self._hash = hashlib.new(hash_name)
+
+    def write(self, chunk):
+        self.fileobj.write(chunk)
+        self.size += len(chunk)
+        if self._hash is not None:
+            self._hash.update(chunk)
+
+    def finish(self):
+        """Call once the whole body has been written, to check its digest.
+        """
+        if self._hash is not None:
+            self.digest = self._hash.hexdigest()
+            expected = self.expected_digest
+            if expected is not None and expected.lower() != self.digest:
+                raise DigestMismatchError(expected, self.digest)
+
+
+class FluidStreamResponse(object):
+    """A successful response to a FluidDB request whose body is read in
+    chunks rather than all at once.
+
+    Iterating over it yields the chunks of the body. It should be closed
+    when done with, otherwise the connection is kept busy.
+
+    >>> r = db.stream('GET', ['objects', uid, 'test', 'image'])
+    >>> for chunk in r:
+    ...     process(chunk)
+
+    :param response: A response from a :class:`fom.transport.Transport`
+        made with `stream=True`.
+    :param chunk_size: The number of bytes to read at a time.
+
+    .. attribute:: size
+
+        The number of bytes read so far.
+
+    .. attribute:: digest
+
+        The hex digest of the body once it has been saved with a `hash_name`.
+    """
+
+    def __init__(self, response, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.status = response.status_code
+        self.content_type = response.headers.get('content-type')
+        self.request_id = response.headers.get('x-fluiddb-request-id')
+        self.response = response
+        self.chunk_size = chunk_size
+        self.size = 0
+        self.digest = None
+
+    def __iter__(self):
+        try:
+            for chunk in self.response.iter_content(self.chunk_size):
+                self.size += len(chunk)
+                yield chunk
+        finally:
+            self.close()
+
+    def save(self, fileobj, hash_name=None, digest=None):
+        """Write the body to a file-like object, and return this response.
+
+        :param fileobj: Anything with a `write` method.
+        :param hash_name: The name of a :mod:`hashlib` algorithm to hash the
+            body with.
+        :param digest: The expected hex digest of the body. If it doesn't
+            match, :class:`DigestMismatchError` is raised.
+        """
+        writer = ChunkWriter(fileobj, hash_name, digest)
+        for chunk in self:
+            writer.write(chunk)
+        writer.finish()
+        self.digest = writer.digest
+        return self
+
+    def close(self):
+        """Release the connection of this response.
+        """
+        self.response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return '<FluidStreamResponse (%s, %r, %s bytes)>' % (self.status,
+            self.content_type, self.size)
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+
+"""
+    fom.trace
+    ~~~~~~~~~
+
+    Sampled tracing of the requests made to FluidDB.
+
+    A :class:`Tracer` given to a :class:`fom.db.FluidDB` records a span for
+    each HTTP request, with its method, path template, duration, sizes and
+    the request id and error class FluidDB reported. Spans of requests made
+    by a mapping operation, such as :meth:`fom.mapping.Object.save`, are
+    nested under a span for the operation. Finished spans are kept in a
+    bounded ring buffer, and can be exported to a file as JSON lines.
+
+    >>> tracer = Tracer(capacity=10000, sample_rate=0.01)
+    >>> db = FluidDB(tracer=tracer)
+    >>> ...
+    >>> tracer.export('/tmp/fom-spans.json')
+
+    :copyright: 2009-2010 Fom Authors.
+    :license: MIT, see LICENSE for more information.
+
+    .. attribute:: DEFAULT_CAPACITY
+
+        The default number of spans kept by a :class:`Tracer`
+"""
+
+import json
+import os
+import random
+import threading
+import time
+import urlparse
+from collections import deque
+from contextlib import contextmanager
+
+
+DEFAULT_CAPACITY = 1000
+
+# Kinds of path whose first components are an object, then a tag path
+_OBJECT_PATHS = {'objects': '{id}', 'about': '{about}'}
+
+
+def path_template(url):
+    """Return the path of a url with the names of things replaced, so
+    requests to the same kind of resource share a template.
+
+    >>> path_template('http://fluiddb.fluidinfo.com/objects/1234/test/tag')
+    '/objects/{id}/{tag}'
+    """
+    parts = urlparse.urlsplit(url).path.strip('/').split('/')
+    kind = parts[0]
+    template = ['', kind]
+    if kind in _OBJECT_PATHS:
+        if len(parts) > 1:
+            template.append(_OBJECT_PATHS[kind])
+        if len(parts) > 2:
+            template.append('{tag}')
+    elif kind == 'permissions':
+        template.extend(parts[1:2])
+        if len(parts) > 2:
+            template.append('{path}')
+    elif len(parts) > 1:
+        template.append('{path}')
+    return '/'.join(template)
+
+
+def _new_id():
+    return '%016x' % random.getrandbits(64)
+
+
+class Span(object):
+    """A timed operation, which is either an HTTP request or something made
+    of several of them.
+
+    :param name: What the span is of, such as `'GET /objects/{id}'`
+    :param parent: The enclosing :class:`Span`, or None
+    :param attributes: A dict of details of the operation
+    """
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'start', 'end',
+                 'attributes', 'error')
+
+    def __init__(self, name, parent=None, attributes=None, start=None):
+        self.name = name
+        self.span_id = _new_id()
+        if parent is None:
+            self.trace_id = _new_id()
+            self.parent_id = None
+        else:
+            self.trace_id = parent.trace_id
+            self.parent_id = parent.span_id
+        if start is None:
+            start = time.time()
+        self.start = start
+        self.end = None
+        self.attributes = attributes or {}
+        self.error = None
+
+    @property
+    def duration(self):
+        """The number of seconds the span took, or None if it isn't over.
+        """
+        if self.end is None:
+            return None
+        return self.end - self.start
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start': self.start,
+            'duration': self.duration,
+            'attributes': self.attributes,
+            'error': self.error,
+        }
+
+    def __repr__(self):
+        return '<%s %r (%s)>' % (self.__class__.__name__, self.name,
+                                 self.duration)
+
+
+# Stands in for the current span when the trace isn't sampled, so nothing
+# nested in it is recorded either.
+_UNSAMPLED = object()
+
+
+class Tracer(object):
+    """Records spans in a bounded, thread-safe ring buffer.
+
+    Whether a trace is recorded is decided once at its outermost span, so
+    traces are either kept whole or not at all.
+
+    :param capacity: The number of finished spans kept. The oldest are
+        dropped to make room.
+    :param sample_rate: The fraction of traces recorded, from 0 to 1.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, sample_rate=1.0):
+        self.capacity = capacity
+        self.sample_rate = sample_rate
+        self._spans = deque(maxlen=capacity)
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    @property
+    def current(self):
+        """The innermost span being recorded in this thread, or None.
+        """
+        stack = self._stack()
+        if stack and stack[-1] is not _UNSAMPLED:
+            return stack[-1]
+        return None
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Record a span around a with block, with any spans started inside
+        it nested under it. Yields the span, or None if it isn't sampled.
+
+        :param name: What the span is of, such as `'Object.save'`
+        """
+        stack = self._stack()
+        if stack:
+            parent = stack[-1]
+            sampled = parent is not _UNSAMPLED
+        else:
+            parent = None
+            sampled = self._sampled()
+        if not sampled:
+            stack.append(_UNSAMPLED)
+            try:
+                yield None
+            finally:
+                stack.pop()
+            return
+        span = Span(name, parent, attributes)
+        stack.append(span)
+        try:
+            yield span
+        except Exception, e:
+            span.error = repr(e)
+            raise
+        finally:
+            stack.pop()
+            span.end = time.time()
+            self._spans.append(span)
+
+    def record_request(self, event):
+        """Record a span for a request made to FluidDB.
+
+        :param event: The :class:`fom.utils.RequestEvent` of the request
+        """
+        stack = self._stack()
+        if stack:
+            parent = stack[-1]
+            if parent is _UNSAMPLED:
+                return
+        else:
+            parent = None
+            if not self._sampled():
+                return
+        template = path_template(event.url)
+        span = Span('%s %s' % (event.method, template), parent, {
+            'method': event.method,
+            'path': template,
+            'status': event.status,
+            'request_bytes': event.request_bytes,
+            'response_bytes': event.response_bytes,
+            'request_id': event.request_id,
+        }, event.start)
+        span.end = event.end
+        if event.error is not None:
+            span.error = str(event.error)
+        else:
+            span.error = event.fluid_error
+        self._spans.append(span)
+
+    def spans(self):
+        """Return the finished spans kept, oldest first.
+        """
+        return list(self._spans)
+
+    def clear(self):
+        """Drop all the finished spans kept.
+        """
+        self._spans.clear()
+
+    def export(self, filename, append=False):
+        """Write the finished spans kept to a file, one JSON object per
+        line, and return the number written.
+
+        :param filename: The path of the file
+        :param append: Whether to add to the end of the file rather than
+            replace it.
+        """
+        spans = self.spans()
+        tmp = None
+        if append:
+            f = open(filename, 'a')
+        else:
+            # Replace the file in one go, so readers never see half of it.
+            tmp = '%s.%s.tmp' % (filename, os.getpid())
+            f = open(tmp, 'w')
+        try:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), sort_keys=True))
+                f.write('\n')
+        finally:
+            f.close()
+        if tmp is not None:
+            os.rename(tmp, filename)
+        return len(spans)
+
+    def __len__(self):
+        return len(self._spans)
+
+    def __repr__(self):
+        return '<%s (%s spans, %s sampled)>' % (self.__class__.__name__,
+                                                len(self), self.sample_rate)
+
+
+@contextmanager
+def traced(db, name, **attributes):
+    """Record a span around a with block using the tracer of a db, if it has
+    one.
+
+    :param db: A :class:`fom.db.FluidDB`
+    :param name: What the span is of, such as `'Object.save'`
+    """
+    tracer = getattr(db, 'tracer', None)
+    if tracer is None:
+        yield None
+    else:
+        with tracer.span(name, **attributes) as span:
+            yield span
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+
+"""
+    fom.transport
+    ~~~~~~~~~~~~~
+
+    Pluggable HTTP transports for :class:`fom.db.FluidDB`.
+
+    A transport is the only part of fom which actually talks to the network.
+    :class:`fom.db.FluidDB` builds the url, headers and body of a request and
+    then hands them to its transport, which returns a response object with
+    `status_code`, `headers` and `content` attributes (the interface of a
+    :class:`requests.Response`), where `content` is the body as bytes.
+    Streamed responses also have `iter_content` and `close` methods.
+
+    :copyright: 2009-2010 Fom Authors.
+    :license: MIT, see LICENSE for more information.
+
+    .. attribute:: DEFAULT_POOL_CONNECTIONS
+
+        The default number of per-host connection pools to keep
+
+    .. attribute:: DEFAULT_POOL_MAXSIZE
+
+        The default number of connections kept alive in each per-host pool
+"""
+
+import requests
+
+from fom.errors import FluidConnectionError
+from fom.stream import is_streamed, body_length, iter_file, IterReader
+
+
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+
+
+class Transport(object):
+    """The interface for a FluidDB transport.
+
+    Subclasses must implement :meth:`request`.
+    """
+
+    def request(self, method, url, data=None, headers=None, stream=False,
+                timeout=None):
+        """Send a request and return the response.
+
+        Failures to get any response at all must be raised as
+        :class:`fom.errors.FluidConnectionError`.
+
+        :param method: The HTTP method
+        :param url: The full url of the request
+        :param data: The body of the request, or None. This is either a
+            string, a file-like object (including an mmap) or an iterable
+            of strings. The latter two must be streamed rather than read
+            into memory.
+        :param headers: A dict of headers to send
+        :param stream: If True, the body is not read up front. Instead the
+            response has an `iter_content(chunk_size)` method yielding the
+            body in chunks, and a `close()` method to release the
+            connection.
+        :param timeout: The most seconds to wait on the network for this
+            request, on top of any timeouts of the transport itself, or None.
+            Running out of time is raised as a
+            :class:`fom.errors.FluidConnectionError`.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Release any resources (such as open connections) held.
+        """
+
+
+class PooledTransport(Transport):
+    """A transport using a pool of persistent HTTP connections.
+
+    A single instance is safe to share between threads. Connections are kept
+    in one pool per host, and are reused between requests when keep-alive is
+    enabled.
+
+    >>> transport = PooledTransport(pool_maxsize=64, pool_block=True)
+    >>> db = FluidDB(transport=transport)
+
+    :param pool_connections: The number of per-host pools to cache. Only
+        matters when talking to more than one host.
+    :param pool_maxsize: The number of connections to keep alive for each
+        host. This should be at least the number of threads sharing the
+        transport, otherwise extra connections are opened and thrown away.
+    :param keep_alive: Whether connections should be reused between
+        requests.
+    :param pool_block: If True, `pool_maxsize` is a hard limit on the number
+        of connections to each host and callers wait for a free connection
+        rather than opening a new one.
+    :param connect_timeout: The most seconds to wait for a connection to be
+        made, or None to wait as long as the OS allows.
+    :param read_timeout: The most seconds to wait for the server to send
+        anything, or None to wait forever.
+    """
+
+    def __init__(self, pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE, keep_alive=True,
+                 pool_block=False, connect_timeout=None, read_timeout=None):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self.pool_block = pool_block
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.session = requests.session(config={
+            'pool_connections': pool_connections,
+            'pool_maxsize': pool_maxsize,
+            'keep_alive': keep_alive,
+        })
+        # requests doesn't expose the blocking flag or a separate connect
+        # timeout, so rebuild the pool manager with them.
+        self.session.poolmanager = _PoolManager(
+            connect_timeout,
+            num_pools=pool_connections,
+            maxsize=pool_maxsize,
+            block=pool_block,
+        )
+
+    def request(self, method, url, data=None, headers=None, stream=False,
+                timeout=None):
+        if is_streamed(data):
+            data, headers = _prepare_streamed_body(data, headers)
+        try:
+            response = self.session.request(method, url, data=data,
+                headers=headers, prefetch=not stream,
+                timeout=min_timeout(self.read_timeout, timeout))
+        except requests.RequestException, e:
+            raise FluidConnectionError(e)
+        if stream:
+            return _StreamedResponse(response)
+        return response
+
+    def close(self):
+        self.session.poolmanager.clear()
+
+    def __repr__(self):
+        return '<%s (%s connections per host)>' % (self.__class__.__name__,
+                                                   self.pool_maxsize)
+
+
+def min_timeout(*timeouts):
+    """Return the shortest of some timeouts, where None is no timeout.
+    """
+    timeouts = [t for t in timeouts if t is not None]
+    if timeouts:
+        return min(timeouts)
+    return None
+
+
+class _PoolManager(requests.packages.urllib3.PoolManager):
+    """A pool manager whose connections are made with a separate timeout
+    from the one used while waiting for a response.
+    """
+
+    def __init__(self, connect_timeout, **kw):
+        requests.packages.urllib3.PoolManager.__init__(self, **kw)
+        self.connect_timeout = connect_timeout
+
+    def connection_from_host(self, host, port=None, scheme='http'):
+        pool = requests.packages.urllib3.PoolManager.connection_from_host(
+            self, host, port, scheme)
+        if (self.connect_timeout is not None and
+            not getattr(pool, '_connect_timeout', None)):
+            pool._connect_timeout = self.connect_timeout
+            pool._new_conn = _timed_new_conn(pool._new_conn,
+                                             self.connect_timeout)
+        return pool
+
+
+def _timed_new_conn(new_conn, connect_timeout):
+    def new_timed_conn():
+        conn = new_conn()
+        connect = conn.connect
+        def timed_connect():
+            # urllib3 sets the timeout of a connection to the one for the
+            # request before it connects, and only puts it on the socket
+            # once the request has been sent.
+            timeout = conn.timeout
+            conn.timeout = min_timeout(timeout, connect_timeout)
+            try:
+                connect()
+            finally:
+                conn.timeout = timeout
+            conn.sock.settimeout(timeout)
+        conn.connect = timed_connect
+        return conn
+    return new_timed_conn
+
+
+def _chunked(chunks):
+    # Frame chunks for Transfer-Encoding: chunked
+    for chunk in chunks:
+        if chunk:
+            yield '%x\r\n' % len(chunk)
+            yield chunk
+            yield '\r\n'
+    yield '0\r\n\r\n'
+
+
+def _prepare_streamed_body(data, headers):
+    """Return a file-like body for requests to send in blocks, and the
+    headers to send it with.
+
+    Bodies whose length can be found are sent with a Content-Length, anything
+    else is sent with chunked transfer encoding.
+    """
+    headers = dict(headers or {})
+    length = body_length(data)
+    if length is not None:
+        headers['Content-Length'] = str(length)
+        return data, headers
+    if hasattr(data, 'read'):
+        data = iter_file(data)
+    headers['Transfer-Encoding'] = 'chunked'
+    return IterReader(_chunked(data)), headers
+
+
+class _StreamedResponse(object):
+    """A requests response whose body hasn't been read yet.
+    """
+
+    def __init__(self, response):
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self._response = response
+
+    @property
+    def content(self):
+        try:
+            return self._response.content
+        except requests.RequestException, e:
+            raise FluidConnectionError(e)
+
+    def iter_content(self, chunk_size):
+        try:
+            for chunk in self._response.iter_content(chunk_size):
+                yield chunk
+        except requests.RequestException, e:
+            raise FluidConnectionError(e)
+
+    def close(self):
+        raw = self._response.raw
+        # The connection is only still held if the body wasn't read to the
+        # end, and then it can't be reused for another request.
+        connection = getattr(raw, '_connection', None)
+        if connection is not None:
+            connection.close()
+            raw.release_conn()
@@ -1,13 +1,40 @@
 
+import os
+import time
+
 from zope.interface import implements
 
 
-from twisted.internet import reactor, defer, protocol
-from twisted.web import client, http_headers, iweb
+from twisted.internet import reactor, defer, protocol, task
+from twisted.python import failure
+from twisted.web import client, http, http_headers, iweb
 
 
-from fom.db import FluidDB, FluidResponse, NO_CONTENT, _get_body_and_type
+from fom.api import FluidApi
+from fom.breaker import path_class
+from fom.cache import CacheEntry
+from fom.db import (BASE_URL, FluidDB, FluidResponse, NO_CONTENT,
+                    _get_body_and_type)
 from fom import errors
+from fom.mapping import Object
+from fom.session import Fluid
+from fom.stream import (DEFAULT_CHUNK_SIZE, ChunkWriter, FluidStreamResponse,
+                        body_length, iter_file)
+from fom.utils import fom_request_finished
+
+
+#: The default number of idle connections a :class:`TxFluidDB` keeps open to
+#: each host
+DEFAULT_PERSISTENT_PER_HOST = 8
+
+#: The default number of seconds a :class:`TxFluidDB` keeps idle connections
+#: open for
+DEFAULT_CACHED_CONNECTION_TIMEOUT = 240
+
+
+class UnsupportedError(Exception):
+    """An operation which can't be done over Twisted.
+    """
 
 
 class ResponseConsumer(protocol.Protocol):
@@ -16,10 +43,11 @@ class ResponseConsumer(protocol.Protocol):
     converts it to how fom likes it
     """
 
-    def __init__(self, response, finished, is_value):
+    def __init__(self, response, finished, is_value, codec=None):
         self.response = response
         self.finished = finished
         self.is_value = is_value
+        self.codec = codec
         self.buffer = []
 
     def dataReceived(self, bytes):
@@ -39,32 +67,189 @@ class ResponseConsumer(protocol.Protocol):
                 self.response,
                 ''.join(self.buffer),
                 self.is_value,
+                self.codec,
             )
             self.finished.callback(response)
         except Exception, e:
             self.finished.errback(e)
 
 
-class StringProducer(object):
+class StreamConsumer(protocol.Protocol):
     """
-    A body producer that pushes a string in one big chunk.
+    A protocol which writes response body data to a
+    :class:`fom.stream.ChunkWriter` as it arrives, rather than buffering it
+    """
+
+    def __init__(self, response, writer, finished):
+        self.response = response
+        self.writer = writer
+        self.finished = finished
+        self.error = None
+
+    def dataReceived(self, bytes):
+        if self.error is not None:
+            return
+        try:
+            self.writer.write(bytes)
+        except Exception, e:
+            # Stop receiving, the error is reported once the body is done.
+            self.error = e
+            self.transport.stopProducing()
+
+    def connectionLost(self, reason):
+        if self.error is not None:
+            self.finished.errback(self.error)
+            return
+        if not reason.check(client.ResponseDone, http.PotentialDataLoss):
+            self.finished.errback(reason)
+            return
+        try:
+            self.writer.finish()
+        except Exception, e:
+            self.finished.errback(e)
+            return
+        response = FluidStreamResponse(self.response)
+        response.size = self.writer.size
+        response.digest = self.writer.digest
+        self.finished.callback(response)
+
+
+class BodyProducer(object):
+    """
+    A body producer that streams a request body in chunks, as the connection
+    is ready for them.
+
+    Writing is paused and resumed as the transport asks, so a large body is
+    never held in memory at once unless it is a string already. File-like
+    bodies, and iterables with a `close` method, are closed once they have
+    been sent or the request is stopped.
+
+    :param body: The body, which can be a string, a file-like object or an
+        iterable of strings.
+    :param chunk_size: The size of the chunks a string or a file-like
+        object is written in. The chunks of an iterable are written as they
+        are.
+    :param cooperator: The :class:`twisted.internet.task.Cooperator` to
+        schedule the writes with.
     """
-    # XXX This should really stream things, otherwise what's the point!
     implements(iweb.IBodyProducer)
 
-    def __init__(self, body):
+    def __init__(self, body, chunk_size=DEFAULT_CHUNK_SIZE,
+                 cooperator=task):
         self.body = body
-        self.length = len(body)
+        self.chunk_size = chunk_size
+        self.length = self._length(body)
+        self._cooperate = cooperator.cooperate
+        self._task = None
+
+    def _length(self, body):
+        length = body_length(body)
+        if length is None and hasattr(body, 'seek'):
+            try:
+                position = body.tell()
+                body.seek(0, os.SEEK_END)
+                length = body.tell() - position
+                body.seek(position, os.SEEK_SET)
+            except (AttributeError, IOError):
+                length = None
+        if length is None:
+            return client.UNKNOWN_LENGTH
+        return length
+
+    def _chunks(self):
+        body = self.body
+        if isinstance(body, basestring):
+            return (body[i:i + self.chunk_size]
+                    for i in xrange(0, len(body), self.chunk_size))
+        if hasattr(body, 'read'):
+            return iter_file(body, self.chunk_size)
+        return iter(body)
+
+    def _write(self, consumer):
+        for chunk in self._chunks():
+            if chunk:
+                consumer.write(chunk)
+                yield None
 
     def startProducing(self, consumer):
-        consumer.write(self.body)
-        return defer.succeed(None)
+        self._task = self._cooperate(self._write(consumer))
+        d = self._task.whenDone()
+
+        def stopped(reason):
+            reason.trap(task.TaskStopped)
+            # The request is being abandoned, so don't tell it we're done.
+            return defer.Deferred()
+        d.addCallbacks(lambda _: None, stopped)
+        d.addBoth(self._close)
+        return d
+
+    def _close(self, result):
+        close = getattr(self.body, 'close', None)
+        if close is not None:
+            close()
+        return result
 
     def pauseProducing(self):
-        pass
+        self._task.pause()
+
+    def resumeProducing(self):
+        self._task.resume()
 
     def stopProducing(self):
-        pass
+        try:
+            self._task.stop()
+        except task.TaskDone:
+            return
+        self._close(None)
+
+
+# Backwards compat
+StringProducer = BodyProducer
+
+
+def _body_producer(payload):
+    """Return a body producer for a request payload, or None.
+    """
+    if payload is None:
+        return None
+    return BodyProducer(payload)
+
+
+class _RequestTimer(object):
+    """Gives up on a request which hasn't finished in time, by cancelling it
+    or dropping the connection its response is arriving on. The request
+    then fails with :class:`fom.errors.FluidTimeoutError`.
+    """
+
+    def __init__(self, timeout, finished):
+        self.timeout = timeout
+        self.done = False
+        self.expired = False
+        self.request = None
+        self.consumers = ()
+        self.delayed = None
+        finished.addBoth(self.finish)
+
+    def start(self, request, consumers):
+        self.request = request
+        self.consumers = consumers
+        if not self.done:
+            self.delayed = reactor.callLater(self.timeout, self.expire)
+
+    def expire(self):
+        self.expired = True
+        if self.consumers and self.consumers[0].transport is not None:
+            self.consumers[0].transport.stopProducing()
+        else:
+            self.request.cancel()
+
+    def finish(self, result):
+        self.done = True
+        if self.delayed is not None and self.delayed.active():
+            self.delayed.cancel()
+        if self.expired and isinstance(result, failure.Failure):
+            return failure.Failure(errors.FluidTimeoutError(self.timeout))
+        return result
 
 
 class TxResponseProxy(dict):
@@ -82,45 +267,486 @@ class TxResponseProxy(dict):
 class TxFluidDB(FluidDB):
     """
     Like fom.db.FluidDB, but twistedified
+
+    Calls return Deferreds, so any number of requests can be in flight on
+    the reactor thread. Connections are kept open and reused between
+    requests to the same host. Bodies are received with :meth:`download`,
+    as :meth:`stream` is not supported.
+
+    Takes the same arguments as :class:`fom.db.FluidDB`, and also:
+
+    :param connect_timeout: The most seconds to wait for a connection to be
+        made, or None for no limit.
+    :param max_concurrent: The most requests which may be in flight at once.
+        Further requests wait for one to finish before being sent, rather
+        than each opening a connection. Unlimited if None.
+    :param max_persistent_per_host: The most idle connections kept open to
+        each host. Defaults to `max_concurrent` if that is given, so every
+        request in flight can go back to the pool, and otherwise to
+        :data:`DEFAULT_PERSISTENT_PER_HOST`.
+    :param cached_connection_timeout: The number of seconds an idle
+        connection is kept open for.
+    :param pool: The :class:`twisted.web.client.HTTPConnectionPool` to keep
+        connections in, instead of one made with the above settings.
     """
 
     def __init__(self, *args, **kw):
+        connect_timeout = kw.pop('connect_timeout', None)
+        max_concurrent = kw.pop('max_concurrent', None)
+        max_per_host = kw.pop('max_persistent_per_host', None)
+        cached_timeout = kw.pop('cached_connection_timeout',
+                                DEFAULT_CACHED_CONNECTION_TIMEOUT)
+        pool = kw.pop('pool', None)
         FluidDB.__init__(self, *args, **kw)
-        self.agent = client.Agent(reactor)
+        if pool is None:
+            if max_per_host is None:
+                max_per_host = max_concurrent or DEFAULT_PERSISTENT_PER_HOST
+            pool = client.HTTPConnectionPool(reactor, persistent=True)
+            pool.maxPersistentPerHost = max_per_host
+            pool.cachedConnectionTimeout = cached_timeout
+        self.pool = pool
+        if max_concurrent is None:
+            self.semaphore = None
+        else:
+            self.semaphore = defer.DeferredSemaphore(max_concurrent)
+        agent = client.Agent(reactor, connectTimeout=connect_timeout,
+                             pool=pool)
+        self.agent = client.ContentDecoderAgent(agent,
+                                                [('gzip', client.GzipDecoder)])
 
     def __call__(self, method, path, payload=NO_CONTENT, urlargs=None,
-                       content_type=None, is_value=False):
-        payload, content_type = _get_body_and_type(payload, content_type)
+                       content_type=None, is_value=False, timeout=None):
+        payload, content_type = _get_body_and_type(payload, content_type,
+                                                   self.codec)
         urlargs = urlargs or {}
         headers = self._get_headers(content_type)
+        payload = self._compress(payload, headers)
         url = self._get_url(path, urlargs)
 
+        def deliver(response, finished, consumers):
+            responseproxy = TxResponseProxy(response)
+            consumer = ResponseConsumer(responseproxy, finished, is_value,
+                                        self.codec)
+            consumers.append(consumer)
+            if response.length:
+                response.deliverBody(consumer)
+            else:
+                consumer.connectionLost(client.ResponseDone())
+
+        return self._start(method, url, payload, headers, timeout, deliver)
+
+    def _start(self, method, url, payload, headers, timeout, deliver):
+        """Send a request once the concurrency limit and the breaker let it,
+        within its timeout.
+
+        :param deliver: Called with the response, the Deferred to fire with
+            the result, and a list to add the protocol receiving the body to.
+        :returns: The Deferred firing with the result.
+        """
+        finished = defer.Deferred()
+        timer = None
+        if timeout is not None:
+            timer = _RequestTimer(timeout, finished)
+        if (self.metrics is not None or self.tracer is not None or
+            fom_request_finished.receivers):
+            # Measured now, as sending reads a streamed body to its end.
+            finished.addBoth(self._on_finished, method, url, payload,
+                             headers, time.time(), body_length(payload) or 0)
+        consumers = []
+        # Whether the request got past the limit and the breaker, and so
+        # was sent.
+        dispatched = []
+        key = None
+        if self.breaker is not None:
+            key = path_class(url)
+            finished.addBoth(self._record_outcome, key, dispatched)
+
+        def send(_):
+            if key is not None:
+                try:
+                    self.breaker.before(key)
+                except errors.FluidCircuitOpenError:
+                    finished.errback()
+                    return None
+            dispatched.append(True)
+            request = self._request(method, url, headers,
+                                    _body_producer(payload))
+            request.addCallbacks(deliver, finished.errback,
+                                 callbackArgs=(finished, consumers))
+            return request
+
+        if self.semaphore is None:
+            request = send(None)
+            if timer is not None:
+                timer.start(request, consumers)
+            return finished
+
+        # Until its turn comes, the timer cancels the wait for it.
+        waiting = self.semaphore.acquire()
+        if timer is not None:
+            timer.start(waiting, consumers)
+        acquired = []
+
+        def on_acquired(_):
+            acquired.append(True)
+            request = send(None)
+            if timer is not None and request is not None:
+                timer.request = request
+
+        def release(result):
+            if acquired:
+                self.semaphore.release()
+            return result
+
+        finished.addBoth(release)
+        waiting.addCallbacks(on_acquired, finished.errback)
+        return finished
+
+    def close(self):
+        """Close the connections kept open for reuse.
+
+        :returns: A Deferred firing once they are closed.
+        """
+        return self.pool.closeCachedConnections()
+
+    def _on_finished(self, result, method, url, payload, headers, start,
+                     request_bytes):
+        if isinstance(result, failure.Failure):
+            if result.check(errors.FluidCircuitOpenError):
+                # Nothing was sent
+                return result
+            error = result.value
+            fluid_response = getattr(error, 'response', None)
+        else:
+            error = None
+            fluid_response = result
+        response = None
+        streamed = isinstance(fluid_response, FluidStreamResponse)
+        if fluid_response is not None:
+            proxy = fluid_response.response
+            response = CacheEntry(proxy.status_code, proxy.headers,
+                                  getattr(fluid_response, 'content', None))
+        self._finished(method, url, payload, headers, start, response,
+                       error, streamed, request_bytes)
+        return result
+
+    def _record_outcome(self, result, key, dispatched):
+        if not dispatched:
+            # Given up on before it was sent, so it says nothing about the
+            # server.
+            return result
+        if isinstance(result, failure.Failure):
+            self.breaker.record(key, result.value)
+        else:
+            self.breaker.record(key)
+        return result
+
+    def stream(self, method, path, urlargs=None,
+               chunk_size=DEFAULT_CHUNK_SIZE):
+        """Not available with Twisted, as the reactor pushes data rather than
+        having it pulled, so this raises :class:`UnsupportedError`. Use
+        :meth:`download` with a file-like object to receive the chunks
+        instead.
+        """
+        raise UnsupportedError('Responses cannot be read in chunks with '
+                               'Twisted; use download() instead')
+
+    def download(self, path, fileobj, urlargs=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE, hash_name=None, digest=None,
+                 timeout=None):
+        """GET a path and write its body to a file-like object as it arrives.
+
+        Parameters are as :meth:`fom.db.FluidDB.download`, except that the
+        size of the chunks is decided by the reactor, so `chunk_size` is
+        ignored. Downloads are limited, timed and recorded as other
+        requests are.
+
+        :param timeout: The number of seconds the download may take before
+            failing with :class:`fom.errors.FluidTimeoutError`.
+
+        :returns: A Deferred firing with a
+            :class:`fom.stream.FluidStreamResponse` holding the `size` and
+            `digest` of the body.
+        """
+        writer = ChunkWriter(fileobj, hash_name, digest)
+        headers = self._get_headers(None)
+        url = self._get_url(path, urlargs or {})
+
+        def deliver(response, finished, consumers):
+            responseproxy = TxResponseProxy(response)
+            if response.code >= 400:
+                consumer = ResponseConsumer(responseproxy, finished, False,
+                                            self.codec)
+                if not response.length:
+                    consumer.connectionLost(client.ResponseDone())
+                    return
+            else:
+                consumer = StreamConsumer(responseproxy, writer, finished)
+            consumers.append(consumer)
+            response.deliverBody(consumer)
+
+        return self._start('GET', url, None, headers, timeout, deliver)
+
+    def _request(self, method, url, headers, body_producer):
+        # The decoder agent negotiates the encodings it can decode itself.
+        headers.pop('Accept-Encoding', None)
+
         for k, v in headers.items():
             if isinstance(v, unicode):
                 headers[k] = v.encode('utf-8')
             headers[k] = [headers[k]]
 
-        if payload is None:
-            body_producer = None
+        args = (method, url, http_headers.Headers(headers), body_producer)
+        if self.rate_limit is not None:
+            # Wait without blocking the reactor.
+            delay = self.rate_limit.reserve(method)
+            if delay > 0:
+                return task.deferLater(reactor, delay, self.agent.request,
+                                       *args)
+        return self.agent.request(*args)
+
+
+class TxFluid(Fluid):
+    """A fluiddb session over a :class:`TxFluidDB`, whose api calls return
+    Deferreds.
+
+    >>> fdb = TxFluid()
+    >>> d = fdb.users['aliafshar'].get()
+
+    :param base_url: The base FluidDB url to use.
+    :param kw: Any other arguments of :class:`TxFluidDB`, such as
+        `max_concurrent`.
+    """
+
+    def __init__(self, base_url=BASE_URL, **kw):
+        FluidApi.__init__(self, TxFluidDB(base_url, **kw))
+
+    def close(self):
+        """Close the connections kept open for reuse.
+
+        :returns: A Deferred firing once they are closed.
+        """
+        return self.db.close()
+
+
+def gather(func, *iterables, **kw):
+    """Call `func` with the items of each iterable, like the builtin `map`,
+    at most `limit` calls at a time.
+
+    >>> d = gather(lambda uid: fdb.objects[uid]['test/tag'].get(), uids,
+    ...            limit=20)
+
+    :param func: A callable returning a Deferred, or a result.
+    :param limit: The most calls whose Deferreds may be waiting at once.
+        Unlimited if None.
+    :param return_errors: Whether the exception of a call which failed is
+        given in place of its result. Otherwise the returned Deferred fails
+        with the first error, though the other calls still run.
+    :returns: A Deferred firing with the list of results, in order.
+    """
+    limit = kw.pop('limit', None)
+    return_errors = kw.pop('return_errors', False)
+    if kw:
+        raise TypeError('Unexpected arguments %s' % ', '.join(kw))
+    semaphore = None
+    if limit is not None:
+        semaphore = defer.DeferredSemaphore(limit)
+    ds = []
+    for args in zip(*iterables):
+        if semaphore is None:
+            d = defer.maybeDeferred(func, *args)
         else:
-            body_producer = StringProducer(payload)
+            d = semaphore.run(func, *args)
+        if return_errors:
+            d.addErrback(lambda f: f.value)
+        ds.append(d)
+    d = defer.gatherResults(ds, consumeErrors=True)
+    # Fail with the error of the call rather than a FirstError wrapping it
+    d.addErrback(lambda f: f.value.subFailure)
+    return d
 
-        request = self.agent.request(
-            method,
-            url,
-            http_headers.Headers(headers),
-            body_producer,
-        )
 
-        finished = defer.Deferred()
+class NotLoadedError(AttributeError):
+    """A field of a :class:`TxObject` was read before being loaded.
+    """
 
-        def on_response(response):
-            responseproxy = TxResponseProxy(response)
-            consumer = ResponseConsumer(responseproxy, finished, is_value)
-            if response.length:
-                response.deliverBody(consumer)
-            else:
-                consumer.connectionLost(client.ResponseDone())
+    def __init__(self, obj, tagpath):
+        AttributeError.__init__(self, '%s has not been loaded for %r; load '
+                                'it first, with load() or load_many()'
+                                % (tagpath, obj))
+        self.tagpath = tagpath
 
-        request.addCallback(on_response)
-        return finished
+
+class TxObject(Object):
+    """An object mapped over a :class:`TxFluid` session, whose requests are
+    made through methods returning Deferreds rather than attribute access.
+
+    Load the fields of objects before reading them, from /values in batches
+    of many objects, and then read them as attributes as usual.
+
+    >>> books = yield Book.load_many(uids)
+    >>> print books[0].title
+    >>> books[0].title = u'Fom'
+    >>> yield books[0].save()
+
+    Reading a field which was not loaded raises :class:`NotLoadedError`,
+    as getting it would block. A field which isn't saved lazily is written
+    as soon as it is set, and :meth:`save` waits for the write, failing if
+    it did. :class:`fom.mapping.tag_collection` fields are not supported,
+    and raise :class:`UnsupportedError`.
+    """
+
+    #: The most objects whose fields are loaded by a single /values request
+    batch_size = 100
+
+    def __init__(self, *args, **kw):
+        # Writes made as fields were set, for save() to wait for
+        self._writes = []
+        Object.__init__(self, *args, **kw)
+
+    def create(self, about=None):
+        """Create a new object.
+
+        :returns: A Deferred firing with the object once it is created, which
+            is also kept as `created`.
+        """
+        def created(r):
+            self.uid = r.value[u'id']
+            self.about = about
+            self._cache['fluiddb/about'] = about
+            return self
+        self.created = self.fluid.objects.post(about).addCallback(created)
+        return self.created
+
+    def get(self, tagpath):
+        """Get the value of a tag.
+
+        :returns: A Deferred firing with the value and its content type.
+        """
+        def got(r):
+            self._cache[tagpath] = r.value
+            return r.value, r.content_type
+        return self.api[tagpath].get().addCallback(got)
+
+    def get_uncached(self, tagpath):
+        raise NotLoadedError(self, tagpath)
+
+    def get_collection(self, collection):
+        raise UnsupportedError('%s is a tag_collection, which cannot be used '
+                               'on a TxObject' % collection.tagpath)
+
+    def set(self, tagpath, value, valueType=None):
+        """Set the value of a tag.
+
+        :returns: A Deferred firing once the value is stored, or straight
+            away if it is saved lazily.
+        """
+        d = Object.set(self, tagpath, value, valueType)
+        if d is None:
+            return defer.succeed(None)
+        self._writes.append(d)
+        return d
+
+    def delete(self, tagpath):
+        """Removes a tag from the object.
+
+        :returns: A Deferred firing once it is removed.
+        """
+        return Object.delete(self, tagpath)
+
+    def load(self, *tagpaths):
+        """Get the values of the fields of this object, or of the given tags,
+        in a single request.
+
+        :returns: A Deferred firing with the object.
+        """
+        d = self._load_batch([self.uid], tagpaths or None, self.fluid)
+        return d.addCallback(lambda results: self._fill(results))
+
+    def _fill(self, results):
+        for tagpath, value in results.get(self.uid, {}).items():
+            if 'value' in value:
+                self._cache[tagpath] = value['value']
+        return self
+
+    @classmethod
+    def load_many(cls, uids, tagpaths=None, fluid=None, limit=4):
+        """Make objects of this class for some object ids, with their fields
+        loaded from /values in batches of :attr:`batch_size` objects.
+
+        :param uids: The ids of the objects.
+        :param tagpaths: The tags to load, which defaults to the fields of
+            the class.
+        :param fluid: The session to use, which defaults to the bound one.
+        :param limit: The most batches which may be loading at once.
+        :returns: A Deferred firing with the objects, in the order of
+            `uids`.
+        """
+        fluid = fluid or Fluid.bound
+        uids = list(uids)
+        batches = [uids[i:i + cls.batch_size]
+                   for i in range(0, len(uids), cls.batch_size)]
+        d = gather(cls._load_batch, batches, [tagpaths] * len(batches),
+                   [fluid] * len(batches), limit=limit)
+
+        def loaded(results):
+            values = {}
+            for result in results:
+                values.update(result)
+            return [cls(uid, fluid=fluid)._fill(values) for uid in uids]
+        return d.addCallback(loaded)
+
+    @classmethod
+    def _load_batch(cls, uids, tagpaths, fluid):
+        query = ' or '.join('fluiddb/id = "%s"' % uid for uid in uids)
+        d = fluid.values.get(query, tagpaths or cls._value_tag_paths())
+        return d.addCallback(lambda r: r.value['results']['id'])
+
+    def save(self):
+        """Saves those fields that have been updated, in a single request.
+
+        :returns: A Deferred firing once they are saved, and any fields
+            written when they were set have been, failing with the first
+            error.
+        """
+        try:
+            about = self.about
+        except NotLoadedError:
+            raise ValueError('Cannot save an object whose fluiddb/about '
+                             'value has not been loaded')
+        if not about:
+            raise ValueError(
+                "Cannot save for an object without an about value")
+        writes, self._writes = self._writes, []
+        if self._dirty_fields:
+            query, values = self._dirty_values()
+            saving = set(self._dirty_fields)
+            self._dirty_fields.clear()
+
+            def failed(f):
+                # Leave the fields to be saved next time
+                self._dirty_fields.update(saving)
+                return f
+            writes.append(self.fluid.values.put(query, values)
+                          .addErrback(failed))
+        if not writes:
+            return defer.succeed(None)
+        d = gather(lambda write: write, writes)
+        return d.addCallback(lambda _: None)
+
+    @classmethod
+    def filter(cls, query, result_type=None, fluid=None):
+        """Get the objects matching a query, with the fields of their class
+        loaded, as :meth:`fom.mapping.Object.filter`.
+
+        :param fluid: The session to use, which defaults to the bound one.
+        :returns: A Deferred firing with the objects.
+        """
+        class_type = result_type or cls
+        fluid = fluid or Fluid.bound
+        if class_type == Object:
+            d = fluid.objects.get(query)
+            return d.addCallback(lambda r: [class_type(uid, fluid=fluid)
+                                            for uid in r.value['ids']])
+        d = fluid.values.get(query, class_type._value_tag_paths())
+        return d.addCallback(class_type._from_values, fluid)
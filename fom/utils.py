@@ -10,8 +10,15 @@
     :license: MIT, see LICENSE for more information.
 
     Inspiration from flask.signals (Armin Ronacher)
+
+    Sending a signal costs next to nothing when it has no receivers, as fom
+    checks :attr:`receivers` before building anything to send. Receivers of
+    :data:`fom_request_finished` get a :class:`RequestEvent`, which only
+    reads the parts of the request and response it is asked for.
 """
 
+from fom.stream import body_length
+
 try:
     from blinker import Namespace
 except ImportError:
@@ -22,6 +29,9 @@ class _DummySignal(object):
     """A fake signal which complains when it is used and noops when it is
     fired.
     """
+    # Never has any, so nothing is ever built to be sent.
+    receivers = {}
+
     def __init__(self, name, doc=None):
         self.name = name
         self.__doc__ = doc
@@ -56,4 +66,114 @@ fom_response_received = fom_signals.signal('response-received', doc="""
 Signal sent on receipt of a response from fluiddb, before any response checking
 has taken place""")
 
+fom_request_finished = fom_signals.signal('request-finished', doc="""
+Signal sent once each request has been answered or has failed, with a
+RequestEvent as `event`""")
+
+
+class RequestEvent(object):
+    """A request which has been sent to FluidDB, as given to receivers of
+    :data:`fom_request_finished`.
+
+    Nothing is copied or read up front. The payload and response are the
+    ones used for the request, so must not be changed.
+
+    .. attribute:: start
+
+        The time the request was sent
+
+    .. attribute:: end
+
+        The time the response arrived, or the request failed
+
+    .. attribute:: response
+
+        The response from the transport, or None if there was none
+
+    .. attribute:: error
+
+        The :class:`fom.errors.FluidError` raised if there was no response
+
+    .. attribute:: streamed
+
+        Whether the response body is streamed, and so not yet read
+    """
 
+    __slots__ = ('method', 'url', 'payload', 'headers', 'start', 'end',
+                 'response', 'error', 'streamed', '_request_bytes')
+
+    def __init__(self, method, url, payload, headers, start, end,
+                 response=None, error=None, streamed=False,
+                 request_bytes=None):
+        self.method = method
+        self.url = url
+        self.payload = payload
+        self.headers = headers
+        self.start = start
+        self.end = end
+        self.response = response
+        self.error = error
+        self.streamed = streamed
+        self._request_bytes = request_bytes
+
+    @property
+    def elapsed(self):
+        """The number of seconds the request took.
+        """
+        return self.end - self.start
+
+    @property
+    def status(self):
+        """The response status, or `'error'` if there was no response.
+        """
+        if self.response is None:
+            return 'error'
+        return self.response.status_code
+
+    @property
+    def content(self):
+        """The response body, or None if there was no response or it is
+        streamed.
+        """
+        if self.response is None or self.streamed:
+            return None
+        return self.response.content
+
+    @property
+    def request_id(self):
+        """The id FluidDB gave the request, or None.
+        """
+        if self.response is None:
+            return None
+        return self.response.headers.get('x-fluiddb-request-id')
+
+    @property
+    def fluid_error(self):
+        """The class of error FluidDB reported, or None.
+        """
+        if self.response is None:
+            return None
+        return self.response.headers.get('x-fluiddb-error-class')
+
+    @property
+    def request_bytes(self):
+        """The size of the request body, or 0 if unknown.
+
+        A streamed body has been read by the time the event is made, so its
+        size is the one measured before it was sent.
+        """
+        if self._request_bytes is not None:
+            return self._request_bytes
+        if self.payload is None:
+            return 0
+        return body_length(self.payload) or 0
+
+    @property
+    def response_bytes(self):
+        """The size of the response body, or 0 if unknown.
+        """
+        return len(self.content or '')
+
+    def __repr__(self):
+        return '<%s (%s %s, %s, %.3fs)>' % (self.__class__.__name__,
+            self.method, self.url, self.status, self.elapsed)
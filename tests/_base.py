@@ -13,16 +13,29 @@ from collections import deque
 
 
 from fom.db import FluidDB, _generate_endpoint_url, NO_CONTENT, FluidResponse
+from fom.transport import Transport
 
 
 class FakeHttpLibResponse(dict):
 
-    def __init__(self, status, content_type, content=None):
+    def __init__(self, status, content_type, content=None, headers=None):
         # yeah, I know, blame httplib2 for this API
         self.status_code = status
         self.headers = {}
         self.headers['content-type'] = content_type
+        if headers:
+            self.headers.update(headers)
         self.text = content
+        self.content = content
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        content = self.content or ''
+        for i in range(0, len(content), chunk_size):
+            yield content[i:i + chunk_size]
+
+    def close(self):
+        self.closed = True
 
 
 class FakeHttpLibRequest(object):
@@ -35,10 +48,40 @@ class FakeHttpLibRequest(object):
         return self.response
 
 
+class FakeTransport(Transport):
+    """A transport which records requests and replays queued responses.
+    """
+
+    def __init__(self):
+        self.reqs = []
+        self.timeouts = []
+        self.resps = deque()
+        self.default_response = FakeHttpLibResponse(200, 'text/plain', 'empty')
+
+    def add_resp(self, status, content_type, content, headers=None):
+        hresp = FakeHttpLibResponse(status, content_type, content, headers)
+        self.resps.append(hresp)
+
+    def add_error(self, error):
+        self.resps.append(error)
+
+    def request(self, method, url, data=None, headers=None, stream=False,
+                timeout=None):
+        self.reqs.append((method, url, data, headers))
+        self.timeouts.append(timeout)
+        try:
+            resp = self.resps.popleft()
+        except IndexError:
+            resp = self.default_response
+        if isinstance(resp, Exception):
+            raise resp
+        return resp
+
+
 class FakeFluidDB(FluidDB):
 
     def __init__(self):
-        FluidDB.__init__(self, 'http://testing')
+        FluidDB.__init__(self, 'http://testing', FakeTransport())
         self.reqs = []
         self.resps = deque()
         self.default_response = FakeHttpLibResponse(200, 'text/plain', 'empty')
@@ -56,4 +99,4 @@ class FakeFluidDB(FluidDB):
             resp = self.resps.popleft()
         except IndexError:
             resp = self.default_response
-        return FluidResponse(resp, resp.text, is_value)
+        return FluidResponse(resp, resp.content, is_value)
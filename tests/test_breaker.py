@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+import time
+import unittest
+
+from fom.breaker import (CircuitBreaker, CLOSED, OPEN, HALF_OPEN,
+    path_class)
+from fom.cache import MemoryCache
+from fom.db import FluidDB
+from fom.deadline import deadline
+from fom.errors import (FluidCircuitOpenError, FluidConnectionError,
+    FluidTimeoutError, Fluid404Error, Fluid503Error)
+from fom.retry import RetryPolicy
+
+from _base import FakeTransport
+
+
+class FakeClockBreaker(CircuitBreaker):
+
+    now = 0.0
+
+    def clock(self):
+        return self.now
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = FakeTransport()
+        self.breaker = FakeClockBreaker(failure_threshold=2,
+                                        reset_timeout=10)
+        self.db = FluidDB('http://foo.com', self.transport,
+                          breaker=self.breaker)
+
+    def failRequest(self, path=('objects', '1234')):
+        self.transport.add_resp(503, 'text/plain', 'Service Unavailable')
+        self.assertRaises(Fluid503Error, self.db, 'GET', list(path))
+
+    def testOpen(self):
+        """Make sure requests fail fast once the threshold is reached
+        """
+        self.failRequest()
+        self.assertEqual(CLOSED, self.breaker.state('objects'))
+        self.failRequest()
+        self.assertEqual(OPEN, self.breaker.state('objects'))
+        self.breaker.now = 4
+        try:
+            self.db('GET', ['objects', '5678'])
+        except FluidCircuitOpenError, e:
+            self.assertEqual('objects', e.path_class)
+            self.assertEqual(6, e.retry_in)
+        else:
+            self.fail('Circuit not open')
+        self.assertEqual(2, len(self.transport.reqs))
+
+    def testPerPathClass(self):
+        """Make sure other kinds of path are unaffected by an open circuit
+        """
+        self.failRequest()
+        self.failRequest()
+        self.transport.add_resp(200, 'application/json', '{}')
+        self.assertEqual(200, self.db('GET', ['namespaces', 'test']).status)
+
+    def testHalfOpen(self):
+        self.failRequest()
+        self.failRequest()
+        self.breaker.now = 10
+        self.transport.add_resp(200, 'application/json', '{}')
+        self.db('GET', ['objects', '1234'])
+        self.assertEqual(CLOSED, self.breaker.state('objects'))
+
+    def testHalfOpenFailure(self):
+        """Make sure a failed trial request opens the circuit again
+        """
+        self.failRequest()
+        self.failRequest()
+        self.breaker.now = 10
+        self.failRequest()
+        self.assertEqual(OPEN, self.breaker.state('objects'))
+        self.breaker.now = 15
+        self.assertRaises(FluidCircuitOpenError, self.db, 'GET',
+                          ['objects', '1234'])
+
+    def testTrialLimit(self):
+        """Make sure only one trial request is let through at a time
+        """
+        for i in range(2):
+            self.breaker.record('values', FluidConnectionError(IOError()))
+        self.breaker.now = 10
+        self.breaker.before('values')
+        self.assertEqual(HALF_OPEN, self.breaker.state('values'))
+        self.assertRaises(FluidCircuitOpenError, self.breaker.before,
+                          'values')
+
+    def testClientErrors(self):
+        """Make sure client errors don't count as failures
+        """
+        for i in range(3):
+            self.transport.add_resp(404, 'text/plain', 'Not Found')
+            self.assertRaises(Fluid404Error, self.db, 'GET',
+                              ['objects', '1234'])
+        self.assertEqual(CLOSED, self.breaker.state('objects'))
+
+    def testLocalTimeouts(self):
+        """Make sure running out of time before sending isn't counted
+        against the server
+        """
+        for i in range(2):
+            with deadline(0.001):
+                time.sleep(0.002)
+                self.assertRaises(FluidTimeoutError, self.db, 'GET',
+                                  ['objects', '1234'])
+        self.assertEqual(CLOSED, self.breaker.state('objects'))
+        self.assertEqual(0, len(self.transport.reqs))
+        self.assertTrue(self.breaker.is_failure(FluidTimeoutError(1)))
+
+    def testSuccessResets(self):
+        self.failRequest()
+        self.transport.add_resp(200, 'application/json', '{}')
+        self.db('GET', ['objects', '1234'])
+        self.failRequest()
+        self.assertEqual(CLOSED, self.breaker.state('objects'))
+
+    def testNotRetried(self):
+        self.db.retry = RetryPolicy(max_retries=5, backoff=0)
+        for i in range(2):
+            self.transport.add_resp(503, 'text/plain', '')
+        self.assertRaises(FluidCircuitOpenError, self.db, 'GET',
+                          ['objects', '1234'])
+        self.assertEqual(2, len(self.transport.reqs))
+
+    def testCacheServed(self):
+        """Make sure fresh cached responses are served while open
+        """
+        self.db.cache = MemoryCache(max_age=60)
+        self.transport.add_resp(200, 'application/json', '{"id": "1234"}')
+        self.db('GET', ['objects', '1234'])
+        self.failRequest(('objects', '5678'))
+        self.failRequest(('objects', '5678'))
+        r = self.db('GET', ['objects', '1234'])
+        self.assertEqual({'id': '1234'}, r.value)
+
+    def testPathClass(self):
+        self.assertEqual('objects',
+                         path_class('http://foo.com/objects/1234?x=1'))
+        self.assertEqual('values', path_class('http://foo.com/values?q=1'))
+        self.assertEqual('', path_class('http://foo.com'))
+
+
+if __name__ == '__main__':
+    unittest.main()
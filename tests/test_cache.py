@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from fom.db import FluidDB
+from fom.cache import CacheEntry, MemoryCache, SqliteCache, credentials_key
+
+from _base import FakeTransport
+
+
+def make_entry(content, headers=None, status=200):
+    return CacheEntry(status, headers or {}, content)
+
+
+class TestMemoryCache(unittest.TestCase):
+
+    def testGetSet(self):
+        cache = MemoryCache()
+        entry = make_entry('foo')
+        cache.set(('GET', 'http://foo.com/users/test', ''), entry)
+        self.assertEqual(entry,
+                         cache.get(('GET', 'http://foo.com/users/test', '')))
+        self.assertEqual(None,
+                         cache.get(('HEAD', 'http://foo.com/users/test', '')))
+
+    def testEviction(self):
+        """Make sure the least recently used entries go first
+        """
+        cache = MemoryCache(max_bytes=30)
+        cache.set(('GET', 'a', ''), make_entry('x' * 10))
+        cache.set(('GET', 'b', ''), make_entry('x' * 10))
+        cache.get(('GET', 'a', ''))
+        cache.set(('GET', 'c', ''), make_entry('x' * 10))
+        self.assertEqual(30, cache.size)
+        cache.set(('GET', 'd', ''), make_entry('x' * 10))
+        self.assertEqual(30, cache.size)
+        self.assertEqual(None, cache.get(('GET', 'b', '')))
+        self.assertNotEqual(None, cache.get(('GET', 'a', '')))
+        self.assertEqual(3, len(cache))
+
+    def testTooLarge(self):
+        cache = MemoryCache(max_bytes=5)
+        cache.set(('GET', 'a', ''), make_entry('x' * 10))
+        self.assertEqual(0, len(cache))
+        self.assertEqual(0, cache.size)
+
+    def testInvalidate(self):
+        """Make sure all entries for a path are dropped, whatever their
+        method or url arguments
+        """
+        cache = MemoryCache()
+        cache.set(('GET', 'http://foo.com/tags/test/foo', ''), make_entry('a'))
+        cache.set(('GET',
+                   'http://foo.com/tags/test/foo?returnDescription=True', ''),
+                  make_entry('b'))
+        cache.set(('HEAD', 'http://foo.com/tags/test/foo', ''), make_entry(''))
+        cache.set(('GET', 'http://foo.com/tags/test/bar', ''), make_entry('c'))
+        cache.invalidate('http://foo.com/tags/test/foo')
+        self.assertEqual(1, len(cache))
+        self.assertEqual(1, cache.size)
+
+    def testStorable(self):
+        cache = MemoryCache()
+        self.assertTrue(cache.is_storable(make_entry('a', {'etag': '"1"'})))
+        self.assertTrue(cache.is_storable(
+            make_entry('a', {'last-modified': 'Fri, 31 Dec 1999 23:59:59 GMT'})))
+        self.assertFalse(cache.is_storable(make_entry('a')))
+        self.assertFalse(cache.is_storable(
+            make_entry('a', {'etag': '"1"'}, 404)))
+        self.assertTrue(MemoryCache(max_age=10).is_storable(make_entry('a')))
+
+
+class TestCredentialsKey(unittest.TestCase):
+
+    def testKey(self):
+        self.assertEqual('', credentials_key({'content-type': 'text/plain'}))
+        basic = credentials_key({'Authorization': 'Basic Zm9vOmJhcg=='})
+        self.assertEqual(
+            basic, credentials_key({'authorization': 'Basic Zm9vOmJhcg=='}))
+        self.assertNotEqual(
+            basic, credentials_key({'Authorization': 'Basic eHl6'}))
+        self.assertFalse('Zm9v' in basic)
+        oauth = credentials_key({'Authorization': 'oauth2',
+                                 'X-FluidDB-Access-Token': 'abc'})
+        self.assertNotEqual(oauth,
+                            credentials_key({'Authorization': 'oauth2',
+                                             'X-FluidDB-Access-Token': 'def'}))
+
+
+class TestFluidDBCache(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = FakeTransport()
+        self.cache = MemoryCache()
+        self.db = FluidDB('http://foo.com', self.transport, cache=self.cache)
+
+    def testRevalidate(self):
+        """Make sure cached responses are revalidated with their ETag
+        """
+        self.transport.add_resp(200, 'application/json', '{"name": "test"}',
+                                {'etag': '"1"'})
+        self.transport.add_resp(304, 'application/json', '', {'etag': '"1"'})
+        r = self.db('GET', ['users', 'test'])
+        self.assertEqual({u'name': u'test'}, r.value)
+        r = self.db('GET', ['users', 'test'])
+        self.assertEqual(200, r.status)
+        self.assertEqual({u'name': u'test'}, r.value)
+        self.assertEqual(2, len(self.transport.reqs))
+        self.assertFalse('If-None-Match' in self.transport.reqs[0][3])
+        self.assertEqual('"1"', self.transport.reqs[1][3]['If-None-Match'])
+
+    def testRevalidateCopies(self):
+        """Make sure revalidating replaces the cached entry, rather than
+        changing one other threads may be reading
+        """
+        self.transport.add_resp(200, 'application/json', '{"name": "test"}',
+                                {'etag': '"1"'})
+        self.transport.add_resp(304, 'application/json', '',
+                                {'etag': '"1"', 'date': 'now'})
+        self.db('GET', ['users', 'test'])
+        key = ('GET', 'http://foo.com/users/test', '')
+        old = self.cache.get(key)
+        stored = old.stored
+        self.db('GET', ['users', 'test'])
+        new = self.cache.get(key)
+        self.assertFalse(new is old)
+        self.assertEqual(stored, old.stored)
+        self.assertFalse('date' in old.headers)
+        self.assertEqual('now', new.headers['date'])
+        self.assertEqual(old.content, new.content)
+
+    def testModified(self):
+        self.transport.add_resp(200, 'application/json', '{"name": "test"}',
+                                {'etag': '"1"'})
+        self.transport.add_resp(200, 'application/json', '{"name": "new"}',
+                                {'etag': '"2"'})
+        self.db('GET', ['users', 'test'])
+        r = self.db('GET', ['users', 'test'])
+        self.assertEqual({u'name': u'new'}, r.value)
+        entry = self.cache.get(('GET', 'http://foo.com/users/test', ''))
+        self.assertEqual('"2"', entry.headers['etag'])
+
+    def testNoValidators(self):
+        """Make sure responses without validators are not cached
+        """
+        self.transport.add_resp(200, 'application/json', '{}')
+        self.db('GET', ['users', 'test'])
+        self.assertEqual(0, len(self.cache))
+
+    def testMaxAge(self):
+        """Make sure fresh entries are served without a request
+        """
+        self.db.cache = MemoryCache(max_age=60)
+        self.transport.add_resp(200, 'application/json', '{"name": "test"}')
+        self.db('GET', ['users', 'test'])
+        r = self.db('GET', ['users', 'test'])
+        self.assertEqual({u'name': u'test'}, r.value)
+        self.assertEqual(1, len(self.transport.reqs))
+
+    def testWriteInvalidates(self):
+        self.transport.add_resp(200, 'application/json',
+                                '{"description": "old"}', {'etag': '"1"'})
+        self.db('GET', ['tags', 'test', 'foo'],
+                urlargs={'returnDescription': True})
+        self.assertEqual(1, len(self.cache))
+        self.transport.add_resp(204, 'text/plain', '')
+        self.db('PUT', ['tags', 'test', 'foo'], {'description': 'new'})
+        self.assertEqual(0, len(self.cache))
+
+    def testValuesWriteClears(self):
+        self.transport.add_resp(200, 'application/json', '"foo"',
+                                {'etag': '"1"'})
+        self.db('GET', ['objects', 'id', 'test', 'foo'])
+        self.transport.add_resp(204, 'text/plain', '')
+        self.db('PUT', ['values'], {'queries': []})
+        self.assertEqual(0, len(self.cache))
+
+    def testCredentials(self):
+        """Make sure responses are only served to the user they were for,
+        and logging in keeps the cache
+        """
+        self.db.cache = MemoryCache(max_age=60)
+        self.transport.add_resp(200, 'application/json', '{"public": 1}')
+        self.transport.add_resp(200, 'application/json', '{"private": 1}')
+        self.db('GET', ['objects', 'id'])
+        self.db.login('alice', 'secret')
+        r = self.db('GET', ['objects', 'id'])
+        self.assertEqual({u'private': 1}, r.value)
+        self.db.logout()
+        r = self.db('GET', ['objects', 'id'])
+        self.assertEqual({u'public': 1}, r.value)
+        self.db.login('alice', 'secret')
+        r = self.db('GET', ['objects', 'id'])
+        self.assertEqual({u'private': 1}, r.value)
+        self.assertEqual(2, len(self.transport.reqs))
+        self.assertEqual(2, len(self.db.cache))
+
+
+class TestSqliteCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dirname, 'cache.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def testGetSet(self):
+        cache = SqliteCache(self.filename)
+        cache.set(('GET', 'http://foo.com/users/test', ''),
+                  make_entry(u'{"name": "\u03bb"}', {'etag': '"1"'}))
+        entry = cache.get(('GET', 'http://foo.com/users/test', ''))
+        self.assertEqual(200, entry.status_code)
+        self.assertEqual(u'{"name": "\u03bb"}', entry.content)
+        self.assertEqual({'etag': '"1"'}, entry.headers)
+        self.assertEqual(None,
+                         cache.get(('HEAD', 'http://foo.com/users/test', '')))
+
+    def testPersistent(self):
+        """Make sure entries survive between cache instances
+        """
+        SqliteCache(self.filename).set(('GET', 'a', ''), make_entry('foo'))
+        entry = SqliteCache(self.filename).get(('GET', 'a', ''))
+        self.assertEqual('foo', entry.content)
+
+    def testExpiry(self):
+        """Make sure expired entries without validators are dropped
+        """
+        cache = SqliteCache(self.filename, max_age=60)
+        old = time.time() - 120
+        cache.set(('GET', 'a', ''), CacheEntry(200, {}, 'foo', old))
+        cache.set(('GET', 'b', ''),
+                  CacheEntry(200, {'etag': '"1"'}, 'foo', old))
+        cache.set(('GET', 'c', ''), CacheEntry(200, {}, 'foo'))
+        self.assertEqual(None, cache.get(('GET', 'a', '')))
+        entry = cache.get(('GET', 'b', ''))
+        self.assertFalse(cache.is_fresh(entry))
+        self.assertTrue(cache.is_fresh(cache.get(('GET', 'c', ''))))
+        self.assertEqual(2, len(cache))
+
+    def testEviction(self):
+        cache = SqliteCache(self.filename, max_bytes=30)
+        cache.set(('GET', 'a', ''), make_entry('x' * 10))
+        cache.set(('GET', 'b', ''), make_entry('x' * 10))
+        cache.set(('GET', 'c', ''), make_entry('x' * 10))
+        cache.get(('GET', 'a', ''))
+        cache.set(('GET', 'd', ''), make_entry('x' * 10))
+        self.assertEqual(30, cache.size)
+        self.assertEqual(None, cache.get(('GET', 'b', '')))
+        self.assertNotEqual(None, cache.get(('GET', 'a', '')))
+
+    def testSize(self):
+        """Make sure the total size is kept up to date as entries change
+        """
+        cache = SqliteCache(self.filename, max_age=60)
+        cache.set(('GET', 'http://foo.com/a', ''), make_entry('x' * 10))
+        cache.set(('GET', 'http://foo.com/b', ''), make_entry('x' * 20))
+        self.assertEqual(30, cache.size)
+        cache.set(('GET', 'http://foo.com/a', ''), make_entry('x' * 5))
+        self.assertEqual(25, cache.size)
+        self.assertEqual(25, SqliteCache(self.filename).size)
+        cache.invalidate('http://foo.com/b')
+        self.assertEqual(5, cache.size)
+        cache.set(('GET', 'http://foo.com/c', ''),
+                  CacheEntry(200, {}, 'x' * 10, time.time() - 120))
+        self.assertEqual(None, cache.get(('GET', 'http://foo.com/c', '')))
+        self.assertEqual(5, cache.size)
+        cache.clear()
+        self.assertEqual(0, cache.size)
+
+    def testInvalidate(self):
+        cache = SqliteCache(self.filename)
+        cache.set(('GET', 'http://foo.com/tags/test/foo', ''), make_entry('a'))
+        cache.set(('GET',
+                   'http://foo.com/tags/test/foo?returnDescription=1', ''),
+                  make_entry('b'))
+        cache.set(('GET', 'http://foo.com/tags/test/bar', ''), make_entry('c'))
+        cache.invalidate('http://foo.com/tags/test/foo')
+        self.assertEqual(1, len(cache))
+        cache.clear()
+        self.assertEqual(0, len(cache))
+
+    def testThreads(self):
+        """Make sure the cache can be used from many threads at once
+        """
+        cache = SqliteCache(self.filename)
+        errors = []
+        def worker(n):
+            try:
+                for i in range(20):
+                    cache.set(('GET', '%s-%s' % (n, i), ''), make_entry('foo'))
+                    cache.get(('GET', '%s-%s' % (n, i), ''))
+            except Exception, e:
+                errors.append(e)
+        threads = [threading.Thread(target=worker, args=(n,))
+                   for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual([], errors)
+        self.assertEqual(80, len(cache))
+
+    def testFluidDB(self):
+        """Make sure a warm cache is used by a new FluidDB
+        """
+        transport = FakeTransport()
+        transport.add_resp(200, 'application/json', '{"ids": ["1"]}')
+        db = FluidDB('http://foo.com', transport,
+                     cache=SqliteCache(self.filename))
+        db('GET', ['objects'], urlargs={'query': 'has test/foo'})
+        db = FluidDB('http://foo.com', transport,
+                     cache=SqliteCache(self.filename))
+        r = db('GET', ['objects'], urlargs={'query': 'has test/foo'})
+        self.assertEqual({u'ids': [u'1']}, r.value)
+        self.assertEqual(1, len(transport.reqs))
+
+    def testCredentials(self):
+        """Make sure a user's responses aren't served to anyone else
+        sharing the file, and logging in starts warm
+        """
+        transport = FakeTransport()
+        transport.add_resp(200, 'application/json', '{"private": 1}')
+        transport.add_resp(200, 'application/json', '{"public": 1}')
+        alice = FluidDB('http://foo.com', transport,
+                        cache=SqliteCache(self.filename))
+        alice.login('alice', 'secret')
+        alice('GET', ['objects', 'id'])
+        anonymous = FluidDB('http://foo.com', transport,
+                            cache=SqliteCache(self.filename))
+        r = anonymous('GET', ['objects', 'id'])
+        self.assertEqual({u'public': 1}, r.value)
+        self.assertEqual(2, len(transport.reqs))
+        alice = FluidDB('http://foo.com', transport,
+                        cache=SqliteCache(self.filename))
+        alice.login('alice', 'secret')
+        r = alice('GET', ['objects', 'id'])
+        self.assertEqual({u'private': 1}, r.value)
+        self.assertEqual(2, len(transport.reqs))
+        self.assertEqual(2, len(alice.cache))
+
+
+if __name__ == '__main__':
+    unittest.main()
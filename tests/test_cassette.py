@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from fom.api import FluidApi
+from fom.cassette import (CassetteError, RecordingTransport, ReplayTransport,
+    load_cassette)
+from fom.db import FluidDB
+from fom.errors import FluidConnectionError, Fluid404Error
+from fom.mapping import Object, tag_value
+from fom.session import Fluid
+
+from _base import FakeTransport
+
+
+class Book(Object):
+
+    title = tag_value('test/title')
+
+
+class SleeplessReplayTransport(ReplayTransport):
+
+    def sleep(self, delay):
+        self.slept.append(delay)
+
+
+class TestCassette(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.fake = FakeTransport()
+        self.recorder = RecordingTransport(self.fake)
+        self.db = FluidDB('http://foo.com', self.recorder)
+        self.db.login('test', 'secret')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def record(self, name='test.cassette'):
+        self.fake.add_resp(200, 'application/json', '{"id": "1234"}')
+        self.fake.add_resp(404, 'text/plain', 'Not Found',
+                           {'x-fluiddb-error-class': 'TNonexistentTag'})
+        self.fake.add_resp(200, 'application/vnd.fluiddb.value+png',
+                           '\x89PNG\xff')
+        self.db('GET', ['objects', '1234'])
+        self.assertRaises(Fluid404Error, self.db, 'GET',
+                          ['about', 'book', 'test', 'title'])
+        self.db('PUT', ['about', 'book', 'test', 'cover'], '\x89PNG\xff',
+                content_type='image/png')
+        filename = os.path.join(self.tmpdir, name)
+        self.recorder.save(filename)
+        return filename
+
+    def replay(self, filename, **kw):
+        replay = SleeplessReplayTransport(filename, **kw)
+        replay.slept = []
+        return replay
+
+    def testRecord(self):
+        load_cassette(self.record())
+        interaction = self.recorder.interactions[2]
+        self.assertEqual('PUT', interaction['method'])
+        self.assertEqual('http://foo.com/about/book/test/cover',
+                         interaction['url'])
+        self.assertTrue(interaction['body_base64'])
+        self.assertEqual('image/png',
+                         interaction['request_headers']['content-type'])
+        self.assertFalse('Authorization' in interaction['request_headers'])
+
+    def testReplayInOrder(self):
+        replay = self.replay(self.record('test.cassette.gz'))
+        db = FluidDB('http://foo.com', replay)
+        self.assertEqual('1234', db('GET', ['objects', '1234']).value['id'])
+        try:
+            db('GET', ['about', 'book', 'test', 'title'])
+        except Fluid404Error, e:
+            self.assertEqual('TNonexistentTag', e.fluid_error)
+        else:
+            self.fail('Expected a 404')
+        self.assertEqual('\x89PNG\xff',
+                         db('GET', ['objects', '5678']).value)
+        self.assertEqual(0, len(replay))
+        self.assertRaises(CassetteError, db, 'GET', ['objects', '1234'])
+        replay.rewind()
+        self.assertEqual(3, len(replay))
+
+    def testReplayByRequest(self):
+        replay = self.replay(self.record(), match='request')
+        db = FluidDB('http://foo.com', replay)
+        response = db('PUT', ['about', 'book', 'test', 'cover'],
+                      '\x89PNG\xff', content_type='image/png')
+        self.assertEqual(200, response.status)
+        self.assertEqual('1234', db('GET', ['objects', '1234']).value['id'])
+        self.assertRaises(CassetteError, db, 'PUT',
+                          ['about', 'book', 'test', 'cover'], 'GIF89a',
+                          content_type='image/gif')
+
+    def testLatency(self):
+        filename = self.record()
+        replay = self.replay(filename, latency=0.25)
+        FluidDB('http://foo.com', replay)('GET', ['objects', '1234'])
+        self.assertEqual([0.25], replay.slept)
+        replay = self.replay(filename, latency='recorded')
+        FluidDB('http://foo.com', replay)('GET', ['objects', '1234'])
+        self.assertEqual([self.recorder.interactions[0]['elapsed']],
+                         replay.slept)
+
+    def testConnectionError(self):
+        self.fake.add_error(FluidConnectionError(IOError('refused')))
+        self.assertRaises(FluidConnectionError, self.db, 'GET',
+                          ['users', 'test'])
+        replay = self.replay(self.recorder.interactions)
+        db = FluidDB('http://foo.com', replay)
+        self.assertRaises(FluidConnectionError, db, 'GET', ['users', 'test'])
+
+    def testMapping(self):
+        """Make sure the mapping layer runs against a replayed cassette
+        """
+        self.fake.add_resp(200, 'application/vnd.fluiddb.value+json',
+                           '"Fom"')
+        Fluid.bound = FluidApi(self.db)
+        self.assertEqual(u'Fom', Book('1234').title)
+        Fluid.bound = FluidApi(FluidDB('http://foo.com',
+            self.replay(self.recorder.interactions)))
+        self.assertEqual(u'Fom', Book('1234').title)
+
+    def testStream(self):
+        self.fake.add_resp(200, 'text/plain', 'abc' * 30000)
+        self.db.stream('GET', ['objects', '1234', 'test', 'file']).close()
+        db = FluidDB('http://foo.com', self.replay(self.recorder.interactions))
+        response = db.stream('GET', ['objects', '1234', 'test', 'file'])
+        self.assertEqual('abc' * 30000, ''.join(response))
+
+    def testCloseSaves(self):
+        filename = os.path.join(self.tmpdir, 'test.cassette')
+        recorder = RecordingTransport(self.fake, filename)
+        FluidDB('http://foo.com', recorder)('GET', ['users', 'test'])
+        recorder.close()
+        self.assertEqual(1, len(load_cassette(filename)))
+
+
+if __name__ == '__main__':
+    unittest.main()
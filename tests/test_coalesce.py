@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+import unittest
+
+from fom.db import FluidDB
+from fom.coalesce import RequestCoalescer
+from fom.errors import Fluid404Error, FluidTimeoutError
+
+from _base import FakeTransport
+
+
+class BlockingTransport(FakeTransport):
+    """A transport which holds requests until released.
+    """
+
+    def __init__(self):
+        FakeTransport.__init__(self)
+        self.release = threading.Event()
+
+    def request(self, *args, **kw):
+        self.release.wait()
+        return FakeTransport.request(self, *args, **kw)
+
+
+def run_threads(count, target):
+    results = []
+    def worker():
+        try:
+            results.append(target())
+        except Exception, e:
+            results.append(e)
+    threads = [threading.Thread(target=worker) for i in range(count)]
+    for t in threads:
+        t.start()
+    return threads, results
+
+
+class TestRequestCoalescer(unittest.TestCase):
+
+    def testSingleCaller(self):
+        coalescer = RequestCoalescer()
+        self.assertEqual(3, coalescer.do('key', lambda x: x + 1, 2))
+        self.assertEqual(0, len(coalescer))
+
+    def testError(self):
+        coalescer = RequestCoalescer()
+        def fail():
+            raise ValueError('oops')
+        self.assertRaises(ValueError, coalescer.do, 'key', fail)
+        self.assertEqual(0, len(coalescer))
+
+    def testWaitTimeout(self):
+        """Make sure a follower gives up waiting once its time is up
+        """
+        coalescer = RequestCoalescer()
+        release = threading.Event()
+        threads, results = run_threads(
+            1, lambda: coalescer.do('key', release.wait))
+        while not len(coalescer):
+            time.sleep(0.001)
+        self.assertRaises(FluidTimeoutError, coalescer.do, 'key', len, '',
+                          timeout=0.01)
+        release.set()
+        threads[0].join()
+
+
+class TestFluidDBCoalesce(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = BlockingTransport()
+        self.db = FluidDB('http://foo.com', self.transport, coalesce=True)
+
+    def wait_for_followers(self, count):
+        """Wait until `count` callers are waiting for the call in flight,
+        so none of them can arrive after it has finished.
+        """
+        calls = self.db.coalescer._calls
+        while not calls or calls.values()[0].followers < count:
+            time.sleep(0.001)
+
+    def testCoalesce(self):
+        """Make sure identical concurrent GETs share one request
+        """
+        self.transport.add_resp(200, 'application/json', '{"name": "test"}')
+        threads, results = run_threads(
+            10, lambda: self.db('GET', ['users', 'test']))
+        self.wait_for_followers(9)
+        self.transport.release.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(1, len(self.transport.reqs))
+        self.assertEqual(10, len(results))
+        for r in results:
+            self.assertEqual({u'name': u'test'}, r.value)
+
+    def testCoalesceError(self):
+        """Make sure every waiting caller gets the error
+        """
+        self.transport.add_resp(404, 'text/plain', 'Not Found')
+        threads, results = run_threads(
+            5, lambda: self.db('GET', ['users', 'test']))
+        self.wait_for_followers(4)
+        self.transport.release.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(1, len(self.transport.reqs))
+        for r in results:
+            self.assertTrue(isinstance(r, Fluid404Error))
+
+    def testDeadlines(self):
+        """Make sure callers with deadlines of their own share a request
+        """
+        threads, results = run_threads(
+            3, lambda: self.db('GET', ['users', 'test'], timeout=5))
+        self.wait_for_followers(2)
+        self.transport.release.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(1, len(self.transport.reqs))
+        self.assertEqual(['empty'] * 3, [r.value for r in results])
+
+    def testFollowerDeadline(self):
+        """Make sure a follower gives up at its own deadline, leaving the
+        request in flight
+        """
+        threads, results = run_threads(
+            1, lambda: self.db('GET', ['users', 'test']))
+        while not len(self.db.coalescer):
+            time.sleep(0.001)
+        self.assertRaises(FluidTimeoutError, self.db, 'GET',
+                          ['users', 'test'], timeout=0.01)
+        self.transport.release.set()
+        threads[0].join()
+        self.assertEqual(1, len(self.transport.reqs))
+        self.assertEqual('empty', results[0].value)
+
+    def testNoCoalesceWrites(self):
+        self.transport.release.set()
+        self.db('PUT', ['tags', 'test', 'foo'], {'description': 'foo'})
+        self.db('PUT', ['tags', 'test', 'foo'], {'description': 'foo'})
+        self.assertEqual(2, len(self.transport.reqs))
+
+    def testNotByDefault(self):
+        self.assertEqual(None, FluidDB('http://foo.com').coalescer)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+import json
+import unittest
+
+from fom.db import FluidDB, _get_body_and_type
+from fom import codec
+from fom.codec import JsonCodec, get_codec, register_codec
+
+from _base import FakeTransport
+
+
+class TestCodecs(unittest.TestCase):
+
+    def testDefault(self):
+        self.assertTrue(get_codec() is codec.default_codec)
+        self.assertTrue(get_codec().name in codec.codecs)
+        self.assertTrue(get_codec('json') is codec.codecs['json'])
+
+    def testUnknown(self):
+        self.assertRaises(ValueError, get_codec, 'nosuchjson')
+
+    def testVectors(self):
+        """Make sure every available codec handles the payloads fom sends
+        """
+        values = [1, 1.2, 'string', u'string', u'λ', ['foo', 'bar'],
+                  (u'foo', u'bar'), True, False, None,
+                  {'queries': [['has test/foo', {'test/foo': {'value': 1}}]]}]
+        for c in codec.codecs.values():
+            for val in values:
+                content, content_type = _get_body_and_type(val, None, c)
+                self.assertTrue(isinstance(content, basestring))
+                if isinstance(val, tuple):
+                    val = list(val)
+                self.assertEqual(val, c.loads(content))
+                self.assertEqual(val, json.loads(content))
+            self.assertRaises(ValueError, c.loads, '[bad')
+
+    def testRegister(self):
+        test_codec = JsonCodec('test', json.dumps, json.loads)
+        register_codec(test_codec)
+        try:
+            self.assertTrue(get_codec('test') is test_codec)
+            self.assertFalse(get_codec() is test_codec)
+        finally:
+            del codec.codecs['test']
+            codec._preference.remove('test')
+
+    def testFluidDBCodec(self):
+        """Make sure a FluidDB uses its own codec both ways
+        """
+        calls = []
+        def loads(value):
+            calls.append(value)
+            return json.loads(value)
+        transport = FakeTransport()
+        transport.add_resp(200, 'application/json', '{"id": "1"}')
+        db = FluidDB('http://foo.com', transport,
+                     codec=JsonCodec('test', json.dumps, loads))
+        r = db('POST', ['objects'], {'about': 'foo'})
+        self.assertEqual({u'id': u'1'}, r.value)
+        self.assertEqual(['{"id": "1"}'], calls)
+        self.assertEqual({'about': 'foo'}, json.loads(transport.reqs[0][2]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,13 @@
 # -*- coding: utf-8 -*-
+import gzip
 import unittest
 import uuid
-from fom.db import (FluidDB, _get_body_and_type, _generate_endpoint_url,
-    NO_CONTENT)
+from StringIO import StringIO
+from fom import db
+from fom.db import (FluidDB, FluidResponse, _get_body_and_type,
+    _generate_endpoint_url, NO_CONTENT, _NOT_PARSED, PRIMITIVE_CONTENT_TYPE)
+
+from _base import FakeTransport, FakeHttpLibResponse
 
 TEST_INSTANCE = 'https://sandbox.fluidinfo.com'
 TEST_USER = 'test'
@@ -168,6 +173,29 @@ class TestDBModule(unittest.TestCase):
         actual = _generate_endpoint_url("http://foo.com", ["path"], args)
         self.assertEqual(expected, actual)
 
+    def testGenerateEndpointUrlMemoized(self):
+        """
+        Make sure memoized url components don't confuse values which compare
+        equal but are encoded differently
+        """
+        base = 'http://foo.com'
+        self.assertEqual('http://foo.com/objects/1?showAbout=True',
+            _generate_endpoint_url(base, ['objects', '1'], {'showAbout': True}))
+        self.assertEqual('http://foo.com/objects/1?showAbout=1',
+            _generate_endpoint_url(base, ['objects', '1'], {'showAbout': 1}))
+        self.assertEqual('http://foo.com/objects/1?showAbout=True',
+            _generate_endpoint_url(base, ['objects', '1'], {'showAbout': True}))
+        # unhashable values
+        self.assertEqual('http://foo.com/objects?tag=%5B%27a%27%5D',
+            _generate_endpoint_url(base, ['objects'], (('tag', ['a']),)))
+        # the memo is bounded
+        for i in range(db.URL_CACHE_SIZE + 10):
+            _generate_endpoint_url(base, [str(i)], {'query': str(i)})
+        self.assertTrue(len(db._quoted_segments) <= db.URL_CACHE_SIZE)
+        self.assertTrue(len(db._encoded_urlargs) <= db.URL_CACHE_SIZE)
+        self.assertEqual('http://foo.com/users/%CE%BB%CE%BB',
+            _generate_endpoint_url(base, ['users', u'\u03bb\u03bb'], None))
+
     def testLoginLogout(self):
         """
         Make sure login and logout functions set things up correctly
@@ -203,6 +231,79 @@ class TestDBModule(unittest.TestCase):
         self.assertFalse('Authorization' in db.headers)
         self.assertFalse('X-FluidDB-Access-Token' in db.headers)
 
+    def testCompressRequestBody(self):
+        """
+        Make sure large request bodies are gzipped when compression is
+        enabled
+        """
+        transport = FakeTransport()
+        db = FluidDB('http://foo.com', transport, compress=True,
+                     compress_threshold=100)
+        payload = {'queries': [['has test/foo', {'test/foo': 'x' * 500}]]}
+        db('PUT', ['values'], payload)
+        method, url, data, headers = transport.reqs[0]
+        self.assertEqual('gzip', headers['content-encoding'])
+        self.assertTrue(len(data) < 100)
+        body = gzip.GzipFile(fileobj=StringIO(data)).read()
+        self.assertEqual(_get_body_and_type(payload, None)[0], body)
+
+    def testCompressThreshold(self):
+        """
+        Make sure small request bodies are never compressed
+        """
+        transport = FakeTransport()
+        db = FluidDB('http://foo.com', transport, compress=True,
+                     compress_threshold=100)
+        db('PUT', ['objects', 'id', 'test', 'foo'], 'small')
+        method, url, data, headers = transport.reqs[0]
+        self.assertFalse('content-encoding' in headers)
+        self.assertEqual('"small"', data)
+
+    def testNoCompressByDefault(self):
+        transport = FakeTransport()
+        db = FluidDB('http://foo.com', transport)
+        db('PUT', ['objects', 'id', 'test', 'foo'], 'x' * 5000)
+        method, url, data, headers = transport.reqs[0]
+        self.assertFalse('content-encoding' in headers)
+        self.assertEqual('gzip', headers['Accept-Encoding'])
+
+    def testLazyValue(self):
+        """
+        Make sure the body of a response is only deserialized when its value
+        is first used, and only once
+        """
+        hresp = FakeHttpLibResponse(200, 'application/json', '{"foo": [1]}')
+        r = FluidResponse(hresp, hresp.content, False)
+        self.assertTrue(r._value is _NOT_PARSED)
+        self.assertEqual(200, r.status)
+        self.assertEqual({u'foo': [1]}, r.value)
+        self.assertTrue(r.value is r.value)
+        # not deserialized
+        hresp = FakeHttpLibResponse(200, 'text/plain', '{"foo": [1]}')
+        r = FluidResponse(hresp, hresp.content, True)
+        self.assertEqual('{"foo": [1]}', r.value)
+        hresp = FakeHttpLibResponse(200, PRIMITIVE_CONTENT_TYPE, '[bad')
+        r = FluidResponse(hresp, hresp.content, True)
+        self.assertEqual('[bad', r.value)
+
+    def testBytesContent(self):
+        """
+        Make sure response bodies are passed through as bytes, without being
+        decoded or copied
+        """
+        transport = FakeTransport()
+        body = '\x89PNG\r\n\x1a\n\x00'
+        transport.add_resp(200, 'image/png', body)
+        transport.add_resp(200, 'application/json',
+                           u'{"name": "\u03bb"}'.encode('utf-8'))
+        db = FluidDB('http://foo.com', transport)
+        r = db('GET', ['objects', 'id', 'test', 'image'], is_value=True)
+        self.assertTrue(r.content is body)
+        self.assertTrue(r.value is body)
+        r = db('GET', ['users', 'test'])
+        self.assertEqual({u'name': u'\u03bb'}, r.value)
+        self.assertFalse(hasattr(r, '__dict__'))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+import socket
+import threading
+import time
+import unittest
+
+from fom.api import FluidApi
+from fom.db import FluidDB
+from fom.deadline import Deadline, deadline, current_deadline
+from fom.errors import FluidConnectionError, FluidTimeoutError, Fluid503Error
+from fom.mapping import Object, tag_value
+from fom.retry import RetryPolicy
+from fom.session import Fluid
+from fom.transport import PooledTransport, min_timeout
+
+from _base import FakeTransport
+
+
+class SlowTransport(FakeTransport):
+    """A transport where each request takes some time.
+    """
+
+    def __init__(self, delay):
+        FakeTransport.__init__(self)
+        self.delay = delay
+
+    def request(self, *args, **kw):
+        time.sleep(self.delay)
+        return FakeTransport.request(self, *args, **kw)
+
+
+class TestDeadline(unittest.TestCase):
+
+    def testRemaining(self):
+        d = Deadline(10)
+        self.assertTrue(9 < d.remaining() <= 10)
+        self.assertFalse(d.expired)
+        d.check()
+        self.assertEqual(0, Deadline(-1).remaining())
+        self.assertRaises(FluidTimeoutError, Deadline(-1).check)
+
+    def testNested(self):
+        """Make sure a nested deadline can't outlast the outer one
+        """
+        self.assertEqual(None, current_deadline())
+        with deadline(1) as outer:
+            with deadline(10) as inner:
+                self.assertTrue(inner is outer)
+            with deadline(0.5) as inner:
+                self.assertTrue(inner is not outer)
+                self.assertTrue(current_deadline() is inner)
+            with deadline(None) as inner:
+                self.assertTrue(inner is outer)
+            self.assertTrue(current_deadline() is outer)
+        self.assertEqual(None, current_deadline())
+
+    def testPerThread(self):
+        seen = []
+        def run():
+            seen.append(current_deadline())
+        with deadline(1):
+            t = threading.Thread(target=run)
+            t.start()
+            t.join()
+        self.assertEqual([None], seen)
+
+    def testMinTimeout(self):
+        self.assertEqual(None, min_timeout(None, None))
+        self.assertEqual(2, min_timeout(None, 2, 3))
+
+
+class TestFluidDBDeadline(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = FakeTransport()
+        self.db = FluidDB('http://foo.com', self.transport)
+
+    def testNoTimeout(self):
+        self.db('GET', ['users', 'test'])
+        self.assertEqual([None], self.transport.timeouts)
+
+    def testTimeout(self):
+        """Make sure the time left is given to the transport
+        """
+        self.db('GET', ['users', 'test'], timeout=5)
+        self.assertTrue(4 < self.transport.timeouts[0] <= 5)
+
+    def testExpired(self):
+        """Make sure no request is sent once the deadline has passed
+        """
+        with deadline(0):
+            self.assertRaises(FluidTimeoutError, self.db, 'GET',
+                              ['users', 'test'])
+        self.assertEqual([], self.transport.reqs)
+
+    def testConnectionTimeout(self):
+        """Make sure a transport failure after the deadline is a timeout
+        """
+        self.transport = SlowTransport(0.02)
+        self.db.transport = self.transport
+        self.transport.add_error(FluidConnectionError(socket.timeout()))
+        self.assertRaises(FluidTimeoutError, self.db, 'GET',
+                          ['users', 'test'], timeout=0.01)
+
+    def testNoTimeForRetry(self):
+        """Make sure a retry isn't waited for past the deadline
+        """
+        self.db.retry = RetryPolicy(backoff=10, jitter=False)
+        self.transport.add_resp(503, 'text/plain', '')
+        start = time.time()
+        self.assertRaises(Fluid503Error, self.db, 'GET', ['users', 'test'],
+                          timeout=1)
+        self.assertTrue(time.time() - start < 1)
+        self.assertEqual(1, len(self.transport.reqs))
+
+
+class Book(Object):
+
+    title = tag_value('test/title')
+
+
+class TestMappingDeadline(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = SlowTransport(0.03)
+        self.db = FluidDB('http://foo.com', self.transport)
+        # Not set until something has been bound
+        self.bound = getattr(Fluid, 'bound', None)
+        Fluid.bound = FluidApi(self.db)
+
+    def tearDown(self):
+        if self.bound is None:
+            del Fluid.bound
+        else:
+            Fluid.bound = self.bound
+
+    def testSave(self):
+        book = Book('1234')
+        book._cache['fluiddb/about'] = 'book'
+        book.title = u'Fom'
+        book.save(timeout=5)
+        self.assertEqual('PUT', self.transport.reqs[0][0])
+        self.assertTrue(4 < self.transport.timeouts[0] <= 5)
+
+    def testSaveAboutTimeout(self):
+        """Make sure getting the about value to save is within the timeout
+        """
+        book = Book('1234')
+        book.title = u'Fom'
+        self.assertRaises(FluidTimeoutError, book.save, timeout=0)
+        self.assertEqual([], self.transport.reqs)
+
+    def testSaveTimeout(self):
+        book = Book('1234')
+        book._cache['fluiddb/about'] = 'book'
+        book.title = u'Fom'
+        self.assertRaises(FluidTimeoutError, book.save, timeout=0)
+        self.assertEqual([], self.transport.reqs)
+
+    def testFilter(self):
+        """Make sure requests share the budget of the operation
+        """
+        self.transport.delay = 0.06
+        self.transport.add_resp(200, 'application/json', '{"ids": []}')
+        self.transport.add_resp(200, 'application/json', '{"ids": []}')
+        with deadline(0.05):
+            Object.filter('has test/title')
+            self.assertRaises(FluidTimeoutError, Object.filter,
+                              'has test/title', timeout=5)
+        self.assertEqual(1, len(self.transport.reqs))
+
+
+class _SilentServer(threading.Thread):
+    """Accepts connections and never answers.
+    """
+
+    def __init__(self):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(5)
+        self.port = self.sock.getsockname()[1]
+        self.conns = []
+
+    def run(self):
+        while True:
+            try:
+                self.conns.append(self.sock.accept()[0])
+            except socket.error:
+                return
+
+    def close(self):
+        self.sock.close()
+        for conn in self.conns:
+            conn.close()
+
+
+class TestPooledTransportTimeouts(unittest.TestCase):
+
+    def setUp(self):
+        self.server = _SilentServer()
+        self.server.start()
+        self.url = 'http://127.0.0.1:%s/users/test' % self.server.port
+
+    def tearDown(self):
+        self.server.close()
+
+    def testReadTimeout(self):
+        transport = PooledTransport(connect_timeout=5, read_timeout=0.1)
+        start = time.time()
+        self.assertRaises(FluidConnectionError, transport.request,
+                          'GET', self.url)
+        self.assertTrue(time.time() - start < 2)
+
+    def testRequestTimeout(self):
+        """Make sure a per request timeout shortens the read timeout
+        """
+        transport = PooledTransport(read_timeout=30)
+        start = time.time()
+        self.assertRaises(FluidConnectionError, transport.request,
+                          'GET', self.url, timeout=0.1)
+        self.assertTrue(time.time() - start < 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,6 +4,9 @@ import unittest
 from fom.api import FluidApi
 
 from fom.errors import (
+    FluidClientError,
+    FluidServerError,
+    FluidConnectionError,
     Fluid400Error,
     Fluid401Error,
     Fluid404Error,
@@ -11,6 +14,9 @@ from fom.errors import (
     Fluid412Error,
     Fluid413Error,
     Fluid500Error,
+    Fluid502Error,
+    Fluid503Error,
+    Fluid504Error,
 )
 
 from _base import FakeFluidDB
@@ -57,6 +63,53 @@ class ErrorTest(unittest.TestCase):
         self.assertRaises(Fluid500Error,
                           self.api.namespaces['test'].delete)
 
+    def test502(self):
+        self.db.add_resp(502, 'text/plain', 'Bad Gateway')
+        self.assertRaises(Fluid502Error,
+                          self.api.namespaces['test'].delete)
+
+    def test503(self):
+        self.db.add_resp(503, 'text/plain', 'Service Unavailable')
+        self.assertRaises(Fluid503Error,
+                          self.api.namespaces['test'].delete)
+
+    def test504(self):
+        self.db.add_resp(504, 'text/plain', 'Gateway Timeout')
+        self.assertRaises(Fluid504Error,
+                          self.api.namespaces['test'].delete)
+
+    def testUnknownStatus(self):
+        """
+        Ensures statuses without their own error class fall back on the
+        client or server error.
+        """
+        self.db.add_resp(418, 'text/plain', "I'm a teapot")
+        self.assertRaises(FluidClientError,
+                          self.api.namespaces['test'].delete)
+        self.db.add_resp(599, 'text/plain', 'Network Timeout')
+        self.assertRaises(FluidServerError,
+                          self.api.namespaces['test'].delete)
+
+    def testRetryable(self):
+        """
+        Ensures only server and connection errors are marked as retryable.
+        """
+        self.assertFalse(Fluid400Error.retryable)
+        self.assertFalse(Fluid404Error.retryable)
+        self.assertTrue(Fluid500Error.retryable)
+        self.assertTrue(Fluid503Error.retryable)
+        self.assertTrue(FluidConnectionError.retryable)
+
+    def testConnectionError(self):
+        """
+        Ensures the connection error keeps hold of the original exception.
+        """
+        original = IOError('Connection refused')
+        err = FluidConnectionError(original)
+        self.assertEqual(None, err.status)
+        self.assertEqual(None, err.response)
+        self.assertEqual(original, err.exception)
+
     def testErrorObject(self):
         """
         Ensures that the exception object has the correct attributes.
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+import unittest
+
+from fom.api import FluidApi
+from fom.db import FluidDB
+from fom.deadline import deadline
+from fom.errors import FluidTimeoutError, Fluid404Error
+from fom.executor import Executor, Future
+
+from _base import FakeHttpLibResponse, FakeTransport
+
+
+class EchoTransport(FakeTransport):
+    """A transport answering each request with its url, after a delay taken
+    from the url, and keeping track of how many requests are in flight.
+    """
+
+    def __init__(self):
+        FakeTransport.__init__(self)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.most_in_flight = 0
+
+    def request(self, method, url, data=None, headers=None, stream=False,
+                timeout=None):
+        with self.lock:
+            self.in_flight += 1
+            self.most_in_flight = max(self.most_in_flight, self.in_flight)
+        try:
+            name = url.rsplit('/', 1)[1]
+            time.sleep(float(name) / 1000)
+            if name == '0':
+                return FakeHttpLibResponse(404, 'text/plain', 'Not Found')
+            return FakeHttpLibResponse(200, 'text/plain', name)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+class TestExecutor(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = EchoTransport()
+        self.executor = Executor(max_workers=3)
+        self.db = FluidDB('http://foo.com', self.transport,
+                          executor=self.executor)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def testSubmit(self):
+        future = self.db.submit('GET', ['users', '10'])
+        self.assertEqual('10', future.result().value)
+        self.assertTrue(future.done())
+        self.assertEqual(None, future.exception())
+
+    def testMapOrder(self):
+        delays = ['30', '1', '20', '5', '10', '2']
+        responses = self.db.map([('GET', ['users', d]) for d in delays])
+        self.assertEqual(delays, [r.value for r in responses])
+        self.assertEqual(3, self.transport.most_in_flight)
+
+    def testMapErrors(self):
+        requests = [('GET', ['users', d]) for d in ('5', '0', '1')]
+        first, error, last = self.db.map(requests, return_errors=True)
+        self.assertEqual('5', first.value)
+        self.assertTrue(isinstance(error, Fluid404Error))
+        self.assertEqual('1', last.value)
+        responses = self.db.map(requests)
+        self.assertEqual('5', responses.next().value)
+        self.assertRaises(Fluid404Error, responses.next)
+
+    def testApi(self):
+        """Make sure the api objects can be used in the pool as they are
+        """
+        api = FluidApi(self.db)
+        future = self.executor.submit(api.users['5'].get)
+        self.assertEqual('5', future.result().value)
+
+    def testDeadline(self):
+        """Make sure a deadline in the submitting thread applies to the call
+        """
+        # Hold every worker, so the call waits until its deadline has
+        # passed whatever the scheduling.
+        release = threading.Event()
+        for i in range(3):
+            self.executor.submit(release.wait)
+        try:
+            with deadline(0.01) as active:
+                future = self.db.submit('GET', ['users', '1'])
+            while not active.expired:
+                time.sleep(0.001)
+        finally:
+            release.set()
+        self.assertTrue(isinstance(future.exception(), FluidTimeoutError))
+        self.assertEqual(0, self.transport.most_in_flight)
+
+    def testResultTimeout(self):
+        future = self.db.submit('GET', ['users', '50'])
+        self.assertRaises(FluidTimeoutError, future.result, 0.001)
+        self.assertEqual('50', future.result().value)
+
+    def testCallbacks(self):
+        done = []
+        future = self.executor.submit(lambda: 42)
+        future.add_done_callback(done.append)
+        future.result()
+        future.add_done_callback(done.append)
+        self.assertEqual([future, future], done)
+
+    def testCallbackError(self):
+        """Make sure a failing callback doesn't take its worker down
+        """
+        executor = Executor(max_workers=1)
+        release = threading.Event()
+        future = executor.submit(release.wait)
+        future.add_done_callback(lambda f: 1 / 0)
+        release.set()
+        self.assertEqual(42, executor.submit(lambda: 42).result(1))
+        future.add_done_callback(lambda f: 1 / 0)
+        executor.shutdown()
+
+    def testShutdown(self):
+        futures = [self.db.submit('GET', ['users', '5']) for i in range(6)]
+        self.executor.shutdown()
+        self.assertTrue(all(f.done() for f in futures))
+        self.assertRaises(RuntimeError, self.executor.submit, len, '')
+
+    def testDefaultExecutor(self):
+        db = FluidDB('http://foo.com', FakeTransport())
+        self.assertTrue(db.executor is db.executor)
+        self.assertEqual('empty', db.submit('GET', ['users']).result().value)
+        db.executor.shutdown()
+
+    def testFutureRepr(self):
+        self.assertEqual('<Future (pending)>', repr(Future()))
+
+
+if __name__ == '__main__':
+    unittest.main()
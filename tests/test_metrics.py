@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+import json
+import unittest
+
+from fom.db import FluidDB
+from fom.errors import FluidConnectionError, Fluid404Error
+from fom.metrics import Histogram, MetricsCollector
+from fom.retry import RetryPolicy
+
+from _base import FakeTransport
+
+
+class TestHistogram(unittest.TestCase):
+
+    def testPercentiles(self):
+        h = Histogram((1, 2, 3, 4))
+        for value in (0.5, 1.5, 2.5, 3.5):
+            h.add(value)
+        self.assertEqual(4, h.count)
+        self.assertEqual(8, h.sum)
+        self.assertEqual(3.5, h.max)
+        self.assertEqual([1, 1, 1, 1, 0], h.counts)
+        self.assertEqual(2, h.percentile(50))
+        self.assertEqual(3.5, h.percentile(100))
+
+    def testOverflow(self):
+        """Make sure values past the last bucket are interpolated up to the
+        largest value seen
+        """
+        h = Histogram((1,))
+        h.add(0.5)
+        h.add(11)
+        self.assertEqual([1, 1], h.counts)
+        self.assertEqual(11, h.percentile(100))
+        self.assertEqual(6, h.percentile(75))
+
+    def testEmpty(self):
+        self.assertEqual(None, Histogram().percentile(50))
+
+
+class TestMetricsCollector(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = FakeTransport()
+        self.metrics = MetricsCollector()
+        self.db = FluidDB('http://foo.com', self.transport,
+                          metrics=self.metrics)
+
+    def testRecord(self):
+        self.transport.add_resp(200, 'application/json', '{"id": "1234"}')
+        self.transport.add_resp(404, 'text/plain', 'Not Found')
+        self.db('GET', ['objects', '1234'])
+        self.assertRaises(Fluid404Error, self.db, 'GET', ['objects', '5678'])
+        self.db('PUT', ['about', 'foo', 'test', 'tag'], 'bar')
+        endpoints = self.metrics.snapshot()['endpoints']
+        objects = endpoints['GET /objects/{id}']
+        self.assertEqual(2, objects['requests'])
+        self.assertEqual({200: 1, 404: 1}, objects['statuses'])
+        self.assertEqual(len('{"id": "1234"}Not Found'),
+                         objects['response_bytes'])
+        self.assertTrue(objects['latency']['p99'] >= 0)
+        about = endpoints['PUT /about/{about}/{tag}']
+        self.assertEqual(len('"bar"'), about['request_bytes'])
+
+    def testEndpoints(self):
+        """Make sure different kinds of request to a toplevel are kept apart
+        """
+        self.db('GET', ['objects'], urlargs={'query': 'has test/tag'})
+        self.db('GET', ['objects', '1234', 'test', 'tag'])
+        self.assertEqual(['GET /objects', 'GET /objects/{id}/{tag}'],
+                         sorted(self.metrics.snapshot()['endpoints']))
+
+    def testRetriesAndErrors(self):
+        self.db.retry = RetryPolicy(backoff=0)
+        self.transport.add_error(FluidConnectionError(IOError('refused')))
+        self.transport.add_resp(503, 'text/plain', '')
+        self.transport.add_resp(200, 'application/json', '{}')
+        self.db('GET', ['values'], urlargs={'query': 'has test/tag'})
+        values = self.metrics.snapshot()['endpoints']['GET /values']
+        self.assertEqual(2, values['retries'])
+        self.assertEqual({'error': 1, 503: 1, 200: 1}, values['statuses'])
+
+    def testJson(self):
+        self.db('GET', ['users', 'test'])
+        snapshot = json.loads(self.metrics.to_json())
+        users = snapshot['endpoints']['GET /users/{path}']
+        self.assertEqual(1, users['requests'])
+
+    def testPrometheus(self):
+        self.db('GET', ['users', 'test'])
+        text = self.metrics.to_prometheus()
+        labels = 'method="GET",path="/users/{path}"'
+        self.assertTrue('# TYPE fom_request_duration_seconds histogram\n'
+                        in text)
+        self.assertTrue('fom_request_duration_seconds_bucket{%s,le="+Inf"} 1'
+                        % labels in text)
+        self.assertTrue('fom_request_duration_seconds_count{%s} 1' % labels
+                        in text)
+        self.assertTrue('fom_requests_total{%s,status="200"} 1' % labels
+                        in text)
+        self.assertTrue('fom_response_bytes_total{%s} 5' % labels in text)
+
+    def testReset(self):
+        self.db('GET', ['users', 'test'])
+        self.metrics.reset()
+        self.assertEqual({}, self.metrics.snapshot()['endpoints'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+import threading
+import unittest
+
+from fom.cache import MemoryCache
+from fom.db import FluidDB
+from fom.deadline import deadline
+from fom.errors import FluidTimeoutError
+from fom.ratelimit import TokenBucket, RateLimiter
+
+from _base import FakeTransport
+
+
+class FakeClockBucket(TokenBucket):
+    """A token bucket whose clock only moves when it sleeps.
+    """
+
+    def __init__(self, *args, **kw):
+        self.now = 0.0
+        self.delays = []
+        TokenBucket.__init__(self, *args, **kw)
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, delay):
+        self.delays.append(delay)
+        self.now += delay
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def testBurst(self):
+        """Make sure a full bucket lets a burst through without waiting
+        """
+        bucket = FakeClockBucket(2, burst=3)
+        self.assertEqual([0, 0, 0], [bucket.acquire() for i in range(3)])
+        self.assertEqual(0.5, bucket.acquire())
+        self.assertEqual(0.5, bucket.acquire())
+
+    def testRefill(self):
+        bucket = FakeClockBucket(2, burst=2)
+        bucket.acquire()
+        bucket.acquire()
+        bucket.now += 10
+        # Only refilled up to the burst size
+        self.assertEqual([0, 0, 0.5],
+                         [bucket.acquire() for i in range(3)])
+
+    def testQueue(self):
+        """Make sure waiting callers queue up behind each other
+        """
+        bucket = FakeClockBucket(4, burst=1)
+        bucket.reserve()
+        self.assertEqual([0.25, 0.5, 0.75],
+                         [bucket.reserve() for i in range(3)])
+
+    def testDefaultBurst(self):
+        self.assertEqual(5, TokenBucket(5).burst)
+        self.assertEqual(1, TokenBucket(0.5).burst)
+
+    def testBadRate(self):
+        self.assertRaises(ValueError, TokenBucket, 0)
+
+    def testThreads(self):
+        """Make sure no tokens are lost or double counted between threads
+        """
+        bucket = FakeClockBucket(1, burst=100)
+        def take():
+            for i in range(10):
+                bucket.reserve()
+        threads = [threading.Thread(target=take) for i in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(0, bucket.tokens)
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.bucket = FakeClockBucket(1, burst=1)
+        self.puts = FakeClockBucket(1, burst=2)
+        self.limiter = RateLimiter(methods={'put': self.puts})
+        self.limiter.bucket = self.bucket
+        self.transport = FakeTransport()
+        self.db = FluidDB('http://foo.com', self.transport,
+                          rate_limit=self.limiter)
+
+    def testMethods(self):
+        """Make sure methods with their own bucket don't use the shared one
+        """
+        for i in range(3):
+            self.transport.add_resp(204, 'text/plain', '')
+            self.db('PUT', ['about', 'foo', 'test', 'tag'], 1)
+        for i in range(2):
+            self.transport.add_resp(200, 'application/json', '{}')
+            self.db('GET', ['users', 'test'])
+        self.assertEqual([1.0], self.puts.delays)
+        self.assertEqual([1.0], self.bucket.delays)
+        self.assertEqual(5, len(self.transport.reqs))
+
+    def testDeadline(self):
+        """Make sure a request which can't get a token within its deadline
+        fails straight away, without taking one
+        """
+        self.db('GET', ['users', 'test'])
+        self.assertRaises(FluidTimeoutError, self.db, 'GET',
+                          ['users', 'test'], timeout=0.1)
+        self.assertEqual([], self.bucket.delays)
+        self.assertEqual(1, len(self.transport.reqs))
+        self.db('GET', ['users', 'test'], timeout=5)
+        self.assertEqual([1.0], self.bucket.delays)
+
+    def testStreamDeadline(self):
+        self.db('GET', ['users', 'test'])
+        with deadline(0.1):
+            self.assertRaises(FluidTimeoutError, self.db.stream, 'GET',
+                              ['users', 'test'])
+        self.assertEqual([], self.bucket.delays)
+
+    def testTuples(self):
+        limiter = RateLimiter(10, methods={'DELETE': (1, 2)})
+        self.assertEqual(10, limiter.get_bucket('GET').rate)
+        self.assertEqual(2, limiter.get_bucket('delete').burst)
+
+    def testUnlimited(self):
+        limiter = RateLimiter(methods={'PUT': (1, 1)})
+        self.assertEqual(None, limiter.get_bucket('GET'))
+        self.assertEqual([0, 0], [limiter.acquire('GET') for i in range(2)])
+
+    def testCacheHits(self):
+        """Make sure responses served from the cache aren't counted
+        """
+        self.db.cache = MemoryCache(max_age=60)
+        self.transport.add_resp(200, 'application/json', '{}')
+        for i in range(3):
+            self.db('GET', ['users', 'test'])
+        self.assertEqual([], self.bucket.delays)
+        self.assertEqual(1, len(self.transport.reqs))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from fom.db import FluidDB
+from fom.errors import (FluidConnectionError, Fluid400Error, Fluid503Error,
+    Fluid500Error)
+from fom.retry import RetryPolicy, get_retry_after
+
+from _base import FakeTransport
+
+
+class RecordingRetryPolicy(RetryPolicy):
+    """A retry policy which doesn't actually sleep.
+    """
+
+    def __init__(self, *args, **kw):
+        RetryPolicy.__init__(self, *args, **kw)
+        self.delays = []
+
+    def sleep(self, delay):
+        self.delays.append(delay)
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = FakeTransport()
+        self.policy = RecordingRetryPolicy(max_retries=3, backoff=1,
+                                           max_backoff=5, jitter=False)
+        self.db = FluidDB('http://foo.com', self.transport, self.policy)
+
+    def testRetryServerError(self):
+        """Make sure idempotent requests are retried after a server error
+        """
+        self.transport.add_resp(503, 'text/plain', 'Service Unavailable')
+        self.transport.add_resp(502, 'text/plain', 'Bad Gateway')
+        self.transport.add_resp(200, 'application/json', '{"name": "test"}')
+        r = self.db('GET', ['users', 'test'])
+        self.assertEqual(200, r.status)
+        self.assertEqual(3, len(self.transport.reqs))
+        self.assertEqual([1, 2], self.policy.delays)
+
+    def testRetryConnectionError(self):
+        self.transport.add_error(FluidConnectionError(IOError('refused')))
+        self.transport.add_resp(204, 'text/plain', '')
+        r = self.db('DELETE', ['tags', 'test', 'foo'])
+        self.assertEqual(204, r.status)
+        self.assertEqual(2, len(self.transport.reqs))
+
+    def testGiveUp(self):
+        """Make sure the last error is raised once retries run out
+        """
+        for i in range(4):
+            self.transport.add_resp(500, 'text/plain', 'Error')
+        self.assertRaises(Fluid500Error, self.db, 'GET', ['users', 'test'])
+        self.assertEqual(4, len(self.transport.reqs))
+        self.assertEqual([1, 2, 4], self.policy.delays)
+
+    def testBackoffCapped(self):
+        policy = RetryPolicy(backoff=1, max_backoff=5, jitter=False)
+        error = FluidConnectionError(IOError())
+        self.assertEqual(5, policy.get_delay(10, error))
+
+    def testJitter(self):
+        policy = RetryPolicy(backoff=1, max_backoff=5, jitter=True)
+        error = FluidConnectionError(IOError())
+        for attempt in range(5):
+            delay = policy.get_delay(attempt, error)
+            self.assertTrue(0 <= delay <= min(5, 2 ** attempt))
+
+    def testNoRetryForPost(self):
+        self.transport.add_resp(503, 'text/plain', 'Service Unavailable')
+        self.assertRaises(Fluid503Error, self.db, 'POST', ['objects'], {})
+        self.assertEqual(1, len(self.transport.reqs))
+
+    def testNoRetryForClientError(self):
+        self.transport.add_resp(400, 'text/plain', 'Bad Request')
+        self.assertRaises(Fluid400Error, self.db, 'GET', ['users', 'test'])
+        self.assertEqual(1, len(self.transport.reqs))
+
+    def testNoRetryByDefault(self):
+        transport = FakeTransport()
+        transport.add_resp(503, 'text/plain', 'Service Unavailable')
+        db = FluidDB('http://foo.com', transport)
+        self.assertRaises(Fluid503Error, db, 'GET', ['users', 'test'])
+        self.assertEqual(1, len(transport.reqs))
+
+    def testRetryAfter(self):
+        """Make sure the server's Retry-After header is honoured
+        """
+        self.transport.add_resp(503, 'text/plain', 'Service Unavailable',
+                                {'retry-after': '3'})
+        self.transport.add_resp(200, 'application/json', '{}')
+        self.db('GET', ['users', 'test'])
+        self.assertEqual([3], self.policy.delays)
+
+    def testRetryAfterDate(self):
+        self.transport.add_resp(503, 'text/plain', 'Service Unavailable',
+                                {'retry-after': 'Fri, 31 Dec 1999 23:59:59 GMT'})
+        try:
+            self.db('POST', ['objects'], {})
+        except Fluid503Error, e:
+            self.assertEqual(0, get_retry_after(e))
+        else:
+            self.fail('No error raised')
+
+    def testNoRetryAfter(self):
+        self.assertEqual(None,
+                         get_retry_after(FluidConnectionError(IOError())))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import mmap
+import tempfile
+import unittest
+from StringIO import StringIO
+
+from fom.api import FluidApi
+from fom.db import FluidDB
+from fom.errors import Fluid404Error, Fluid503Error
+from fom.retry import RetryPolicy
+from fom.stream import (ChunkWriter, DigestMismatchError, IterReader,
+                        body_length)
+from fom.transport import _prepare_streamed_body
+
+from _base import FakeTransport
+
+
+BLOB = ''.join(chr(i % 256) for i in range(10000))
+
+
+class TestChunkWriter(unittest.TestCase):
+
+    def testWrite(self):
+        out = StringIO()
+        writer = ChunkWriter(out, 'md5', hashlib.md5('foobar').hexdigest())
+        writer.write('foo')
+        writer.write('bar')
+        writer.finish()
+        self.assertEqual('foobar', out.getvalue())
+        self.assertEqual(6, writer.size)
+        self.assertEqual(hashlib.md5('foobar').hexdigest(), writer.digest)
+
+    def testMismatch(self):
+        writer = ChunkWriter(StringIO(), 'md5', 'abc')
+        writer.write('foo')
+        self.assertRaises(DigestMismatchError, writer.finish)
+
+    def testDigestNeedsHash(self):
+        self.assertRaises(ValueError, ChunkWriter, StringIO(), None, 'abc')
+
+
+class TestStreaming(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = FakeTransport()
+        self.db = FluidDB('http://foo.com', self.transport)
+        self.api = FluidApi(self.db)
+
+    def testStream(self):
+        """Make sure the body is yielded in chunks of the given size
+        """
+        self.transport.add_resp(200, 'application/pdf', BLOB)
+        r = self.api.objects['1234']['test/pdf'].stream(chunk_size=4096)
+        self.assertEqual(200, r.status)
+        self.assertEqual('application/pdf', r.content_type)
+        chunks = list(r)
+        self.assertEqual([4096, 4096, 1808], [len(c) for c in chunks])
+        self.assertEqual(BLOB, ''.join(chunks))
+        self.assertEqual(len(BLOB), r.size)
+        self.assertTrue(r.response.closed)
+        self.assertEqual('http://foo.com/objects/1234/test/pdf',
+                         self.transport.reqs[0][1])
+
+    def testDownload(self):
+        self.transport.add_resp(200, 'application/pdf', BLOB)
+        out = StringIO()
+        digest = hashlib.sha1(BLOB).hexdigest()
+        r = self.api.about['book']['test/pdf'].download(
+            out, chunk_size=1000, hash_name='sha1', digest=digest.upper())
+        self.assertEqual(BLOB, out.getvalue())
+        self.assertEqual(digest, r.digest)
+        self.assertEqual(len(BLOB), r.size)
+        self.assertEqual('http://foo.com/about/book/test/pdf',
+                         self.transport.reqs[0][1])
+
+    def testDownloadMismatch(self):
+        self.transport.add_resp(200, 'application/pdf', BLOB)
+        self.assertRaises(DigestMismatchError,
+                          self.api.objects['1234']['test/pdf'].download,
+                          StringIO(), hash_name='sha1', digest='abc')
+
+    def testStreamError(self):
+        """Make sure errors are raised before any of the body is read
+        """
+        self.transport.add_resp(404, 'text/plain', 'Not Found')
+        response = self.transport.resps[0]
+        self.assertRaises(Fluid404Error,
+                          self.api.objects['1234']['test/pdf'].stream)
+        self.assertTrue(response.closed)
+
+
+class TestUpload(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = FakeTransport()
+        self.db = FluidDB('http://foo.com', self.transport, compress=True)
+        self.api = FluidApi(self.db)
+        self.tag = self.api.objects['1234']['test/pdf']
+
+    def testPutFile(self):
+        """Make sure a file is handed to the transport unread
+        """
+        self.transport.add_resp(204, 'text/plain', '')
+        body = tempfile.TemporaryFile()
+        body.write(BLOB)
+        body.seek(0)
+        self.tag.put(body, 'application/pdf')
+        method, url, data, headers = self.transport.reqs[0]
+        self.assertTrue(data is body)
+        self.assertEqual(0, body.tell())
+        self.assertEqual('application/pdf', headers['content-type'])
+        self.assertFalse('content-encoding' in headers)
+
+    def testPutMmap(self):
+        self.transport.add_resp(204, 'text/plain', '')
+        body = tempfile.TemporaryFile()
+        body.write(BLOB)
+        body.flush()
+        region = mmap.mmap(body.fileno(), 0, access=mmap.ACCESS_READ)
+        self.tag.put(region, 'application/pdf')
+        self.assertTrue(self.transport.reqs[0][2] is region)
+
+    def testPutIterable(self):
+        self.transport.add_resp(204, 'text/plain', '')
+        chunks = iter(['foo', 'bar'])
+        self.tag.put(chunks, 'application/pdf')
+        self.assertTrue(self.transport.reqs[0][2] is chunks)
+
+    def testNotRetried(self):
+        """Make sure a streamed body isn't sent again after a failure
+        """
+        self.db.retry = RetryPolicy(backoff=0)
+        self.transport.add_resp(503, 'text/plain', '')
+        self.transport.add_resp(204, 'text/plain', '')
+        self.assertRaises(Fluid503Error, self.tag.put, StringIO(BLOB),
+                          'application/pdf')
+        self.assertEqual(1, len(self.transport.reqs))
+
+
+class TestStreamedBody(unittest.TestCase):
+
+    def testBodyLength(self):
+        body = tempfile.TemporaryFile()
+        body.write(BLOB)
+        body.seek(100)
+        self.assertEqual(len(BLOB) - 100, body_length(body))
+        region = mmap.mmap(body.fileno(), 0, access=mmap.ACCESS_READ)
+        self.assertEqual(len(BLOB), body_length(region))
+        self.assertEqual(3, body_length('foo'))
+        self.assertEqual(None, body_length(iter(['foo'])))
+
+    def testIterReader(self):
+        reader = IterReader(['foo', '', 'barbaz'])
+        self.assertEqual('fo', reader.read(2))
+        self.assertEqual('o', reader.read(2))
+        self.assertEqual('barb', reader.read(4))
+        self.assertEqual('az', reader.read())
+        self.assertEqual('', reader.read(4))
+
+    def testContentLength(self):
+        """Make sure a body of known length is sent as it is
+        """
+        body = tempfile.TemporaryFile()
+        body.write(BLOB)
+        body.seek(0)
+        data, headers = _prepare_streamed_body(body, {'Accept': '*/*'})
+        self.assertTrue(data is body)
+        self.assertEqual(str(len(BLOB)), headers['Content-Length'])
+        self.assertEqual('*/*', headers['Accept'])
+
+    def testChunked(self):
+        """Make sure a body of unknown length is sent chunked
+        """
+        data, headers = _prepare_streamed_body(iter(['foo', '', 'ab']), None)
+        self.assertEqual('chunked', headers['Transfer-Encoding'])
+        self.assertEqual('3\r\nfoo\r\n2\r\nab\r\n0\r\n\r\n', data.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
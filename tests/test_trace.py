@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from fom.api import FluidApi
+from fom.db import FluidDB
+from fom.errors import Fluid404Error
+from fom.mapping import Object, tag_value
+from fom.session import Fluid
+from fom.trace import Tracer, path_template, traced
+
+from _base import FakeTransport
+
+
+class Book(Object):
+
+    title = tag_value('test/title')
+
+
+class TestTracer(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = FakeTransport()
+        self.tracer = Tracer(capacity=3)
+        self.db = FluidDB('http://foo.com', self.transport,
+                          tracer=self.tracer)
+        Fluid.bound = FluidApi(self.db)
+
+    def testRequestSpan(self):
+        self.transport.add_resp(404, 'text/plain', 'Not Found', {
+            'x-fluiddb-request-id': 'abc',
+            'x-fluiddb-error-class': 'TNonexistentTag'})
+        self.assertRaises(Fluid404Error, self.db, 'GET',
+                          ['objects', '1234', 'test', 'tag'])
+        span, = self.tracer.spans()
+        self.assertEqual('GET /objects/{id}/{tag}', span.name)
+        self.assertEqual('abc', span.attributes['request_id'])
+        self.assertEqual(404, span.attributes['status'])
+        self.assertEqual(9, span.attributes['response_bytes'])
+        self.assertEqual('TNonexistentTag', span.error)
+        self.assertEqual(None, span.parent_id)
+        self.assertTrue(span.duration >= 0)
+
+    def testNesting(self):
+        """Make sure requests made by a mapping operation nest under it
+        """
+        book = Book('1234')
+        book._cache['fluiddb/about'] = 'book'
+        book.title = u'Fom'
+        self.transport.add_resp(204, 'text/plain', '')
+        book.save()
+        request, save = self.tracer.spans()
+        self.assertEqual('Object.save', save.name)
+        self.assertEqual('book', save.attributes['about'])
+        self.assertEqual('PUT /values', request.name)
+        self.assertEqual(save.span_id, request.parent_id)
+        self.assertEqual(save.trace_id, request.trace_id)
+
+    def testFilter(self):
+        self.transport.add_resp(200, 'application/json', '{"ids": []}')
+        Object.filter('has test/title')
+        request, operation = self.tracer.spans()
+        self.assertEqual('Object.filter', operation.name)
+        self.assertEqual(operation.span_id, request.parent_id)
+
+    def testOperationError(self):
+        try:
+            with traced(self.db, 'batch'):
+                raise ValueError('oops')
+        except ValueError:
+            pass
+        span, = self.tracer.spans()
+        self.assertTrue('oops' in span.error)
+
+    def testRingBuffer(self):
+        for i in range(5):
+            self.db('GET', ['users', str(i)])
+        self.assertEqual(3, len(self.tracer))
+
+    def testSampling(self):
+        """Make sure unsampled traces are dropped whole
+        """
+        self.tracer.sample_rate = 0
+        with self.tracer.span('batch') as span:
+            self.assertEqual(None, span)
+            self.db('GET', ['users', 'test'])
+        self.db('GET', ['users', 'test'])
+        self.assertEqual([], self.tracer.spans())
+
+    def testNoTracer(self):
+        self.db.tracer = None
+        with traced(self.db, 'batch') as span:
+            self.assertEqual(None, span)
+
+    def testExport(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, 'spans.json')
+            self.db('GET', ['users', 'test'])
+            self.assertEqual(1, self.tracer.export(filename))
+            self.assertEqual(1, self.tracer.export(filename, append=True))
+            lines = open(filename).read().splitlines()
+            self.assertEqual(2, len(lines))
+            self.assertEqual('GET /users/{path}', json.loads(lines[0])['name'])
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def testPathTemplate(self):
+        for url, template in [
+            ('http://foo.com/objects', '/objects'),
+            ('http://foo.com/objects/1234', '/objects/{id}'),
+            ('http://foo.com/about/book/test/title',
+             '/about/{about}/{tag}'),
+            ('http://foo.com/namespaces/test/foo', '/namespaces/{path}'),
+            ('http://foo.com/permissions/tags/test/foo?action=update',
+             '/permissions/tags/{path}'),
+            ('http://foo.com/values?query=has+test', '/values'),
+        ]:
+            self.assertEqual(template, path_template(url))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from fom.db import FluidDB
+from fom.transport import Transport, PooledTransport
+
+from _base import FakeTransport
+
+
+class TestPooledTransport(unittest.TestCase):
+
+    def testPoolConfig(self):
+        """Make sure the pool settings are passed on to the connection pools
+        """
+        transport = PooledTransport(pool_connections=2, pool_maxsize=64,
+                                    keep_alive=False)
+        self.assertEqual(2, transport.session.config['pool_connections'])
+        self.assertEqual(64, transport.session.config['pool_maxsize'])
+        self.assertFalse(transport.session.config['keep_alive'])
+        pool = transport.session.poolmanager.connection_from_host('foo.com')
+        self.assertEqual(64, pool.pool.maxsize)
+        self.assertFalse(pool.block)
+
+    def testPoolBlock(self):
+        """Make sure a blocking pool limits the connections per host
+        """
+        transport = PooledTransport(pool_maxsize=4, pool_block=True)
+        pool = transport.session.poolmanager.connection_from_host('foo.com')
+        self.assertEqual(4, pool.pool.maxsize)
+        self.assertTrue(pool.block)
+
+    def testInterface(self):
+        self.assertRaises(NotImplementedError, Transport().request,
+                          'GET', 'http://foo.com')
+
+
+class TestFluidDBTransport(unittest.TestCase):
+
+    def testDefaultTransport(self):
+        db = FluidDB('http://foo.com')
+        self.assertTrue(isinstance(db.transport, PooledTransport))
+
+    def testCallUsesTransport(self):
+        """Make sure requests are sent through the given transport
+        """
+        transport = FakeTransport()
+        transport.add_resp(200, 'application/json', '{"name": "test"}')
+        db = FluidDB('http://foo.com', transport)
+        r = db('GET', ['users', 'test'])
+        self.assertEqual({u'name': u'test'}, r.value)
+        method, url, data, headers = transport.reqs[0]
+        self.assertEqual('GET', method)
+        self.assertEqual('http://foo.com/users/test', url)
+        self.assertEqual(None, data)
+        self.assertTrue(headers['User-agent'].startswith('fom/'))
+
+
+if __name__ == '__main__':
+    unittest.main()
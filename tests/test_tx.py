@@ -1,8 +1,31 @@
+import hashlib
+import json
+import urllib
+from StringIO import StringIO
+
 from fom.api import FluidApi
-from fom.tx import TxFluidDB
+from fom.breaker import CircuitBreaker, CLOSED
+from fom.mapping import tag_collection, tag_value
+from fom.tx import (BodyProducer, NotLoadedError, TxFluid, TxFluidDB,
+                    TxObject, UnsupportedError, gather,
+                    DEFAULT_CACHED_CONNECTION_TIMEOUT,
+                    DEFAULT_PERSISTENT_PER_HOST)
+from fom.metrics import MetricsCollector
+from fom.stream import DigestMismatchError
+from fom.trace import Tracer
 from fom import errors
 from twisted.trial import unittest
-from twisted.internet import defer
+from twisted.internet import defer, reactor, task
+from twisted.python import failure
+from twisted.web import client, http_headers
+
+
+class FakeClockBreaker(CircuitBreaker):
+
+    now = 0.0
+
+    def clock(self):
+        return self.now
 
 
 class TestTxFluidDB(unittest.TestCase):
@@ -10,6 +33,9 @@ class TestTxFluidDB(unittest.TestCase):
     def setUp(self):
         self.db = TxFluidDB('http://sandbox.fluidinfo.com')
 
+    def tearDown(self):
+        return self.db.close()
+
     @defer.inlineCallbacks
     def testRequest(self):
         resp = yield self.db('GET', ['users', 'test'])
@@ -34,3 +60,629 @@ class TestTxFluidDB(unittest.TestCase):
             description='Test user namespace')
         self.assertEqual(resp.status, 204)
         self.assertEqual(resp.content, '')
+
+
+class FakeTxTransport(object):
+
+    def __init__(self):
+        self.stopped = False
+
+    def stopProducing(self):
+        self.stopped = True
+
+
+class FakeTxResponse(object):
+    """A response to a request made by FakeAgent.
+    """
+
+    def __init__(self, code, content_type, chunks):
+        self.code = code
+        self.headers = http_headers.Headers({'content-type': [content_type]})
+        self.chunks = chunks
+        self.length = sum(len(c) for c in chunks)
+        self.transport = FakeTxTransport()
+
+    def deliverBody(self, protocol):
+        protocol.makeConnection(self.transport)
+        for chunk in self.chunks:
+            if self.transport.stopped:
+                protocol.connectionLost(failure.Failure(
+                    client.ResponseFailed([])))
+                return
+            protocol.dataReceived(chunk)
+        protocol.connectionLost(failure.Failure(client.ResponseDone()))
+
+
+class FakeAgent(object):
+    """An agent which records requests and replays queued responses.
+    """
+
+    def __init__(self):
+        self.reqs = []
+        self.resps = []
+
+    def request(self, method, url, headers=None, body_producer=None):
+        self.reqs.append((method, url, headers, body_producer))
+        return defer.succeed(self.resps.pop(0))
+
+
+class TestTxDownload(unittest.TestCase):
+
+    def setUp(self):
+        self.db = TxFluidDB('http://foo.com')
+        self.agent = self.db.agent = FakeAgent()
+
+    @defer.inlineCallbacks
+    def testDownload(self):
+        chunks = ['foo', 'bar', 'baz']
+        self.agent.resps.append(FakeTxResponse(200, 'image/png', chunks))
+        out = StringIO()
+        api = FluidApi(self.db)
+        r = yield api.objects['1234']['test/image'].download(
+            out, hash_name='md5', digest=hashlib.md5('foobarbaz').hexdigest())
+        self.assertEqual('foobarbaz', out.getvalue())
+        self.assertEqual(9, r.size)
+        self.assertEqual(200, r.status)
+        self.assertEqual('image/png', r.content_type)
+        self.assertEqual('http://foo.com/objects/1234/test/image',
+                         self.agent.reqs[0][1])
+
+    def testDownloadMismatch(self):
+        self.agent.resps.append(FakeTxResponse(200, 'image/png', ['foo']))
+        d = self.db.download(['objects', '1234', 'test', 'image'], StringIO(),
+                             hash_name='md5', digest='abc')
+        return self.assertFailure(d, DigestMismatchError)
+
+    def testDownloadError(self):
+        self.agent.resps.append(FakeTxResponse(404, 'text/plain',
+                                               ['Not Found']))
+        d = self.db.download(['objects', '1234', 'test', 'image'], StringIO())
+        return self.assertFailure(d, errors.Fluid404Error)
+
+    def testDownloadWriteError(self):
+        """Make sure the body stops being received when it can't be written
+        """
+        class BrokenFile(object):
+            def write(self, data):
+                raise IOError('No space left on device')
+        response = FakeTxResponse(200, 'image/png', ['foo', 'bar'])
+        self.agent.resps.append(response)
+        d = self.db.download(['objects', '1234', 'test', 'image'],
+                             BrokenFile())
+        self.assertTrue(response.transport.stopped)
+        return self.assertFailure(d, IOError)
+
+    def testStreamUnsupported(self):
+        api = FluidApi(self.db)
+        self.assertRaises(UnsupportedError,
+                          api.objects['1234']['test/image'].stream)
+        self.assertEqual([], self.agent.reqs)
+
+
+class TestTxUpload(unittest.TestCase):
+
+    def setUp(self):
+        self.db = TxFluidDB('http://foo.com')
+        self.agent = self.db.agent = FakeAgent()
+        self.tag = FluidApi(self.db).objects['1234']['test/image']
+
+    def _produce(self, producer):
+        out = StringIO()
+        d = producer.startProducing(out)
+        d.addCallback(lambda _: out.getvalue())
+        return d
+
+    @defer.inlineCallbacks
+    def testPutFile(self):
+        self.agent.resps.append(FakeTxResponse(204, 'text/plain', []))
+        yield self.tag.put(StringIO('foobar'), 'image/png')
+        producer = self.agent.reqs[0][3]
+        self.assertEqual(6, producer.length)
+        body = yield self._produce(producer)
+        self.assertEqual('foobar', body)
+
+    @defer.inlineCallbacks
+    def testPutIterable(self):
+        """Make sure an iterable of unknown length is produced chunked
+        """
+        self.agent.resps.append(FakeTxResponse(204, 'text/plain', []))
+        yield self.tag.put(iter(['foo', 'bar']), 'image/png')
+        producer = self.agent.reqs[0][3]
+        self.assertEqual(client.UNKNOWN_LENGTH, producer.length)
+        body = yield self._produce(producer)
+        self.assertEqual('foobar', body)
+
+
+class TestBodyProducer(unittest.TestCase):
+
+    def setUp(self):
+        self.steps = []
+        # Runs one step of the producer each time the test says so
+        self.cooperator = task.Cooperator(
+            terminationPredicateFactory=lambda: lambda: True,
+            scheduler=self.steps.append)
+        self.out = StringIO()
+
+    def step(self):
+        self.steps.pop(0)()
+
+    def testString(self):
+        producer = BodyProducer('foobarbaz', chunk_size=4,
+                                cooperator=self.cooperator)
+        self.assertEqual(9, producer.length)
+        d = producer.startProducing(self.out)
+        self.step()
+        self.assertEqual('foob', self.out.getvalue())
+        while self.steps:
+            self.step()
+        self.assertEqual('foobarbaz', self.out.getvalue())
+        return d
+
+    def testPauseResume(self):
+        body = StringIO('foobarbaz')
+        producer = BodyProducer(body, chunk_size=3,
+                                cooperator=self.cooperator)
+        self.assertEqual(9, producer.length)
+        d = producer.startProducing(self.out)
+        self.step()
+        producer.pauseProducing()
+        while self.steps:
+            self.step()
+        self.assertEqual('foo', self.out.getvalue())
+        producer.resumeProducing()
+        while self.steps:
+            self.step()
+        self.assertEqual('foobarbaz', self.out.getvalue())
+        self.assertTrue(body.closed)
+        return d
+
+    def testStop(self):
+        closed = []
+
+        def chunks():
+            try:
+                yield 'foo'
+                yield 'bar'
+            finally:
+                closed.append(True)
+        producer = BodyProducer(chunks(), cooperator=self.cooperator)
+        self.assertEqual(client.UNKNOWN_LENGTH, producer.length)
+        d = producer.startProducing(self.out)
+        d.addBoth(self.fail)
+        self.step()
+        producer.stopProducing()
+        self.assertEqual('foo', self.out.getvalue())
+        self.assertEqual([True], closed)
+
+
+class HangingAgent(FakeAgent):
+    """An agent whose requests never get a response.
+    """
+
+    def request(self, method, url, headers=None, body_producer=None):
+        self.reqs.append((method, url, headers, body_producer))
+        return defer.Deferred()
+
+
+class TestTxTimeout(unittest.TestCase):
+
+    def setUp(self):
+        self.db = TxFluidDB('http://foo.com', connect_timeout=5)
+        self.agent = self.db.agent = HangingAgent()
+
+    def testTimeout(self):
+        d = self.db('GET', ['users', 'test'], timeout=0.01)
+        return self.assertFailure(d, errors.FluidTimeoutError)
+
+    def testDownloadTimeout(self):
+        d = self.db.download(['objects', '1234', 'test', 'image'],
+                             StringIO(), timeout=0.01)
+        return self.assertFailure(d, errors.FluidTimeoutError)
+
+    def testInTime(self):
+        self.db.agent = FakeAgent()
+        self.db.agent.resps.append(FakeTxResponse(200, 'application/json',
+                                                  ['{}']))
+        d = self.db('GET', ['users', 'test'], timeout=5)
+        d.addCallback(lambda r: self.assertEqual({}, r.value))
+        return d
+
+
+class ControlledAgent(FakeAgent):
+    """An agent whose requests get a response when the test says so.
+    """
+
+    def request(self, method, url, headers=None, body_producer=None):
+        self.reqs.append((method, url, headers, body_producer))
+        d = defer.Deferred()
+        self.resps.append(d)
+        return d
+
+    def respond(self, i, content='{}'):
+        self.resps[i].callback(FakeTxResponse(200, 'application/json',
+                                              [content]))
+
+
+class TestTxConcurrency(unittest.TestCase):
+
+    def setUp(self):
+        self.db = TxFluidDB('http://foo.com', max_concurrent=2)
+        self.agent = self.db.agent = ControlledAgent()
+
+    def testLimit(self):
+        ds = [self.db('GET', ['users', str(i)]) for i in range(4)]
+        self.assertEqual(2, len(self.agent.reqs))
+        self.agent.respond(1, '{"name": "1"}')
+        self.assertEqual(3, len(self.agent.reqs))
+        self.assertEqual('http://foo.com/users/2', self.agent.reqs[2][1])
+        for i in (0, 2, 3):
+            self.agent.respond(i)
+        self.assertEqual(4, len(self.agent.reqs))
+        d = defer.gatherResults(ds)
+        d.addCallback(lambda rs: self.assertEqual({'name': '1'},
+                                                  rs[1].value))
+        return d
+
+    def testErrorReleases(self):
+        ds = [self.db('GET', ['users', str(i)]) for i in range(3)]
+        self.agent.resps[0].errback(errors.FluidConnectionError(
+            IOError('refused')))
+        self.assertEqual(3, len(self.agent.reqs))
+        self.assertFailure(ds[0], errors.FluidConnectionError)
+        self.agent.respond(1)
+        self.agent.respond(2)
+        return defer.gatherResults(ds)
+
+    def testTimeoutWaiting(self):
+        """Make sure a request timing out while waiting for its turn is
+        never sent
+        """
+        self.db('GET', ['users', '0'])
+        self.db('GET', ['users', '1'])
+        d = self.db('GET', ['users', '2'], timeout=0.01)
+        self.assertFailure(d, errors.FluidTimeoutError)
+
+        def check(_):
+            self.agent.respond(0)
+            self.agent.respond(1)
+            self.assertEqual(2, len(self.agent.reqs))
+            self.assertEqual(2, self.db.semaphore.tokens)
+        return d.addCallback(check)
+
+    def testBreakerAfterQueue(self):
+        """Make sure requests waiting for their turn don't take the trials of
+        a half open circuit
+        """
+        breaker = self.db.breaker = FakeClockBreaker(failure_threshold=1,
+                                                     reset_timeout=10)
+        ds = [self.db('GET', ['users', str(i)]) for i in range(2)]
+        breaker.record('users', errors.FluidConnectionError(IOError()))
+        breaker.now = 10
+        waiting = [self.db('GET', ['users', str(i)]) for i in range(2, 4)]
+        self.assertFalse(waiting[1].called)
+        for i in range(4):
+            self.agent.respond(i)
+        return defer.gatherResults(ds + waiting)
+
+    def testTimeoutWaitingNotRecorded(self):
+        """Make sure a request timing out before it is sent isn't counted
+        against the server
+        """
+        breaker = self.db.breaker = FakeClockBreaker(failure_threshold=1)
+        self.db('GET', ['users', '0'])
+        self.db('GET', ['users', '1'])
+        d = self.db('GET', ['users', '2'], timeout=0.01)
+        self.assertFailure(d, errors.FluidTimeoutError)
+
+        def check(_):
+            self.assertEqual(CLOSED, breaker.state('users'))
+            self.agent.respond(0)
+            self.agent.respond(1)
+        return d.addCallback(check)
+
+    def testDownloadLimited(self):
+        ds = [self.db('GET', ['users', str(i)]) for i in range(2)]
+        out = StringIO()
+        d = self.db.download(['objects', '1234', 'test', 'image'], out)
+        self.assertEqual(2, len(self.agent.reqs))
+        self.agent.respond(0)
+        self.assertEqual(3, len(self.agent.reqs))
+        self.agent.respond(1)
+        self.agent.respond(2, 'foobar')
+        d.addCallback(lambda r: self.assertEqual('foobar', out.getvalue()))
+        return defer.gatherResults(ds + [d])
+
+    def testPool(self):
+        """Make sure every request in flight can keep its connection
+        """
+        self.assertTrue(self.db.pool.persistent)
+        self.assertEqual(2, self.db.pool.maxPersistentPerHost)
+        return self.db.close()
+
+
+class TestTxPool(unittest.TestCase):
+
+    def testDefaults(self):
+        db = TxFluidDB('http://foo.com')
+        self.assertTrue(db.pool.persistent)
+        self.assertEqual(DEFAULT_PERSISTENT_PER_HOST,
+                         db.pool.maxPersistentPerHost)
+        self.assertEqual(DEFAULT_CACHED_CONNECTION_TIMEOUT,
+                         db.pool.cachedConnectionTimeout)
+        return db.close()
+
+    def testSettings(self):
+        db = TxFluidDB('http://foo.com', max_concurrent=20,
+                       max_persistent_per_host=4, cached_connection_timeout=30)
+        self.assertEqual(4, db.pool.maxPersistentPerHost)
+        self.assertEqual(30, db.pool.cachedConnectionTimeout)
+        return db.close()
+
+    def testSharedPool(self):
+        pool = client.HTTPConnectionPool(reactor)
+        db = TxFluid('http://foo.com', pool=pool).db
+        self.assertTrue(db.pool is pool)
+        return db.close()
+
+
+class TestTxFluid(unittest.TestCase):
+
+    def setUp(self):
+        self.fdb = TxFluid('http://foo.com')
+        self.agent = self.fdb.db.agent = ControlledAgent()
+
+    def tearDown(self):
+        return self.fdb.close()
+
+    def get(self, uid):
+        return self.fdb.objects[uid]['test/title'].get()
+
+    def testApi(self):
+        d = self.get('1234')
+        self.agent.respond(0, '"Fom"')
+        d.addCallback(lambda r: self.assertEqual('"Fom"', r.content))
+        return d
+
+    def testGatherLimit(self):
+        d = gather(self.get, ['a', 'b', 'c'], limit=2)
+        self.assertEqual(2, len(self.agent.reqs))
+        self.agent.respond(0, '"A"')
+        self.assertEqual('http://foo.com/objects/c/test/title',
+                         self.agent.reqs[2][1])
+        self.agent.respond(2, '"C"')
+        self.agent.respond(1, '"B"')
+        d.addCallback(lambda rs: self.assertEqual(['"A"', '"B"', '"C"'],
+                                                  [r.content for r in rs]))
+        return d
+
+    def testGatherErrors(self):
+        d = gather(self.get, ['a', 'b'], return_errors=True)
+        self.agent.resps[0].callback(FakeTxResponse(404, 'text/plain',
+                                                    ['Not Found']))
+        self.agent.respond(1)
+
+        def check(results):
+            self.assertTrue(isinstance(results[0], errors.Fluid404Error))
+            self.assertEqual(200, results[1].status)
+        return d.addCallback(check)
+
+    def testGatherFirstError(self):
+        d = gather(self.get, ['a', 'b'], limit=1)
+        self.agent.resps[0].callback(FakeTxResponse(404, 'text/plain',
+                                                    ['Not Found']))
+        self.agent.respond(1)
+        return self.assertFailure(d, errors.Fluid404Error)
+
+
+class TxBook(TxObject):
+
+    title = tag_value('test/title')
+
+    batch_size = 2
+
+
+class TxShelf(TxObject):
+
+    label = tag_value('test/label', lazy_save=False)
+    books = tag_collection('test/books')
+
+
+def values_response(results):
+    content = json.dumps({'results': {'id': results}})
+    return FakeTxResponse(200, 'application/json', [content])
+
+
+class TestTxObject(unittest.TestCase):
+
+    def setUp(self):
+        self.fdb = TxFluid('http://foo.com')
+        self.agent = self.fdb.db.agent = FakeAgent()
+        self.fdb.bind()
+
+    def tearDown(self):
+        return self.fdb.close()
+
+    def book(self, uid, title):
+        return {uid: {'fluiddb/about': {'value': 'book ' + uid},
+                      'test/title': {'value': title}}}
+
+    @defer.inlineCallbacks
+    def testLoadMany(self):
+        first = self.book('a', 'A')
+        first.update(self.book('b', 'B'))
+        self.agent.resps.append(values_response(first))
+        self.agent.resps.append(values_response(self.book('c', 'C')))
+        books = yield TxBook.load_many(['a', 'b', 'c'])
+        self.assertEqual(['A', 'B', 'C'], [b.title for b in books])
+        self.assertEqual('book c', books[2].about)
+        self.assertEqual(2, len(self.agent.reqs))
+        url = urllib.unquote_plus(self.agent.reqs[0][1])
+        self.assertTrue('query=fluiddb/id = "a" or fluiddb/id = "b"' in url)
+        self.assertTrue('tag=test/title' in url)
+        self.assertEqual([], list(books[0]._dirty_fields))
+
+    @defer.inlineCallbacks
+    def testLoad(self):
+        self.agent.resps.append(values_response(self.book('a', 'A')))
+        book = yield TxBook('a').load()
+        self.assertEqual('A', book.title)
+
+    @defer.inlineCallbacks
+    def testSave(self):
+        book = TxBook('a')
+        book._cache['fluiddb/about'] = 'book a'
+        book.title = u'Fom'
+        self.agent.resps.append(FakeTxResponse(204, 'text/plain', []))
+        yield book.save()
+        method, url, headers, producer = self.agent.reqs[0]
+        self.assertEqual('PUT', method)
+        self.assertTrue(url.startswith('http://foo.com/values'))
+        self.assertEqual({'queries': [['fluiddb/about = "book a"',
+                                       {'test/title': {'value': 'Fom'}}]]},
+                         json.loads(producer.body))
+        self.assertEqual(0, len(book._dirty_fields))
+
+    def testSaveError(self):
+        book = TxBook('a')
+        book._cache['fluiddb/about'] = 'book a'
+        book.title = u'Fom'
+        self.agent.resps.append(FakeTxResponse(500, 'text/plain', ['']))
+        d = book.save()
+        self.assertFailure(d, errors.Fluid500Error)
+        d.addCallback(lambda _: self.assertEqual(1, len(book._dirty_fields)))
+        return d
+
+    def testNotLoaded(self):
+        book = TxBook('a')
+        self.assertRaises(NotLoadedError, getattr, book, 'title')
+        self.assertFalse(hasattr(book, 'about'))
+        self.assertEqual([], self.agent.reqs)
+
+    def testSaveNotLoaded(self):
+        """Make sure saving needs the about value to have been loaded
+        """
+        book = TxBook('a')
+        book.title = u'Fom'
+        try:
+            book.save()
+        except ValueError, e:
+            self.assertTrue('fluiddb/about' in str(e))
+        else:
+            self.fail('Saved without an about value')
+        self.assertEqual([], self.agent.reqs)
+
+    @defer.inlineCallbacks
+    def testFilter(self):
+        self.agent.resps.append(values_response(self.book('a', 'A')))
+        books = yield TxBook.filter('has test/title')
+        self.assertEqual(['A'], [b.title for b in books])
+
+    @defer.inlineCallbacks
+    def testFilterSession(self):
+        other = TxFluid('http://bar.com')
+        other.db.agent = FakeAgent()
+        other.db.agent.resps.append(values_response(self.book('a', 'A')))
+        books = yield TxBook.filter('has test/title', fluid=other)
+        self.assertEqual(['A'], [b.title for b in books])
+        self.assertTrue(books[0].fluid is other)
+        self.assertEqual([], self.agent.reqs)
+        yield other.close()
+
+    @defer.inlineCallbacks
+    def testSetNow(self):
+        """Make sure a field which isn't saved lazily is written straight
+        away, and saving waits for it
+        """
+        shelf = TxShelf('a')
+        shelf._cache['fluiddb/about'] = 'shelf a'
+        self.agent.resps.append(FakeTxResponse(204, 'text/plain', []))
+        shelf.label = u'Fiction'
+        self.assertEqual('PUT', self.agent.reqs[0][0])
+        self.assertTrue(
+            self.agent.reqs[0][1].endswith('/objects/a/test/label'))
+        yield shelf.save()
+        self.assertEqual(1, len(self.agent.reqs))
+
+    def testSetNowError(self):
+        """Make sure the error of a field written straight away is given by
+        save()
+        """
+        shelf = TxShelf('a')
+        shelf._cache['fluiddb/about'] = 'shelf a'
+        self.agent.resps.append(FakeTxResponse(500, 'text/plain', ['']))
+        shelf.label = u'Fiction'
+        return self.assertFailure(shelf.save(), errors.Fluid500Error)
+
+    @defer.inlineCallbacks
+    def testSetDelete(self):
+        shelf = TxShelf('a')
+        self.agent.resps.append(FakeTxResponse(204, 'text/plain', []))
+        self.agent.resps.append(FakeTxResponse(204, 'text/plain', []))
+        r = yield shelf.set('test/other', u'foo')
+        self.assertEqual(204, r.status)
+        r = yield shelf.delete('test/other')
+        self.assertEqual(204, r.status)
+        self.assertEqual(['PUT', 'DELETE'],
+                         [req[0] for req in self.agent.reqs])
+
+    def testCollection(self):
+        shelf = TxShelf('a')
+        self.assertRaises(UnsupportedError, getattr, shelf, 'books')
+        self.assertEqual([], self.agent.reqs)
+
+    @defer.inlineCallbacks
+    def testCreate(self):
+        self.agent.resps.append(FakeTxResponse(201, 'application/json',
+                                               ['{"id": "1234"}']))
+        book = TxBook(about='book')
+        yield book.created
+        self.assertEqual('1234', book.uid)
+        self.assertEqual('book', book.about)
+
+
+class TestTxMetrics(unittest.TestCase):
+
+    def testRecord(self):
+        metrics = MetricsCollector()
+        db = TxFluidDB('http://foo.com', metrics=metrics)
+        db.agent = FakeAgent()
+        db.agent.resps.append(FakeTxResponse(404, 'text/plain',
+                                             ['Not Found']))
+        d = db('GET', ['objects', '1234'])
+        self.assertFailure(d, errors.Fluid404Error)
+        def check(_):
+            objects = metrics.snapshot()['endpoints']['GET /objects/{id}']
+            self.assertEqual({404: 1}, objects['statuses'])
+        return d.addCallback(check)
+
+    def testDownload(self):
+        metrics = MetricsCollector()
+        db = TxFluidDB('http://foo.com', metrics=metrics)
+        db.agent = FakeAgent()
+        db.agent.resps.append(FakeTxResponse(200, 'image/png', ['foo']))
+        d = db.download(['objects', '1234', 'test', 'image'], StringIO())
+
+        def check(_):
+            endpoints = metrics.snapshot()['endpoints']
+            tag = endpoints['GET /objects/{id}/{tag}']
+            self.assertEqual({200: 1}, tag['statuses'])
+        return d.addCallback(check)
+
+
+class TestTxTracer(unittest.TestCase):
+
+    def testRecord(self):
+        """Make sure spans are recorded without metrics being collected
+        """
+        tracer = Tracer()
+        db = TxFluidDB('http://foo.com', tracer=tracer)
+        db.agent = FakeAgent()
+        db.agent.resps.append(FakeTxResponse(404, 'text/plain',
+                                             ['Not Found']))
+        d = db('GET', ['objects', '1234'])
+        self.assertFailure(d, errors.Fluid404Error)
+        def check(_):
+            span, = tracer.spans()
+            self.assertEqual('GET /objects/{id}', span.name)
+            self.assertEqual(404, span.attributes['status'])
+        return d.addCallback(check)
@@ -1,8 +1,38 @@
 
+import tempfile
 from unittest import TestCase
 
 from fom.db import FluidDB
-from fom.utils import fom_request_sent, fom_response_received, _DummyNamespace
+from fom.errors import FluidConnectionError
+from fom.utils import (fom_request_sent, fom_response_received,
+    fom_request_finished, RequestEvent, _DummyNamespace)
+
+from _base import FakeTransport, FakeHttpLibResponse
+
+
+class ReadingTransport(FakeTransport):
+    """A transport which reads streamed request bodies, as a real one does.
+    """
+
+    def request(self, method, url, data=None, headers=None, stream=False,
+                timeout=None):
+        if hasattr(data, 'read'):
+            data.read()
+        return FakeTransport.request(self, method, url, data, headers,
+                                     stream, timeout)
+
+
+class UnreadResponse(FakeHttpLibResponse):
+    """A response which fails the test if its body is read.
+    """
+
+    def _get_content(self):
+        raise AssertionError('Body read')
+
+    def _set_content(self, content):
+        pass
+
+    content = property(_get_content, _set_content)
 
 class SignalsTests(TestCase):
 
@@ -20,6 +50,90 @@ class SignalsTests(TestCase):
         r = db('GET', ['users', 'test'])
         self.assertEqual(len(called), 2)
 
+    def test_no_receivers(self):
+        """Make sure nothing is read for signals nobody listens to
+        """
+        transport = FakeTransport()
+        transport.resps.append(UnreadResponse(204, 'text/plain'))
+        db = FluidDB('http://foo.com', transport)
+        self.assertFalse(fom_response_received.receivers)
+        r = db.stream('GET', ['objects', '1234', 'test', 'tag'])
+        self.assertEqual(204, r.status)
+
+    def test_fake_signals(self):
+        """Test the logging signals without a network
+        """
+        called = []
+        def on_req(db, request):
+            called.append(request)
+        def on_resp(db, response):
+            called.append(response)
+        fom_request_sent.connect(on_req)
+        fom_response_received.connect(on_resp)
+        try:
+            db = FluidDB('http://foo.com', FakeTransport())
+            db('GET', ['users', 'test'])
+        finally:
+            fom_request_sent.disconnect(on_req)
+            fom_response_received.disconnect(on_resp)
+        self.assertEqual([('http://foo.com/users/test', 'GET', None),
+                          (200, 'empty', None)],
+                         [called[0][:3], called[1]])
+
+    def test_request_finished(self):
+        events = []
+        def on_finished(db, event):
+            events.append(event)
+        fom_request_finished.connect(on_finished)
+        try:
+            transport = FakeTransport()
+            transport.add_error(FluidConnectionError(IOError('refused')))
+            db = FluidDB('http://foo.com', transport)
+            self.assertRaises(FluidConnectionError, db, 'PUT',
+                              ['about', 'foo', 'test', 'tag'], 'bar')
+            db('GET', ['users', 'test'])
+        finally:
+            fom_request_finished.disconnect(on_finished)
+        failed, event = events
+        self.assertEqual('error', failed.status)
+        self.assertEqual(None, failed.content)
+        self.assertEqual(5, failed.request_bytes)
+        self.assertTrue(isinstance(failed.error, FluidConnectionError))
+        self.assertEqual(('GET', 'http://foo.com/users/test'),
+                         (event.method, event.url))
+        self.assertEqual(200, event.status)
+        self.assertEqual('empty', event.content)
+        self.assertEqual(5, event.response_bytes)
+        self.assertTrue(event.elapsed >= 0)
+
+    def test_streamed_request_bytes(self):
+        """Make sure a streamed body is measured before it is sent
+        """
+        events = []
+        def on_finished(db, event):
+            events.append(event)
+        body = tempfile.TemporaryFile()
+        body.write('x' * 1000)
+        body.seek(0)
+        fom_request_finished.connect(on_finished)
+        try:
+            db = FluidDB('http://foo.com', ReadingTransport())
+            db('PUT', ['about', 'foo', 'test', 'image'], body,
+               content_type='image/png')
+        finally:
+            fom_request_finished.disconnect(on_finished)
+            body.close()
+        self.assertEqual(1000, events[0].request_bytes)
+
+    def test_lazy_event(self):
+        """Make sure an event doesn't read the body unless asked to
+        """
+        event = RequestEvent('GET', 'http://foo.com/users/test', None, {},
+                             0, 1, UnreadResponse(200, 'text/plain'))
+        self.assertEqual(200, event.status)
+        self.assertEqual(1, event.elapsed)
+        self.assertRaises(AssertionError, getattr, event, 'content')
+
     def test_dummy_signals_cant_connect(self):
         """Test that dummy signals dont work for connection
         """
@@ -34,6 +148,7 @@ class SignalsTests(TestCase):
         s = ns.signal('test')
         s.send()
         s.send(1)
+        self.assertFalse(s.receivers)
 
 
 